@@ -1,12 +1,17 @@
+import concurrent.futures
+import functools
+import hashlib
+import itertools
+import json
 import logging
 import os
 import tempfile
+import uuid
 from importlib import metadata, resources
 
-import netCDF4
+import gsw
 import numpy as np
 import pandas as pd
-import pyglider.ncprocess as pgncprocess
 import pyglider.slocum as pgslocum
 import pyglider.utils as pgutils
 import xarray as xr
@@ -201,6 +206,7 @@ def get_path_glider(
     )
 
     cacdir = os.path.join(deployments_path, "cache")
+    decodedcachedir = os.path.join(deployments_path, "cache-decoded")
     # binarydir = os.path.join(glider_path, "data", "binary", mode)
     rawyaml = get_path_yaml("raw")
     engyaml = get_path_yaml("eng")
@@ -230,6 +236,7 @@ def get_path_glider(
         "rawyaml": rawyaml,
         "engyaml": engyaml,
         "cacdir": cacdir,
+        "decodedcachedir": decodedcachedir,
         "logdir": logdir,
         # "binarydir": binarydir,
         # "rawdir": rawdir,
@@ -259,6 +266,14 @@ def binary_to_nc(
     sci_timeseries_pyglider: bool = True,
     write_gridded: bool = True,
     file_info: str | None = None,
+    max_workers: int | None = 1,
+    incremental_raw: bool = False,
+    decoded_cache: bool = False,
+    parallel_timeseries: bool = False,
+    skip_unchanged: bool = False,
+    sci_window: str | None = None,
+    incremental_gridded: bool = False,
+    backend: str = "netcdf",
     **kwargs,
 ):
     """
@@ -293,7 +308,7 @@ def binary_to_nc(
         Timeseries files are created by pyglider's binary_to_timeseries;
         both 'engineering' and 'science' timeseries files are created.
         Eng and sci files have m_depth and sci_water_temp as the time bases,
-        respectively. Gridded files are created by pyglider's make_gridfiles,
+        respectively. Gridded files are created by make_gridfiles_esd,
         using the science timeseries as the input.
         Both 1m and 5m gridded datasets are created.
         Note: if True then any existing files will be clobbered
@@ -304,6 +319,62 @@ def binary_to_nc(
     file_path: str | None, default None
         The path of the parent processing script.
         If provided, will be included in the history attribute
+    max_workers : int | None, default 1
+        Number of processes used to decode the binary files
+        when generating the raw timeseries; passed to binary_to_raw_timeseries.
+        If 1, all files are decoded by a single dbdreader call.
+        If None, all cores are used, as determined by os.cpu_count()
+    incremental_raw : bool, default False
+        If True, the existing raw timeseries file is not clobbered.
+        Instead, only binary files that are not already in the raw timeseries,
+        by name, size and mtime, are decoded and appended;
+        see binary_to_raw_timeseries.
+        Intended for real-time processing, as new files arrive
+    decoded_cache : bool, default False
+        If True, the raw timeseries is generated using the decoded-binary
+        cache in paths["decodedcachedir"]. Binary files are then only decoded
+        if they are new or changed, e.g. not when rerunning after yaml edits.
+        Cache files are invalidated if the dbdreader version changes.
+        Only the raw timeseries uses this cache: the engineering timeseries,
+        and the science timeseries if sci_timeseries_pyglider,
+        are generated by pyglider's binary_to_timeseries, which decodes
+        the binary files itself. With sci_timeseries_pyglider=False,
+        the science timeseries is generated from the raw timeseries,
+        and so the binary files are only decoded again for the eng timeseries
+    parallel_timeseries : bool, default False
+        If True, the engineering and science timeseries are generated and
+        post-processed concurrently, in separate processes.
+        The gridded files are generated as soon as the science timeseries
+        is written, and the eng/sci cross-checks are run after both finish
+    skip_unchanged : bool, default False
+        If True, products are only (re)generated if their inputs have changed.
+        The fingerprint of the inputs of each product is always stored in
+        the product's utils.fingerprint_attr attribute; see stage_fingerprints.
+        If write_raw/write_timeseries/write_gridded is True, and the existing
+        product has the same fingerprint, then that product is not regenerated.
+        Products are written to a local staging area, and published with
+        their fingerprint only once complete (see utils.staged_output).
+        Thus, rerunning an interrupted run with skip_unchanged=True resumes
+        from the last completed product
+    sci_window : str | None, default None
+        Only used if sci_timeseries_pyglider is False. If not None, the science
+        timeseries is generated from the raw timeseries file in time windows of
+        this length (e.g., '1D'), to bound memory use for long deployments.
+        See the window argument of timeseries_raw_to_sci
+    incremental_gridded : bool, default False
+        If True, the existing gridded files are not clobbered. Instead,
+        only profiles that are new or changed are regridded;
+        see the incremental argument of make_gridfiles_esd.
+        If incremental_raw is also True, and the science timeseries is
+        generated from the raw timeseries, then only profiles with data
+        after the rows that can change are hashed (see _raw_frozen_since).
+        Intended for real-time processing, as new files arrive
+    backend : str, default 'netcdf'
+        The output backend of the raw, engineering, science, and gridded
+        products, either 'netcdf' or 'zarr'. If 'zarr', the products are
+        time-chunked Zarr stores, with the '.zarr' extension rather than '.nc'
+        (see utils.backend_ext). Use utils.zarr_to_netcdf_esd to convert
+        a Zarr store to IOOS-compliant NetCDF, e.g. for NGDAC or ERDDAP
     **kwargs
         Optional arguments passed to utils.findProfiles
 
@@ -354,15 +425,47 @@ def binary_to_nc(
         "maxgap": maxgap_esd,
     }
 
+    # Input fingerprints of each product, and the products to (re)generate
+    fingerprints = stage_fingerprints(
+        paths,
+        binary_search,
+        sci_timeseries_pyglider=sci_timeseries_pyglider,
+        **kwargs,
+    )
+
+    def _is_unchanged(stage, outnames):
+        if not skip_unchanged:
+            return False
+        unchanged = all(
+            utils.read_fingerprint(i) == fingerprints[stage] for i in outnames
+        )
+        if unchanged:
+            _log.info("The inputs of the %s product(s) have not changed", stage)
+        return unchanged
+
+    outname_tsraw = utils.product_path(paths["tsrawpath"], backend)
+    outname_tseng = utils.product_path(paths["tsengpath"], backend)
+    outname_tssci = utils.product_path(paths["tsscipath"], backend)
+    outname_gr1m = utils.product_path(paths["gr1path"], backend)
+    outname_gr5m = utils.product_path(paths["gr5path"], backend)
+    build_raw = write_raw and not (
+        _is_unchanged("raw", [outname_tsraw]) and os.path.isfile(paths["profsummpath"])
+    )
+    build_eng = write_timeseries and not _is_unchanged("eng", [outname_tseng])
+    build_sci = write_timeseries and not _is_unchanged("sci", [outname_tssci])
+    build_gridded = write_gridded and not _is_unchanged(
+        "gridded",
+        [outname_gr1m, outname_gr5m],
+    )
+
     # --------------------------------------------
     # Raw
-    outname_tsraw = paths["tsrawpath"]
-    if write_raw:
-        utils.remove_file(outname_tsraw)
+    if build_raw:
+        postproc_info["inputs_fingerprint"] = fingerprints["raw"]
         utils.makedirs_pass(rawdir)
 
         _log.info("Generating raw nc")
-        outname_tsraw = binary_to_raw_timeseries(
+        tsraw = binary_to_raw_timeseries(
             paths["binarydir"],
             paths["cacdir"],
             rawdir,
@@ -371,15 +474,20 @@ def binary_to_nc(
             include_source=True,
             fnamesuffix=f"-{mode}-raw",
             pp=postproc_info,
+            max_workers=max_workers,
+            incremental=incremental_raw,
+            decodedcachedir=paths["decodedcachedir"] if decoded_cache else None,
+            backend=backend,
             **kwargs,
         )
 
-        # Save profile summary
-        tsraw = xr.load_dataset(outname_tsraw)
+        # Save profile summary, and pass it in memory to post-processing
         prof_summ_path = postproc_info["profile_summary_path"]
         _log.info("Writing profile summary CSV to %s", prof_summ_path)
         prof_summ = utils.calc_profile_summary(tsraw, "depth_measured")
-        prof_summ.to_csv(prof_summ_path, index=False)
+        with utils.staged_output(prof_summ_path) as stage_path:
+            prof_summ.to_csv(stage_path, index=False)
+        postproc_info["profile_summary"] = prof_summ
         num_dives = np.count_nonzero(prof_summ.profile_direction.values == 1)
         _log.info("Deployment %s performed %s dives", deployment_name, num_dives)
 
@@ -391,82 +499,96 @@ def binary_to_nc(
         _log.info("raw timeseries checks")
         utils.check_profiles(prof_summ)
         utils.check_depth(tsraw["depth_measured"], tsraw["depth_ctd"])
+        if incremental_raw:
+            # tsraw may be lazily opened from the file
+            tsraw.close()
+            tsraw = outname_tsraw
 
     else:
-        _log.info("Not writing raw nc")
+        _log.info("Not (re)generating raw nc")
         with xr.open_dataset(outname_tsraw) as tsraw:
             # tsraw = xr.load_dataset(outname_tsraw)
             postproc_info["deployment_start"] = tsraw.attrs["deployment_start"]
             postproc_info["deployment_end"] = tsraw.attrs["deployment_end"]
+        tsraw = outname_tsraw
+
+    # If the science timeseries is generated from the incremental raw
+    # timeseries, its rows before this time do not change as data are added
+    frozen = None
+    if incremental_raw and build_sci and not sci_timeseries_pyglider:
+        ncvar = pgutils._get_deployment(paths["deploymentyaml"])["netcdf_variables"]
+        frozen = _raw_frozen_since(
+            outname_tsraw,
+            [*ncvar.keys(), "depth_measured", "depth_ctd"],
+            postproc_info["maxgap"],
+        )
 
     # --------------------------------------------
     # Timeseries
-    outname_tseng = paths["tsengpath"]
-    outname_tssci = paths["tsscipath"]
-    outname_gr1m = paths["gr1path"]
-    outname_gr5m = paths["gr5path"]
-    if write_timeseries:
-        # Delete previous files before starting run. Can't delete whole directory
-        # Since gridded depend on ts, also delete gridded
-        utils.remove_file(outname_tseng)
-        utils.remove_file(outname_tssci)
-        utils.remove_file(outname_gr1m)
-        utils.remove_file(outname_gr5m)
+    gridded_done = False
+    if build_eng or build_sci:
+        # Previous files are not deleted before starting the run. Products are
+        # written to a staging area, and only replace the previous files
+        # once complete (see utils.staged_output)
         utils.makedirs_pass(tsdir)
 
         # Engineering - uses m_depth as time base
-        _log.info("Generating engineering timeseries")
-        outname_tseng = pgslocum.binary_to_timeseries(
-            paths["binarydir"],
-            paths["cacdir"],
-            tsdir,
-            [deploymentyaml, paths["engyaml"]],
-            search=binary_search,
-            fnamesuffix=f"-{mode}-eng",
-            time_base="m_depth",
-            profile_filt_time=None,  # type: ignore
-            maxgap=maxgap_esd,
-        )
-
-        _log.info(f"Post-processing engineering timeseries: {outname_tseng}")
-        tseng = xr.load_dataset(outname_tseng)
-        tseng = postproc_eng_timeseries(tseng, postproc_info, **kwargs)
-        utils.to_netcdf_esd(tseng, outname_tseng)
-
-        if sci_timeseries_pyglider:
-            # Science - uses sci_water_pressure as time_base sensor
-            _log.info("Generating science timeseries")
-            outname_tssci = pgslocum.binary_to_timeseries(
-                paths["binarydir"],
-                paths["cacdir"],
-                tsdir,
-                deploymentyaml,
-                search=binary_search,
-                fnamesuffix=f"-{mode}-sci",
-                time_base="sci_water_pressure",
-                profile_filt_time=None,  # type: ignore
-                maxgap=maxgap_esd,
-            )
-
-            _log.info(f"Post-processing science timeseries: {outname_tssci}")
-            postproc_info["drop_vars"] = ["pressure"]
-            tssci = xr.load_dataset(outname_tssci)
-            tssci = postproc_sci_timeseries(tssci, postproc_info, **kwargs)
-            utils.to_netcdf_esd(tssci, outname_tssci)
+        # Science - uses sci_water_pressure as time_base sensor, or the raw data
+        pp_eng = postproc_info | {"inputs_fingerprint": fingerprints["eng"]}
+        pp_sci = postproc_info | {"inputs_fingerprint": fingerprints["sci"]}
+        eng_args = (paths, binary_search, pp_eng, outname_tseng)
+        sci_args = (paths, binary_search, pp_sci, outname_tssci)
+        eng_kwargs = kwargs | {"backend": backend}
+        sci_kwargs = eng_kwargs | {
+            "sci_timeseries_pyglider": sci_timeseries_pyglider,
+            "tsraw": None if sci_timeseries_pyglider else tsraw,
+            "sci_window": sci_window,
+        }
+        if (sci_window is not None) and not sci_timeseries_pyglider:
+            # Windowed processing reads the raw timeseries from its file
+            sci_kwargs["tsraw"] = outname_tsraw
+        if parallel_timeseries and build_eng and build_sci:
+            _log.info("Generating engineering and science timeseries concurrently")
+            with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+                future_eng = executor.submit(
+                    _timeseries_check_vars,
+                    make_eng_timeseries,
+                    *eng_args,
+                    **eng_kwargs,
+                )
+                future_sci = executor.submit(
+                    _timeseries_check_vars,
+                    make_sci_timeseries,
+                    *sci_args,
+                    **sci_kwargs,
+                )
 
+                # Grid the science timeseries while the eng timeseries finishes
+                tssci = future_sci.result()
+                if build_gridded:
+                    grid_esd(
+                        outname_tssci,
+                        paths,
+                        fingerprints["gridded"],
+                        incremental=incremental_gridded,
+                        backend=backend,
+                        frozen=frozen,
+                    )
+                    gridded_done = True
+                tseng = future_eng.result()
         else:
-            _log.info("Generating science timeseries, via raw_to_sci_timeseries")
-            outname_tssci = timeseries_raw_to_sci(
-                outname_tsraw,
-                tsdir,
-                deploymentyaml,
-                fnamesuffix=f"-{mode}-sci",
-                maxgap=maxgap_esd,
-                pp=postproc_info,
-                **kwargs,
-            )
-            # raw_to_sci_timeseries calls postproc_sci_timeseries internally
-            tssci = xr.load_dataset(outname_tssci)
+            if build_eng:
+                tseng = make_eng_timeseries(*eng_args, **eng_kwargs)
+            else:
+                _log.info("Not regenerating engineering timeseries")
+                with xr.open_dataset(outname_tseng) as ds:
+                    tseng = ds[["profile_index", "depth"]].load()
+            if build_sci:
+                tssci = make_sci_timeseries(*sci_args, **sci_kwargs)
+            else:
+                _log.info("Not regenerating science timeseries")
+                with xr.open_dataset(outname_tssci) as ds:
+                    tssci = ds[["profile_index", "depth"]].load()
 
         _log.info("final eng/sci timeseries checks")
         # Brief profile sanity check - check_profiles done in postproc-general
@@ -490,12 +612,21 @@ def binary_to_nc(
         utils.check_depth(tseng["depth"], tssci["depth"])
 
     else:
-        _log.info("Not writing timeseries nc")
+        _log.info("Not (re)generating timeseries nc")
 
     # --------------------------------------------
     # Gridded data, 1m and 5m
-    if write_gridded:
-        grid_esd(outname_tssci, paths=paths)
+    if gridded_done:
+        _log.info("Gridded nc were generated with the science timeseries")
+    elif build_gridded:
+        grid_esd(
+            outname_tssci,
+            paths,
+            fingerprints["gridded"],
+            incremental=incremental_gridded,
+            backend=backend,
+            frozen=frozen,
+        )
 
         # utils.remove_file(outname_gr1m)
         # utils.remove_file(outname_gr5m)
@@ -537,6 +668,243 @@ def binary_to_nc(
     }
 
 
+def stage_fingerprints(
+    paths: dict,
+    binary_search: str,
+    *,
+    sci_timeseries_pyglider: bool = True,
+    **kwargs,
+) -> dict:
+    """
+    Calculate the fingerprints of the inputs of each binary_to_nc product.
+    Inputs include the binary file manifest, the deployment and package
+    yaml file hashes, esdglider/pyglider/dbdreader versions, and
+    findProfiles arguments. Each fingerprint includes the fingerprint of
+    the upstream product: raw -> eng/sci -> gridded -> ngdac profiles
+
+    Parameters
+    ----------
+    paths : dict
+        A dictionary of file/directory paths; output of get_path_glider()
+    binary_search : str
+        The search pattern for the binary files, e.g. for rt or delayed data
+    sci_timeseries_pyglider : bool
+        Is the science timeseries generated by pyglider?
+    **kwargs
+        Optional arguments passed to utils.findProfiles
+
+    Returns
+    -------
+    dict
+        A dictionary of the fingerprints (str), with keys
+        'raw', 'eng', 'sci', and 'gridded'
+    """
+    prof_opt = utils.profileOptionsList.copy()
+    prof_opt.update({k: v for k, v in kwargs.items() if k in prof_opt.keys()})
+    common = {
+        "versions": {
+            i: metadata.version(i) for i in ["esdglider", "pyglider", "dbdreader"]
+        },
+        "mode": paths["mode"],
+        "deploymentyaml": utils.file_hash(paths["deploymentyaml"]),
+        "findProfiles": prof_opt,
+    }
+    binary = utils.binary_manifest(paths["binarydir"], binary_search)
+
+    fingerprints = {}
+    fingerprints["raw"] = utils.stage_fingerprint(
+        common
+        | {
+            "binary": binary,
+            "engyaml": utils.file_hash(paths["engyaml"]),
+            "rawyaml": utils.file_hash(paths["rawyaml"]),
+        },
+    )
+    fingerprints["eng"] = utils.stage_fingerprint(
+        common
+        | {
+            "binary": binary,
+            "engyaml": utils.file_hash(paths["engyaml"]),
+            "raw": fingerprints["raw"],
+        },
+    )
+    fingerprints["sci"] = utils.stage_fingerprint(
+        common
+        | {
+            "binary": binary if sci_timeseries_pyglider else None,
+            "sci_timeseries_pyglider": sci_timeseries_pyglider,
+            "raw": fingerprints["raw"],
+        },
+    )
+    fingerprints["gridded"] = utils.stage_fingerprint(
+        common
+        | {
+            "bin_size": bin_size,
+            "depth_max": depth_max,
+            "gridded_exclude_vars": gridded_exclude_vars,
+            "sci": fingerprints["sci"],
+        },
+    )
+
+    return fingerprints
+
+
+def make_eng_timeseries(
+    paths: dict,
+    binary_search: str,
+    pp: dict,
+    outname: str,
+    *,
+    backend: str = "netcdf",
+    **kwargs,
+) -> xr.Dataset:
+    """
+    Generate, post-process, and write the engineering timeseries.
+    The timeseries is generated by pyglider.slocum.binary_to_timeseries,
+    with m_depth as the time base. Called by binary_to_nc
+
+    pyglider decodes the binary files itself, so the decoded-binary cache
+    (see binary_to_raw_timeseries) is not used. pyglider writes its output to a local temporary directory, so that
+    only the post-processed timeseries is written to outname
+
+    Parameters
+    ----------
+    paths : dict
+        A dictionary of file/directory paths; output of get_path_glider()
+    binary_search : str
+        The search pattern for the binary files, e.g. for rt or delayed data
+    pp : dict
+        Dictionary with info needed for post-processing
+    outname : str
+        Path to which to write the engineering timeseries
+    backend : str, default 'netcdf'
+        The output backend, either 'netcdf' or 'zarr'; see utils.write_esd
+    **kwargs
+        Optional arguments passed to utils.findProfiles
+
+    Returns
+    -------
+    xarray.Dataset
+        The engineering timeseries
+    """
+    mode = paths["mode"]
+    _log.info("Generating engineering timeseries")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        outname_tmp = pgslocum.binary_to_timeseries(
+            paths["binarydir"],
+            paths["cacdir"],
+            temp_dir,
+            [paths["deploymentyaml"], paths["engyaml"]],
+            search=binary_search,
+            fnamesuffix=f"-{mode}-eng",
+            time_base="m_depth",
+            profile_filt_time=None,  # type: ignore
+            maxgap=pp["maxgap"],
+        )
+        tseng = xr.load_dataset(outname_tmp)
+
+    _log.info(f"Post-processing engineering timeseries: {outname}")
+    tseng = postproc_eng_timeseries(tseng, pp, **kwargs)
+    utils.write_esd(
+        tseng,
+        outname,
+        backend=backend,
+        policy=utils.get_encoding_policy(paths["deploymentyaml"]),
+    )
+
+    return tseng
+
+
+def make_sci_timeseries(
+    paths: dict,
+    binary_search: str,
+    pp: dict,
+    outname: str,
+    *,
+    sci_timeseries_pyglider: bool = True,
+    tsraw: xr.Dataset | str | None = None,
+    sci_window: str | None = None,
+    backend: str = "netcdf",
+    **kwargs,
+) -> xr.Dataset:
+    """
+    Generate, post-process, and write the science timeseries.
+    Called by binary_to_nc
+
+    If sci_timeseries_pyglider, the timeseries is generated by
+    pyglider.slocum.binary_to_timeseries, with sci_water_pressure as the
+    time base. Otherwise, the timeseries is generated from the raw timeseries
+    tsraw (a Dataset or path) by timeseries_raw_to_sci.
+    If sci_window is not None, then tsraw must be a path, and the science
+    timeseries is generated and written in windows of length sci_window;
+    see the window argument of timeseries_raw_to_sci.
+    See make_eng_timeseries for the other arguments
+
+    Returns
+    -------
+    xarray.Dataset
+        The science timeseries
+    """
+    mode = paths["mode"]
+    if sci_timeseries_pyglider:
+        _log.info("Generating science timeseries")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            outname_tmp = pgslocum.binary_to_timeseries(
+                paths["binarydir"],
+                paths["cacdir"],
+                temp_dir,
+                paths["deploymentyaml"],
+                search=binary_search,
+                fnamesuffix=f"-{mode}-sci",
+                time_base="sci_water_pressure",
+                profile_filt_time=None,  # type: ignore
+                maxgap=pp["maxgap"],
+            )
+            tssci = xr.load_dataset(outname_tmp)
+
+        _log.info(f"Post-processing science timeseries: {outname}")
+        pp_sci = pp | {"drop_vars": ["pressure"]}
+        tssci = postproc_sci_timeseries(tssci, pp_sci, **kwargs)
+
+    else:
+        if tsraw is None:
+            raise ValueError("tsraw must be provided if not sci_timeseries_pyglider")
+        _log.info("Generating science timeseries, via raw_to_sci_timeseries")
+        # raw_to_sci_timeseries calls postproc_sci_timeseries internally
+        # In windowed mode, it also writes the science timeseries
+        tssci = timeseries_raw_to_sci(
+            tsraw,
+            None if sci_window is None else os.path.dirname(outname),
+            paths["deploymentyaml"],
+            fnamesuffix=f"-{mode}-sci",
+            maxgap=pp["maxgap"],
+            pp=pp,
+            window=sci_window,
+            backend=backend,
+            **kwargs,
+        )
+        if sci_window is not None:
+            return tssci
+    utils.write_esd(
+        tssci,
+        outname,
+        backend=backend,
+        policy=utils.get_encoding_policy(paths["deploymentyaml"]),
+    )
+
+    return tssci
+
+
+def _timeseries_check_vars(func, *args, **kwargs) -> xr.Dataset:
+    """
+    Run func, i.e. make_eng_timeseries or make_sci_timeseries,
+    and return only the variables needed by the binary_to_nc cross-checks.
+    Used so that full timeseries are not passed between processes
+    """
+    ds = func(*args, **kwargs)
+    return ds[["profile_index", "depth"]].load()
+
+
 def postproc_attrs(ds: xr.Dataset, pp: dict):
     """
     Update attrbites of xarray DataSet ds
@@ -581,6 +949,10 @@ def postproc_attrs(ds: xr.Dataset, pp: dict):
         + "Data provided as is, with no expressed or implied assurance "
         + "of quality assurance or quality control."
     )
+    # Fingerprint of the inputs, used to determine if products need updating
+    if "inputs_fingerprint" in pp.keys():
+        ds.attrs[utils.fingerprint_attr] = pp["inputs_fingerprint"]
+
     file_info = pp["file_info"]
     if file_info is None:
         file_info = "netCDF files created using"
@@ -609,9 +981,73 @@ def postproc_general(
     """
 
     # VALUES
-    # Remove times that are nan or <min_dt, and drop other bogus values
+    ds = _postproc_values(ds, pp)
+
+    # After dropping timestamps, recalculate distance over ground
+    ds = pgutils.get_distance_over_ground(ds)
+
+    # Calculate profiles using measured depth
+    # This is required because we need profile_direction for sci/eng
+    ds = utils.get_fill_profiles(ds, "time", "depth", **kwargs)
+
+    # If provided, then update the profile indices by joining raw profiles
+    # The profile summary may be passed in memory, rather than as a path
+    if ("profile_summary" in pp.keys()) or ("profile_summary_path" in pp.keys()):
+        # Join profiles generated using raw timeseries
+        if "profile_summary" in pp.keys():
+            prof_summ = pp["profile_summary"]
+        else:
+            prof_summ = pd.read_csv(
+                pp["profile_summary_path"],
+                parse_dates=["start_time", "end_time"],
+            )
+        ds = utils.join_profiles(ds, prof_summ, **kwargs)
+        depth_var = "depth"
+    else:
+        # Assuming the raw dataset
+        depth_var = "depth_measured"
+
+    # ATTRIBUTES, after dropping vars, etc
+    ds = postproc_attrs(ds, pp)
+
+    # Profiles check
+    prof_summ = utils.calc_profile_summary(ds, depth_var)
+    utils.check_profiles(prof_summ)
+
+    return ds
+
+
+def _postproc_values(ds: xr.Dataset, pp: dict) -> xr.Dataset:
+    """
+    The row-wise value steps of postproc_general: drop bogus values,
+    duplicated timestamps, and nan values for pp["drop_vars"].
+    Separated so they can also be run on windows of a timeseries
+
+    Returns the ds Dataset with updated values
+    """
+
+    # Remove times that are nan or <min_dt, and drop other bogus values.
+    # Valid ranges in the deployment yaml override the default valid ranges
     _log.info("The given timeseries has %s data points", ds.time.shape[0])
-    ds = utils.drop_bogus(ds, min_dt=ds.deployment_min_dt, max_drop=True)
+    valid_ranges = utils.valid_ranges_default
+    if "deploymentyaml" in pp.keys():
+        valid_ranges_yaml = utils.get_valid_ranges(pp["deploymentyaml"])
+        for var, vrange in valid_ranges_yaml.items():
+            if (var in valid_ranges) and (vrange != valid_ranges[var]):
+                _log.info(
+                    "Using the deployment yaml valid range of %s (%s), "
+                    + "rather than the default (%s)",
+                    var,
+                    vrange,
+                    valid_ranges[var],
+                )
+        valid_ranges = valid_ranges | valid_ranges_yaml
+    ds = utils.drop_bogus(
+        ds,
+        min_dt=ds.deployment_min_dt,
+        max_drop=True,
+        valid_ranges=valid_ranges,
+    )
 
     # Check for and verbosely remove any duplicated timestamps
     ds_index = ds.get_index("time")
@@ -645,33 +1081,6 @@ def postproc_general(
                 if (num_orig - len(ds.time)) > 0:
                     _log.info(f"Dropped {num_orig - len(ds.time)} nan {var} values")
 
-    # After dropping timestamps, recalculate distance over ground
-    ds = pgutils.get_distance_over_ground(ds)
-
-    # Calculate profiles using measured depth
-    # This is required because we need profile_direction for sci/eng
-    ds = utils.get_fill_profiles(ds, "time", "depth", **kwargs)
-
-    # If provided, then update the profile indices by joining raw profiles
-    if "profile_summary_path" in pp.keys():
-        # Join profiles generated using raw timeseries
-        prof_summ = pd.read_csv(
-            pp["profile_summary_path"],
-            parse_dates=["start_time", "end_time"],
-        )
-        ds = utils.join_profiles(ds, prof_summ, **kwargs)
-        depth_var = "depth"
-    else:
-        # Assuming the raw dataset
-        depth_var = "depth_measured"
-
-    # ATTRIBUTES, after dropping vars, etc
-    ds = postproc_attrs(ds, pp)
-
-    # Profiles check
-    prof_summ = utils.calc_profile_summary(ds, depth_var)
-    utils.check_profiles(prof_summ)
-
     return ds
 
 
@@ -774,8 +1183,19 @@ def postproc_sci_timeseries(ds: xr.Dataset, pp: dict, **kwargs) -> xr.Dataset:
     #       and often have weird associated values
     # drop_vars is now part of pp
     ds = postproc_general(ds, pp, **kwargs)
+    ds = _postproc_sci_finish(ds, pp)
+
+    _log.debug("end sci postproc: ds has %s values", len(ds.time))
+    # utils.to_netcdf_esd(ds, ds_file)
+
+    return ds
 
-    # Science-specific attribute updates
+
+def _postproc_sci_finish(ds: xr.Dataset, pp: dict) -> xr.Dataset:
+    """
+    Science-specific attribute updates and variable reordering,
+    the last steps of postproc_sci_timeseries
+    """
     ds.attrs["processing_level"] += (
         " Science values have been interpolated via linear fill, "
         + f"with a maxgap of {pp['maxgap']} seconds. "
@@ -798,9 +1218,6 @@ def postproc_sci_timeseries(ds: xr.Dataset, pp: dict, **kwargs) -> xr.Dataset:
     new_start[2:2] = sorted([i for i in ds.keys() if "depth" in i])  # type: ignore
     ds = utils.data_var_reorder(ds, new_start)
 
-    _log.debug("end sci postproc: ds has %s values", len(ds.time))
-    # utils.to_netcdf_esd(ds, ds_file)
-
     return ds
 
 
@@ -848,7 +1265,7 @@ def drop_ts_ranges(
         Path to profile summary CSV. Ignored if dstype is raw.
         If not None and dstype is eng or sci, will join profiles
     outname : str | None (default None)
-        If not None, then ds is written to this path using utils.to_netcdf_esd
+        If not None, then ds is written to this path using utils.write_esd
 
     Returns
     -------
@@ -893,7 +1310,8 @@ def drop_ts_ranges(
         _log.info("Calculating new profiles for raw dataset")
         tsraw = utils.get_fill_profiles(ds, "time", "depth_measured", **kwargs)
         prof_summ = utils.calc_profile_summary(tsraw, "depth_measured")
-        prof_summ.to_csv(profsummdir, index=False)
+        with utils.staged_output(profsummdir) as stage_path:
+            prof_summ.to_csv(stage_path, index=False)
         utils.check_profiles(prof_summ)
     elif profsummdir is not None:
         _log.info("Join-calculating new profiles for eng/sci dataset")
@@ -906,17 +1324,145 @@ def drop_ts_ranges(
 
     # Write to netcdf
     if outname is not None:
-        utils.to_netcdf_esd(ds, outname)
+        utils.write_esd(ds, outname)
 
     return ds
 
 
-def ngdac_profiles(inname, outdir, deploymentyaml, force=False):
+def _ngdac_profile_write(
+    dss: xr.Dataset,
+    p,
+    outname: str,
+    shared: dict,
+    profile_meta: dict,
+    inputs_fingerprint: str,
+    policy: dict | None = None,
+):
+    """
+    Add the profile variables to dss, the timeseries data of profile p,
+    and write the NGDAC profile file outname.
+    shared is a dictionary of the variables that are the same for all
+    profiles, e.g. trajectory and platform. policy is the encoding policy
+    passed to utils.netcdf_encoding. Worker function for ngdac_profiles
+    """
+    dss["trajectory"] = shared["trajectory"]
+
+    # profile-averaged variables....
+    if "water_velocity_eastward" in dss.keys():
+        dss["u"] = dss.water_velocity_eastward.mean()
+        dss["u"].attrs = profile_meta["u"]
+
+        dss["v"] = dss.water_velocity_northward.mean()
+        dss["v"].attrs = profile_meta["v"]
+    else:
+        dss["u"] = shared["u"]
+        dss["v"] = shared["v"]
+
+    dss["profile_id"] = np.int32(p)
+    dss["profile_id"].attrs = shared["profile_id"].attrs
+
+    dss["profile_time"] = dss.time.mean()
+    dss["profile_time"].attrs = shared["profile_time"].attrs
+    dss["profile_lon"] = dss.longitude.mean()
+    dss["profile_lon"].attrs = profile_meta["profile_lon"]
+    dss["profile_lat"] = dss.latitude.mean()
+    dss["profile_lat"].attrs = profile_meta["profile_lat"]
+
+    dss["lat"] = dss["latitude"]
+    dss["lon"] = dss["longitude"]
+    for key in ["platform", "lat_uv", "lon_uv", "time_uv", *shared["instruments"]]:
+        dss[key] = shared[key]
+
+    dss.attrs["date_modified"] = str(np.datetime64("now")) + "Z"
+    dss.attrs[utils.fingerprint_attr] = inputs_fingerprint
+
+    # ancillary variables: link and create with values of 2.  If
+    # we dont' want them all 2, then create these variables in the
+    # time series
+    to_fill = [
+        "temperature",
+        "pressure",
+        "conductivity",
+        "salinity",
+        "density",
+        "lon",
+        "lat",
+        "depth",
+    ]
+    for name in to_fill:
+        qcname = name + "_qc"
+        dss[name].attrs["ancillary_variables"] = qcname
+        if qcname not in dss.keys():
+            dss[qcname] = ("time", 2 * np.ones(len(dss[name]), np.int8))
+            dss[qcname].attrs = pgutils.fill_required_qcattrs({}, name)
+            # 2 is "not eval"
+
+    # The trajectory string dimension is named traj_strlen to make IOOS happy
+    _log.info("Writing %s", outname)
+    timeunits = "seconds since 1970-01-01T00:00:00Z"
+    timecalendar = "gregorian"
+    dss, encoding = utils.netcdf_encoding(dss, policy)
+    encoding["time"] = encoding.get("time", {}) | {
+        "units": timeunits,
+        "calendar": timecalendar,
+        "dtype": "float64",
+    }
+    encoding["profile_time"] = {
+        "units": timeunits,
+        "_FillValue": -99999.0,
+        "dtype": "float64",
+    }
+    encoding["trajectory"] = {"char_dim_name": "traj_strlen"}
+    with utils.staged_output(outname) as stage_path:
+        dss.to_netcdf(stage_path, encoding=encoding)
+
+    return outname
+
+
+def _ngdac_profile_batch(inname, batch: list, **kwargs) -> list:
+    """
+    Write the NGDAC profile files of batch, a list of (rows, p, outname),
+    with the rows of each profile read from the timeseries file inname.
+    Workers are passed the path and rows, rather than the profile data,
+    and inname is opened once per batch. kwargs are passed to
+    _ngdac_profile_write. Worker function for ngdac_profiles
+    """
+    with xr.open_dataset(inname, cache=False) as ds:
+        for rows, p, outname in batch:
+            _ngdac_profile_write(ds.isel(time=rows).load(), p, outname, **kwargs)
+
+    return [i[2] for i in batch]
+
+
+def _ngdac_manifest_path(outdir) -> str:
+    """
+    Path of the NGDAC profile file manifest in outdir,
+    used by ngdac_profiles when incremental is True
+    """
+    return os.path.join(outdir, "ngdac-manifest.json")
+
+
+def ngdac_profiles(
+    inname,
+    outdir,
+    deploymentyaml,
+    force=False,
+    skip_unchanged=False,
+    max_workers: int | None = 1,
+    incremental: bool = False,
+):
     """
     ESD's version of extract_timeseries_profiles, from:
     https://github.com/c-proof/pyglider/blob/main/pyglider/ncprocess.py#L19
 
     Extract and save each profile from a timeseries netCDF.
+    The timeseries is opened lazily, and the rows of each profile are found
+    with a single sort of profile_index. Only the rows of the profile
+    being written are read. The variables that are the same
+    for all profiles (e.g., trajectory, platform, and instruments)
+    are created once, and shared by all profile files.
+    File names have minute resolution: if several profiles have the same
+    file name, only the first of these profiles is written
 
     Parameters
     ----------
@@ -929,6 +1475,23 @@ def ngdac_profiles(inname, outdir, deploymentyaml, force=False):
         be the same yaml file that was used to make the timeseries file.
     force : bool, default False
         Force an overwite even if profile netcdf already exists
+    skip_unchanged : bool, default False
+        If True, then existing profile netcdf files are not overwritten,
+        even if force is True, if their inputs fingerprint is unchanged.
+        The fingerprint includes the timeseries file inputs fingerprint
+        (see binary_to_nc) and the deployment yaml
+    max_workers : int | None, default 1
+        Number of processes used to write the profile files.
+        If 1, the files are written serially.
+        If None, all cores are used, as determined by os.cpu_count()
+    incremental : bool, default False
+        If True, a manifest ('ngdac-manifest.json') in outdir maps each
+        profile file to the time range and a fingerprint of the data of its
+        profile, as well as the deployment yaml and variable attributes.
+        Only profiles that are new, or whose fingerprint has changed,
+        are written, and profile files in the manifest that are no longer
+        produced are removed. force and skip_unchanged are ignored.
+        Intended for real-time processing
 
     Returns
     -------
@@ -948,154 +1511,193 @@ def ngdac_profiles(inname, outdir, deploymentyaml, force=False):
     instrument_str = ",".join(list(instrument_meta.keys()))
 
     meta = deployment["metadata"]
-    with xr.open_dataset(inname) as ds:
-        _log.info("Extracting profiles: opening %s", inname)
-        trajectory = ds.attrs["id"].encode()
-        trajlen = len(trajectory)
-
-        profiles = np.unique(ds.profile_index)
-        profiles = [p for p in profiles if (~np.isnan(p) and not (p % 1) and (p > 0))]
-        for p in profiles:
-            ind = np.where(ds.profile_index == p)[0]
-            dss = ds.isel(time=ind)
-            outname = outdir + "/" + utils.get_file_id_esd(dss) + ".nc"
-            _log.info("Checking %s", outname)
-            if force or (not os.path.exists(outname)):
-                # this is the id for the whole file, not just this profile..
-                dss["trajectory"] = trajectory
-                # dss['trajectory'] = utils.get_file_id(ds).encode()
-                # trajlen = len(utils.get_file_id(ds).encode())
-                dss["trajectory"].attrs["cf_role"] = "trajectory_id"
-                dss["trajectory"].attrs["comment"] = (
+    profile_meta = deployment["profile_variables"]
+    _log.info("Extracting profiles: opening %s", inname)
+    # Opened lazily, and not cached, so that only the rows of the profiles
+    # being written are read
+    with xr.open_dataset(inname, cache=False) as ds:
+        inputs_fingerprint = utils.stage_fingerprint(
+            {
+                "timeseries": ds.attrs.get(utils.fingerprint_attr),
+                "deploymentyaml": utils.file_hash(deploymentyaml),
+                "esdglider": metadata.version("esdglider"),
+            },
+        )
+
+        # Variables that are the same for all profiles
+        shared = {}
+        # this is the id for the whole file, not just this profile..
+        shared["trajectory"] = xr.DataArray(
+            ds.attrs["id"].encode(),
+            attrs={
+                "cf_role": "trajectory_id",
+                "comment": (
                     "A trajectory is a single"
                     "deployment of a glider and may span multiple data files."
+                ),
+                "long_name": "Trajectory/Deployment Name",
+            },
+        )
+        if "u" in profile_meta:
+            for i in ["u", "v"]:
+                shared[i] = xr.DataArray(
+                    profile_meta[i].get("_FillValue", np.nan),
+                    attrs=profile_meta[i],
                 )
-                dss["trajectory"].attrs["long_name"] = "Trajectory/Deployment Name"
-
-                # profile-averaged variables....
-                profile_meta = deployment["profile_variables"]
-                if "water_velocity_eastward" in dss.keys():
-                    dss["u"] = dss.water_velocity_eastward.mean()
-                    dss["u"].attrs = profile_meta["u"]
-
-                    dss["v"] = dss.water_velocity_northward.mean()
-                    dss["v"].attrs = profile_meta["v"]
-                elif "u" in profile_meta:
-                    dss["u"] = profile_meta["u"].get("_FillValue", np.nan)
-                    dss["u"].attrs = profile_meta["u"]
-
-                    dss["v"] = profile_meta["v"].get("_FillValue", np.nan)
-                    dss["v"].attrs = profile_meta["v"]
-                else:
-                    dss["u"] = np.nan
-                    dss["v"] = np.nan
-
-                dss["profile_id"] = np.int32(p)
-                dss["profile_id"].attrs = profile_meta["profile_id"]
-                if "_FillValue" not in dss["profile_id"].attrs:
-                    dss["profile_id"].attrs["_FillValue"] = -1
-                dss["profile_id"].attrs["valid_min"] = np.int32(
-                    dss["profile_id"].attrs["valid_min"],
-                )
-                dss["profile_id"].attrs["valid_max"] = np.int32(
-                    dss["profile_id"].attrs["valid_max"],
-                )
-
-                dss["profile_time"] = dss.time.mean()
-                dss["profile_time"].attrs = profile_meta["profile_time"]
-                # remove units so they can be encoded later:
-                try:
-                    del dss.profile_time.attrs["units"]
-                    del dss.profile_time.attrs["calendar"]
-                except KeyError:
-                    pass
-                dss["profile_lon"] = dss.longitude.mean()
-                dss["profile_lon"].attrs = profile_meta["profile_lon"]
-                dss["profile_lat"] = dss.latitude.mean()
-                dss["profile_lat"].attrs = profile_meta["profile_lat"]
-
-                dss["lat"] = dss["latitude"]
-                dss["lon"] = dss["longitude"]
-                dss["platform"] = np.int32(1)
-                comment = f"{meta['glider_model']} operated by {meta['institution']}"
-                dss["platform"].attrs["comment"] = comment
-                dss["platform"].attrs["id"] = meta["glider_name"]
-                dss["platform"].attrs["instrument"] = instrument_str
-                dss["platform"].attrs["long_name"] = (
-                    f"{meta['glider_model']} {dss['platform'].attrs['id']}"
+        else:
+            shared["u"] = xr.DataArray(np.nan)
+            shared["v"] = xr.DataArray(np.nan)
+
+        profile_id_attrs = profile_meta["profile_id"].copy()
+        if "_FillValue" not in profile_id_attrs:
+            profile_id_attrs["_FillValue"] = -1
+        profile_id_attrs["valid_min"] = np.int32(profile_id_attrs["valid_min"])
+        profile_id_attrs["valid_max"] = np.int32(profile_id_attrs["valid_max"])
+        shared["profile_id"] = xr.DataArray(np.int32(0), attrs=profile_id_attrs)
+
+        # remove units so they can be encoded later:
+        profile_time_attrs = profile_meta["profile_time"].copy()
+        for attr in ["units", "calendar", "_FillValue"]:
+            profile_time_attrs.pop(attr, None)
+        shared["profile_time"] = xr.DataArray(np.nan, attrs=profile_time_attrs)
+
+        shared["platform"] = xr.DataArray(
+            np.int32(1),
+            attrs={
+                "comment": f"{meta['glider_model']} operated by {meta['institution']}",
+                "id": meta["glider_name"],
+                "instrument": instrument_str,
+                "long_name": f"{meta['glider_model']} {meta['glider_name']}",
+                "type": "platform",
+                "wmo_id": meta["wmo_id"],
+                "_FillValue": -1,
+            },
+        )
+        for i in ["lat_uv", "lon_uv", "time_uv"]:
+            shared[i] = xr.DataArray(np.nan, attrs=profile_meta[i])
+        for key in instrument_meta.keys():
+            shared[key] = xr.DataArray(np.int32(1.0), attrs=instrument_meta[key].copy())
+            shared[key].attrs.setdefault("_FillValue", -1)
+        shared["instruments"] = list(instrument_meta.keys())
+
+        # Rows of each profile, from a stable sort of profile_index
+        pidx = ds["profile_index"].values
+        valid = ~np.isnan(pidx) & (pidx % 1 == 0) & (pidx > 0)
+        idx = np.flatnonzero(valid)
+        order = idx[np.argsort(pidx[idx], kind="stable")]
+        profiles, starts = np.unique(pidx[order], return_index=True)
+        ends = np.append(starts[1:], order.shape[0])
+
+        # If incremental, the fingerprint of the data of each profile
+        manifest_path = _ngdac_manifest_path(outdir)
+        if incremental:
+            manifest_old = {}
+            if os.path.isfile(manifest_path):
+                with open(manifest_path) as f:
+                    manifest_old = json.load(f)["profiles"]
+            manifest = {}
+            pbin = np.full(pidx.shape, -1)
+            pbin[order] = np.repeat(np.arange(profiles.shape[0]), ends - starts)
+            data_vars = [k for k, v in ds.variables.items() if "time" in v.dims]
+            hashes = _profile_hashes(
+                ds,
+                data_vars,
+                pbin,
+                valid,
+                np.ones(profiles.shape[0], dtype=bool),
+            )
+            inputs_profile = {
+                "deploymentyaml": utils.file_hash(deploymentyaml),
+                "esdglider": metadata.version("esdglider"),
+                "attrs": {k: ds[k].attrs for k in data_vars},
+            }
+
+        tasks = []
+        outnames = set()
+        for i, (p, start, end) in enumerate(zip(profiles, starts, ends)):
+            ind = order[start:end]
+            outname = (
+                outdir + "/" + utils.get_file_id_esd(ds.isel(time=ind[:1])) + ".nc"
+            )
+            _log.info("Checking %s", outname)
+            # File names have minute resolution: as when profiles were written
+            # one at a time, only the first profile with a file name is written
+            if outname in outnames:
+                _log.info("Profile %s has the same file name as a previous profile", p)
+                continue
+            outnames.add(outname)
+            if incremental:
+                ptime = ds.time.values[ind]
+                entry = {
+                    "profile": int(p),
+                    "time_start": str(ptime.min()),
+                    "time_end": str(ptime.max()),
+                }
+                entry["fingerprint"] = utils.stage_fingerprint(
+                    inputs_profile | entry | {"data": hashes[i]},
                 )
-                dss["platform"].attrs["type"] = "platform"
-                dss["platform"].attrs["wmo_id"] = meta["wmo_id"]
-                if "_FillValue" not in dss["platform"].attrs:
-                    dss["platform"].attrs["_FillValue"] = -1
-
-                dss["lat_uv"] = np.nan
-                dss["lat_uv"].attrs = profile_meta["lat_uv"]
-                dss["lon_uv"] = np.nan
-                dss["lon_uv"].attrs = profile_meta["lon_uv"]
-                dss["time_uv"] = np.nan
-                dss["time_uv"].attrs = profile_meta["time_uv"]
-
-                # dss['instrument_ctd'] = np.int32(1.0)
-                # dss['instrument_ctd'].attrs = profile_meta['instrument_ctd']
-                # if '_FillValue' not in dss['instrument_ctd'].attrs:
-                #     dss['instrument_ctd'].attrs['_FillValue'] = -1
-                for key in instrument_meta.keys():
-                    dss[key] = np.int32(1.0)
-                    dss[key].attrs = instrument_meta[key]
-                    if "_FillValue" not in dss[key].attrs:
-                        dss[key].attrs["_FillValue"] = -1
-
-                dss.attrs["date_modified"] = str(np.datetime64("now")) + "Z"
-
-                # ancillary variables: link and create with values of 2.  If
-                # we dont' want them all 2, then create these variables in the
-                # time series
-                to_fill = [
-                    "temperature",
-                    "pressure",
-                    "conductivity",
-                    "salinity",
-                    "density",
-                    "lon",
-                    "lat",
-                    "depth",
-                ]
-                for name in to_fill:
-                    qcname = name + "_qc"
-                    dss[name].attrs["ancillary_variables"] = qcname
-                    if qcname not in dss.keys():
-                        dss[qcname] = ("time", 2 * np.ones(len(dss[name]), np.int8))
-                        dss[qcname].attrs = pgutils.fill_required_qcattrs({}, name)
-                        # 2 is "not eval"
-
-                _log.info("Writing %s", outname)
-                timeunits = "seconds since 1970-01-01T00:00:00Z"
-                timecalendar = "gregorian"
-                try:
-                    del dss.profile_time.attrs["_FillValue"]
-                    del dss.profile_time.attrs["units"]
-                except KeyError:
-                    pass
-                dss.to_netcdf(
-                    outname,
-                    encoding={
-                        "time": {
-                            "units": timeunits,
-                            "calendar": timecalendar,
-                            "dtype": "float64",
-                        },
-                        "profile_time": {
-                            "units": timeunits,
-                            "_FillValue": -99999.0,
-                            "dtype": "float64",
-                        },
-                    },
+                manifest[os.path.basename(outname)] = entry
+                # Keyed by file name, which is unique after the check above.
+                # The entry is for this file only if it holds the same profile
+                entry_old = manifest_old.get(os.path.basename(outname), {})
+                if (
+                    (entry_old.get("profile") == entry["profile"])
+                    and (entry_old.get("fingerprint") == entry["fingerprint"])
+                    and os.path.isfile(outname)
+                ):
+                    _log.debug("Profile %s is unchanged", p)
+                    continue
+            elif skip_unchanged and (
+                utils.read_fingerprint(outname) == inputs_fingerprint
+            ):
+                _log.debug("Profile %s is unchanged", p)
+                continue
+            elif not (force or (not os.path.exists(outname))):
+                continue
+
+            if np.all(np.diff(ind) == 1):
+                ind = slice(ind[0], ind[-1] + 1)
+            tasks.append((ind, p, outname))
+
+        if max_workers is None:
+            max_workers = max(1, os.cpu_count())  # type: ignore
+        _log.info("Writing %s profile files with %s workers", len(tasks), max_workers)
+        write_kwargs = {
+            "shared": shared,
+            "profile_meta": profile_meta,
+            "inputs_fingerprint": inputs_fingerprint,
+            # NGDAC files keep the variable types of the timeseries
+            "policy": utils.get_encoding_policy(deployment)
+            | {"float32": [], "categorical": []},
+        }
+        if (max_workers == 1) or (len(tasks) <= 1):
+            # Only the rows of one profile are read at a time
+            for ind, p, outname in tasks:
+                _ngdac_profile_write(
+                    ds.isel(time=ind).load(), p, outname, **write_kwargs
                 )
-
-                # add traj_strlen using bare ntcdf to make IOOS happy
-                with netCDF4.Dataset(outname, "r+") as nc:
-                    nc.renameDimension("string%d" % trajlen, "traj_strlen")
+        else:
+            batches = [tasks[i : i + 16] for i in range(0, len(tasks), 16)]
+            task_function = functools.partial(
+                _ngdac_profile_batch,
+                inname,
+                **write_kwargs,
+            )
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+            ) as executor:
+                list(executor.map(task_function, batches))
+
+    if incremental:
+        # Remove the profile files that are no longer produced,
+        # e.g. if profile boundaries changed
+        for fn in sorted(set(manifest_old.keys()) - set(manifest.keys())):
+            utils.remove_file(os.path.join(outdir, fn))
+        with (
+            utils.staged_output(manifest_path) as stage_path,
+            open(stage_path, "w") as f,
+        ):
+            json.dump({"profiles": manifest}, f, indent=1, default=str)
 
 
 def binary_to_raw_timeseries(
@@ -1108,6 +1710,10 @@ def binary_to_raw_timeseries(
     include_source=False,
     fnamesuffix="",
     pp={},
+    max_workers: int | None = 1,
+    incremental: bool = False,
+    decodedcachedir: str | None = None,
+    backend: str = "netcdf",
     **kwargs,
 ):
     """
@@ -1127,8 +1733,36 @@ def binary_to_raw_timeseries(
     No values are interpolated.
     Times less than the yaml fil's 'deployment_min_dt' are still dropped.
 
+    If max_workers is not 1, the binary files are instead decoded
+    in parallel as dbd/ebd pairs by _dbd_get_per_file.
+    The merged data are identical to those from MultiDBD.get().
+    If max_workers is None, all cores are used, as determined by os.cpu_count()
+
+    If incremental is True and the output file already exists, then only
+    binary files not in its manifest (see _raw_manifest_write) are decoded.
+    These data points are appended to the existing raw timeseries, and
+    derived variables are only recalculated near the seam
+    (see _raw_timeseries_append). If a binary file in the manifest has
+    a different size or mtime, e.g. if it was resent, then the raw timeseries
+    is rewritten with all binary files (see _raw_files_to_append).
+    Requires include_source=True. Intended for real-time processing.
+
+    If decodedcachedir is not None, then the binary files are decoded
+    by _dbd_get_per_file, using the decoded-binary cache in decodedcachedir.
+    Cached per-file arrays are keyed by file path, size, mtime,
+    and content hash, so that each file is only decoded once.
+
+    backend is the output backend, either 'netcdf' or 'zarr';
+    see utils.backend_ext and utils.write_esd
+
     pp is the ESD post-process dictionary
     kwargs is passed to utils.findProfiles
+
+    Returns the raw timeseries Dataset.
+    If outdir is None, then the Dataset is not written to a file.
+    If data points were appended, or there were no new binary files,
+    the Dataset is lazily opened from the output file,
+    and should be closed before the file is next updated.
     """
 
     if not have_dbdreader:
@@ -1178,35 +1812,87 @@ def binary_to_raw_timeseries(
     # get the dbd object
     _log.info(f"dbdreader pattern: {indir}/{search}")
     dbd = dbdreader.MultiDBD(pattern=f"{indir}/{search}", cacheDir=cachedir)  # type: ignore
+
+    # If incremental, only decode the binary files that are not in the
+    # manifest of the existing raw timeseries; see _raw_files_to_append
+    deployment_name = deployment["metadata"]["deployment_name"]
+    outname = None
+    if outdir is not None:
+        outname = utils.product_path(
+            outdir + "/" + deployment_name + fnamesuffix,
+            backend,
+        )
+    append = False
+    if incremental:
+        if not include_source:
+            raise ValueError("incremental=True requires include_source=True")
+        if outname is None:
+            raise ValueError("incremental=True requires an outdir")
+        fns = {
+            os.path.basename(i.filename): i.filename
+            for i in dbd.dbds["eng"] + dbd.dbds["sci"]
+        }
+        files = {
+            i[0]: i[1:] for i in utils.binary_manifest(indir, search) if i[0] in fns
+        }
+        fns_new = _raw_files_to_append(outname, files, **kwargs)
+        if fns_new is not None:
+            if len(fns_new) == 0:
+                _log.info("There are no new binary files for %s", outname)
+                return xr.open_dataset(outname)
+            append = True
+            dbd = dbdreader.MultiDBD(  # type: ignore
+                filenames=[fns[i] for i in fns_new],
+                cacheDir=cachedir,
+            )
+
     sci_params = dbd.parameterNames["sci"]
     eng_params = dbd.parameterNames["eng"]
-    first_eng = np.where([i in eng_params for i in sensors])[0][0]
-    first_sci = np.where([i in sci_params for i in sensors])[0][0]
 
     # get the data, across all eng/sci timestamps
     # return_nans=True so data arrays are of exactly two lengths (eng/sci)
-    source_data = dbd.get(
-        *sensors,
-        return_nans=True,
-        include_source=include_source,
-    )
+    if append or (decodedcachedir is not None):
+        # For incremental: sensors may not be present in any of the new files
+        data_list, eng_files, sci_files = _dbd_get_per_file(
+            dbd,
+            sensors,
+            cachedir,
+            max_workers=max_workers,
+            decodedcachedir=decodedcachedir,
+        )
+    elif max_workers == 1:
+        first_eng = np.where([i in eng_params for i in sensors])[0][0]
+        first_sci = np.where([i in sci_params for i in sensors])[0][0]
+        source_data = dbd.get(
+            *sensors,
+            return_nans=True,
+            include_source=include_source,
+        )
 
-    # If include_source is true, then parsing is a bit different
-    if include_source:
-        data_list, s = zip(*source_data)
-        _log.debug("Parsing source filenames")
-        eng_files = [os.path.basename(i.filename) for i in s[first_eng]]
-        sci_files = [os.path.basename(i.filename) for i in s[first_sci]]
+        # If include_source is true, then parsing is a bit different
+        if include_source:
+            data_list, s = zip(*source_data)
+            _log.debug("Parsing source filenames")
+            eng_files = [os.path.basename(i.filename) for i in s[first_eng]]
+            sci_files = [os.path.basename(i.filename) for i in s[first_sci]]
+        else:
+            data_list = source_data
     else:
-        data_list = source_data
+        data_list, eng_files, sci_files = _dbd_get_per_file(
+            dbd,
+            sensors,
+            cachedir,
+            max_workers=max_workers,
+        )
     data_time, data = zip(*data_list)
 
     # Sanity check: only two sets of times
     # Note: the for loop checks that all sensors sci or eng
+    # Sensors without any data have empty arrays, and are skipped below
     data_time_len = [len(i) for i in data_time]
     _log.debug(f"data time lengths: {data_time_len}")
     _log.debug(f"data array lengths: {[len(i) for i in data]}")
-    if len(set(data_time_len)) > 2:
+    if len({i for i in data_time_len if i > 0}) > 2:
         _log.error(f"data time lengths: {data_time_len}")
         raise ValueError("There are more than 2 time bases, which will break this")
     # if not all([i in (eng_params+sci_params) for i in sensors]):
@@ -1215,8 +1901,14 @@ def binary_to_raw_timeseries(
 
     # get and union the exactly 2 unique sets of times: eng and sci
     # eng_time = np.int64(pgutils._time_to_datetime64(data_time[eng1])) #second
-    eng_time = data_time[first_eng]
-    sci_time = data_time[first_sci]
+    eng_time = next(
+        (t for i, t in zip(sensors, data_time) if i in eng_params and len(t) > 0),
+        np.array([]),
+    )
+    sci_time = next(
+        (t for i, t in zip(sensors, data_time) if i in sci_params and len(t) > 0),
+        np.array([]),
+    )
     time = np.union1d(eng_time, sci_time)
     _log.debug(
         f"eng/sci/total time counts: {len(eng_time)}/{len(sci_time)}/{len(time)})",
@@ -1244,7 +1936,9 @@ def binary_to_raw_timeseries(
         sensorname = ncvar[name]["source"]
         _log.info("names: %s %s", name, sensorname)
         val = np.full(len(time), np.nan)
-        if sensorname in sci_params:
+        if len(data[nn]) == 0:
+            _log.debug("No data for sensorname %s", sensorname)
+        elif sensorname in sci_params:
             _log.debug("Sci sensorname %s", sensorname)
             val[sci_indices] = data[nn]
             # val = pgutils._zero_screen(val)
@@ -1292,6 +1986,34 @@ def binary_to_raw_timeseries(
     ds = ds.dropna("time", how="all")
     _log.info("The raw timeseries has %s data points", ds.time.shape[0])
 
+    # Append the new data points to the existing raw timeseries
+    if append:
+        with xr.open_dataset(outname) as ds_prev:
+            prev_end = ds_prev["time"].values[-1]
+        if (ds.sizes["time"] == 0) or (ds["time"].values[0] > prev_end):
+            pp["metadata_dict"] = deployment["metadata"]
+            pp["device_dict"] = deployment["glider_devices"]
+            return _raw_timeseries_append(ds, outname, files, pp, **kwargs)  # type: ignore
+
+        # Rare, e.g. if files arrived out of order: rewrite with all files
+        _log.info("New data points are before the end of %s", outname)
+        utils.remove_file(_raw_manifest_path(outname))
+        return binary_to_raw_timeseries(
+            indir,
+            cachedir,
+            outdir,
+            deploymentyaml,
+            search=search,
+            include_source=include_source,
+            fnamesuffix=fnamesuffix,
+            pp=pp,
+            max_workers=max_workers,
+            incremental=incremental,
+            decodedcachedir=decodedcachedir,
+            backend=backend,
+            **kwargs,
+        )
+
     # Depth calculation #, and name management
     ds = pgutils.get_glider_depth(ds).rename({"depth": "depth_ctd"})
     # ds = ds.rename({"depth_measured": "depth"})
@@ -1319,11 +2041,587 @@ def binary_to_raw_timeseries(
     pp["device_dict"] = deployment["glider_devices"]
     ds = postproc_attrs(ds, pp)
 
-    outname = outdir + "/" + ds.attrs["deployment_name"] + fnamesuffix + ".nc"
-    _log.info("writing %s", outname)
-    utils.to_netcdf_esd(ds, outname)
+    if outname is not None:
+        _log.info("writing %s", outname)
+        policy = utils.get_encoding_policy(deployment)
+        unlimited_dims = None
+        if incremental:
+            # So that new data points can be appended; see utils.is_appendable
+            policy["categorical"] = []
+            unlimited_dims = ["time"]
+        utils.write_esd(
+            ds,
+            outname,
+            backend=backend,
+            unlimited_dims=unlimited_dims,
+            policy=policy,
+        )
+        if incremental:
+            _raw_manifest_write(outname, files, ds, ds)  # type: ignore
 
-    return outname
+    return ds
+
+
+def _raw_manifest_path(outname: str) -> str:
+    """
+    Path of the binary file manifest of raw timeseries outname,
+    used by binary_to_raw_timeseries when incremental is True
+    """
+    return f"{os.path.splitext(outname)[0]}-manifest.json"
+
+
+def _raw_manifest_write(
+    outname: str,
+    files: dict,
+    ds: xr.Dataset,
+    ds_win: xr.Dataset | None,
+    manifest: dict | None = None,
+):
+    """
+    Write the manifest of the raw timeseries outname, with:
+        - files: the binary files it was made from, as {file name: [size, mtime]}
+        - nrows: its number of data points
+        - latitude_sum and latitude_count: the sum and count of the latitude
+          values, for the mean latitude used to calculate depth_ctd
+        - last_valid: the time of the last non-nan value of each variable
+        - frozen: the time from which the profile variables and
+          distance_over_ground can change when data points are appended,
+          i.e. the earlier of the profile seam (see utils._profile_seam)
+          and the last good position. Earlier values do not change
+        - build: an ID that changes when the raw timeseries is rewritten,
+          or when a variable has non-nan values for the first time
+          (values interpolated from it would then change).
+          See _raw_frozen_since
+
+    ds are the data points of the raw timeseries, or, if manifest
+    (i.e. the previous manifest) is not None, the appended data points.
+    ds_win is the end of the raw timeseries, with the recalculated
+    profile variables, or None if no data points were appended
+    """
+    last_valid = {} if manifest is None else manifest["last_valid"].copy()
+    for var, da in ds.data_vars.items():
+        valid = np.flatnonzero(~pd.isnull(da.values))
+        if len(valid) > 0:
+            last_valid[var] = str(ds["time"].values[valid[-1]])
+    lat = ds["latitude"].values
+    manifest_out = {
+        "files": files,
+        "nrows": ds.sizes["time"],
+        "latitude_sum": float(np.nansum(lat)),
+        "latitude_count": int(np.count_nonzero(~np.isnan(lat))),
+        "last_valid": last_valid,
+        "frozen": None if manifest is None else manifest["frozen"],
+        "build": uuid.uuid4().hex,
+    }
+    if manifest is not None:
+        for key in ["nrows", "latitude_sum", "latitude_count"]:
+            manifest_out[key] += manifest[key]
+        vars_new = set(last_valid.keys()) - set(manifest["last_valid"].keys())
+        if len(vars_new) == 0:
+            manifest_out["build"] = manifest["build"]
+        else:
+            _log.info("Variables with first non-nan values: %s", ", ".join(vars_new))
+
+    if ds_win is not None:
+        seam = max(utils._profile_seam(ds_win["profile_index"].values), 0)
+        good = np.flatnonzero(~np.isnan(ds_win["latitude"] + ds_win["longitude"]))
+        row = min(seam, good[-1]) if len(good) > 0 else 0
+        manifest_out["frozen"] = str(ds_win["time"].values[row])
+
+    with (
+        utils.staged_output(_raw_manifest_path(outname)) as stage_path,
+        open(stage_path, "w") as f,
+    ):
+        json.dump(manifest_out, f, indent=1)
+
+
+def _raw_frozen_since(outname: str, varnames: list, maxgap: float) -> dict | None:
+    """
+    For incremental processing: the time before which the values of the
+    raw timeseries outname, and of a science timeseries interpolated from
+    its varnames variables, will not change as data points are appended
+    with binary_to_raw_timeseries. This is the earlier of the manifest
+    'frozen' time and the last non-nan value of each of varnames,
+    less maxgap seconds for interpolation. See _raw_manifest_write
+
+    Returns a dictionary with the 'build' of the raw timeseries, which
+    changes if earlier values change, and the 'time'; or None if outname
+    does not have a manifest, or it does not have a 'frozen' time
+    """
+    manifest_path = _raw_manifest_path(outname)
+    if not os.path.isfile(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if "frozen" not in manifest:
+        return None
+    times = [manifest["frozen"]]
+    times += [v for k, v in manifest["last_valid"].items() if k in varnames]
+    time = min([np.datetime64(i) for i in times])
+    time -= np.timedelta64(int(maxgap), "s")
+
+    return {"build": manifest["build"], "time": time}
+
+
+def _raw_files_to_append(outname: str, files: dict, **kwargs) -> list | None:
+    """
+    For incremental processing: get the names of the binary files whose data
+    can be appended to the raw timeseries outname, i.e. the files in files
+    ({file name: [size, mtime]}) that are not in the manifest of outname.
+
+    Returns None if outname must instead be rewritten with all binary files:
+    if it or its manifest do not exist, or do not match; if it cannot be
+    appended to (see utils.is_appendable); if the findProfiles arguments
+    in kwargs have changed; or if a binary file in the manifest has a
+    different size or mtime, or has been removed, e.g. if it was resent
+    """
+    manifest_path = _raw_manifest_path(outname)
+    if not (os.path.exists(outname) and os.path.isfile(manifest_path)):
+        _log.info("No raw timeseries and manifest at %s; using all files", outname)
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    with xr.open_dataset(outname) as ds_prev:
+        nrows = ds_prev.sizes["time"]
+        prof_attrs = ds_prev["profile_index"].attrs
+
+    prof_opt = utils.profileOptionsList | {
+        k: v for k, v in kwargs.items() if k in utils.profileOptionsList
+    }
+    changed = [k for k, v in manifest["files"].items() if files.get(k) != v]
+    reason = None
+    if manifest["nrows"] != nrows:
+        reason = "does not match its manifest"
+    elif not utils.is_appendable(outname):
+        reason = "cannot be appended to"
+    elif any(prof_attrs.get(k) != v for k, v in prof_opt.items()):
+        reason = "has different findProfiles arguments"
+    elif len(changed) > 0:
+        reason = f"has binary files that have changed: {', '.join(changed)}"
+    if reason is not None:
+        _log.info("The raw timeseries %s; using all files", reason)
+        return None
+
+    fns_new = sorted(set(files.keys()) - set(manifest["files"].keys()))
+    _log.info(
+        "%s of %s binary files are not in the existing raw timeseries",
+        len(fns_new),
+        len(files),
+    )
+    return fns_new
+
+
+def _raw_tail(ds_prev: xr.Dataset, nrows: int = 10000) -> xr.Dataset:
+    """
+    Load the last rows of the (lazily opened) raw timeseries ds_prev
+    needed to update its derived variables after data points are appended:
+    rows from before the second to last profile (see utils._profile_seam),
+    and with at least one good position. Starts with nrows rows,
+    and doubles this number until these conditions are met
+    """
+    names = [
+        "latitude",
+        "longitude",
+        "depth_measured",
+        "profile_index",
+        "profile_direction",
+        "distance_over_ground",
+    ]
+    n = ds_prev.sizes["time"]
+    k = min(nrows, n)
+    while True:
+        tail = ds_prev[names].isel(time=slice(n - k, None)).reset_coords().load()
+        has_seam = utils._profile_seam(tail["profile_index"].values) > 0
+        has_good = np.any(~np.isnan(tail["latitude"] + tail["longitude"]))
+        if (has_seam and has_good) or (k == n):
+            return tail
+        k = min(2 * k, n)
+
+
+def _raw_timeseries_append(
+    ds: xr.Dataset,
+    outname: str,
+    files: dict,
+    pp: dict,
+    **kwargs,
+):
+    """
+    Append the new data points ds, from the new binary files, to the
+    raw timeseries outname, as part of binary_to_raw_timeseries.
+    files is the manifest of all of the binary files; see _raw_manifest_write.
+
+    Only the new data points, and the existing rows near the seam, are
+    processed. profile_index and profile_direction are recalculated
+    from before the second to last profile (see utils.update_fill_profiles),
+    and distance_over_ground from the last good position
+    (see utils.update_distance_over_ground). These are the same values
+    as from processing all binary files. These rows are overwritten,
+    the new data points are appended, and the global attributes are updated.
+    depth_ctd is calculated for the new data points with the mean latitude
+    of all data points, and is not recalculated for the existing rows.
+
+    Returns the (lazily opened) raw timeseries
+    """
+    with open(_raw_manifest_path(outname)) as f:
+        manifest = json.load(f)
+    with xr.open_dataset(outname) as ds_prev:
+        n_prev = ds_prev.sizes["time"]
+        tail = _raw_tail(ds_prev)
+        first = ds_prev[["latitude", "longitude"]].isel(time=[0]).reset_coords()
+        first = first.load()
+        attrs_prev = ds_prev.attrs
+
+    if ds.sizes["time"] > 0:
+        # Depth calculation, with the mean latitude of all data points
+        ds = pgutils.get_glider_depth(ds).rename({"depth": "depth_ctd"})
+        lat = ds["latitude"].values
+        lat_sum = manifest["latitude_sum"] + np.nansum(lat)
+        lat_count = manifest["latitude_count"] + np.count_nonzero(~np.isnan(lat))
+        if lat_count > 0:
+            ds["depth_ctd"].values = -gsw.z_from_p(
+                ds["pressure"].values,
+                ds["latitude"].fillna(lat_sum / lat_count).values,
+            )
+        ds["depth_ctd"] = ds["depth_ctd"].where(~np.isnan(ds["pressure"]))
+
+        # Profiles and distance_over_ground, from the tail onwards
+        n_tail = tail.sizes["time"]
+        ds_win = xr.concat(
+            [tail, ds[["latitude", "longitude", "depth_measured"]]],
+            dim="time",
+            data_vars="all",
+        )
+        ds_win = utils.update_fill_profiles(
+            ds_win,
+            "time",
+            "depth_measured",
+            tail["profile_index"],
+            tail["profile_direction"],
+            t0=first["time"].values[0],
+            **kwargs,
+        )
+        ds_win = utils.update_distance_over_ground(ds_win, n_tail)
+        for var in ["profile_index", "profile_direction", "distance_over_ground"]:
+            ds[var] = (("time"), ds_win[var].values[n_tail:], ds_win[var].attrs)
+
+        _log.info("Appending %s data points to %s", ds.sizes["time"], outname)
+        utils.write_rows_esd(
+            ds_win[["profile_index", "profile_direction", "distance_over_ground"]].isel(
+                time=slice(0, n_tail)
+            ),
+            outname,
+            n_prev - n_tail,
+        )
+        utils.append_esd(ds, outname)
+
+        # Global attributes, from the first and new data points
+        ds_attrs = postproc_attrs(
+            xr.concat([first, ds[["latitude", "longitude"]]], dim="time"),
+            pp,
+        )
+        attrs = ds_attrs.attrs
+        for key, func in [
+            ("geospatial_lat_max", np.fmax),
+            ("geospatial_lat_min", np.fmin),
+            ("geospatial_lon_max", np.fmax),
+            ("geospatial_lon_min", np.fmin),
+        ]:
+            attrs[key] = func(attrs[key], attrs_prev.get(key, np.nan))
+        utils.update_attrs_esd(outname, attrs)
+
+        _raw_manifest_write(outname, files, ds, ds_win, manifest)
+    else:
+        _raw_manifest_write(outname, files, ds, None, manifest)
+
+    return xr.open_dataset(outname)
+
+
+def _decoded_cache_path(fn: str, decodedcachedir: str) -> str:
+    """
+    Path of the decoded-binary cache file for binary file fn.
+    The hash of the absolute path is included so that files with the same name
+    (e.g., from different gliders) can share decodedcachedir
+    """
+    path_hash = hashlib.sha1(os.path.abspath(fn).encode()).hexdigest()[:12]
+    return os.path.join(decodedcachedir, f"{os.path.basename(fn)}-{path_hash}.npz")
+
+
+def _decoded_cache_load(fn: str, decodedcachedir: str, sensors: list):
+    """
+    Load the decoded data of binary file fn from the decoded-binary cache
+
+    The cache file is only valid if it was written with the installed version
+    of dbdreader, and if the size and mtime of fn match those stored in the
+    cache file. If the size or mtime do not match, the contents of fn are
+    hashed, and the cache file is still valid if the content hash matches
+    (e.g., if the binary file was copied or touched). In this case,
+    the cache file is rewritten with the new size and mtime,
+    so that fn is not hashed again
+
+    Returns
+    -------
+    tuple
+        A dictionary of the cache metadata, or None if there is no valid
+        cache file; and a list of (time, value) tuples, one per sensor.
+        The list is None if the cache file does not have all sensors
+    """
+    cache_path = _decoded_cache_path(fn, decodedcachedir)
+    if not os.path.isfile(cache_path):
+        return None, None
+
+    arrays = None
+    with np.load(cache_path) as npz:
+        cache_meta = json.loads(str(npz["__meta__"]))
+        if cache_meta.get("dbdreader") != metadata.version("dbdreader"):
+            _log.debug("Decoded cache for %s is from another dbdreader version", fn)
+            return None, None
+        st = os.stat(fn)
+        if (st.st_size, st.st_mtime_ns) != (cache_meta["size"], cache_meta["mtime"]):
+            if utils.file_hash(fn) != cache_meta["sha256"]:
+                _log.debug("Decoded cache for %s is out of date", fn)
+                return None, None
+            cache_meta["size"], cache_meta["mtime"] = st.st_size, st.st_mtime_ns
+            arrays = {i: npz[i] for i in npz.files if i != "__meta__"}
+
+        data_list = None
+        if cache_meta["empty"]:
+            data_list = []
+        elif all(i in cache_meta["sensors"] for i in sensors):
+            data_list = [(npz[f"{i}/time"], npz[f"{i}/value"]) for i in sensors]
+
+    if arrays is not None:
+        _log.debug("Updating the size and mtime in the decoded cache for %s", fn)
+        _decoded_cache_write(cache_path, cache_meta, arrays)
+
+    return cache_meta, data_list
+
+
+def _decoded_cache_save(
+    fn: str,
+    decodedcachedir: str,
+    sensors: list,
+    data_list: list | None,
+    sha256: str | None = None,
+):
+    """
+    Write the decoded data of binary file fn to the decoded-binary cache.
+    data_list is None if the file does not have any data
+    """
+    st = os.stat(fn)
+    cache_meta = {
+        "filename": os.path.abspath(fn),
+        "size": st.st_size,
+        "mtime": st.st_mtime_ns,
+        "sha256": utils.file_hash(fn) if sha256 is None else sha256,
+        "sensors": sensors,
+        "empty": data_list is None,
+        "dbdreader": metadata.version("dbdreader"),
+    }
+    arrays = {}
+    for i, (t, v) in zip(sensors, data_list or []):
+        arrays[f"{i}/time"] = t
+        arrays[f"{i}/value"] = v
+
+    _decoded_cache_write(_decoded_cache_path(fn, decodedcachedir), cache_meta, arrays)
+
+
+def _decoded_cache_write(cache_path: str, cache_meta: dict, arrays: dict):
+    """
+    Write the decoded-binary cache file cache_path, with metadata cache_meta.
+    The file is written with utils.staged_output,
+    so that readers never see a partially written cache file
+    """
+    arrays = {"__meta__": np.array(json.dumps(cache_meta))} | arrays
+    with utils.staged_output(cache_path) as stage_path:
+        np.savez(stage_path, **arrays)
+
+
+def _decode_binary_pair(
+    filenames: list,
+    cachedir: str,
+    eng_sensors: list,
+    sci_sensors: list,
+    decodedcachedir: str | None = None,
+) -> dict:
+    """
+    Decode the eng and/or sci binary file(s) of a single glider segment.
+    Worker function for _dbd_get_per_file
+
+    Each file is read with the same dbdreader arguments used by
+    MultiDBD.get() in binary_to_raw_timeseries, i.e. with return_nans=True.
+
+    If decodedcachedir is not None, then decoded data are read from and
+    written to the decoded-binary cache in this directory.
+    If a cache file is missing any of the sensors,
+    the file is decoded again for the union of the cached and new sensors.
+
+    Returns
+    -------
+    dict
+        Keys are the filenames, and values are lists of (time, value) tuples,
+        one per sensor in eng_sensors or sci_sensors (as relevant).
+        Files without any data are not included
+    """
+    out = {}
+    for fn in filenames:
+        if dbdreader.MultiDBD.isScienceDataFile(fn):  # type: ignore
+            sensors = sci_sensors
+        else:
+            sensors = eng_sensors
+        if len(sensors) == 0:
+            continue
+
+        sensors_decode = sensors
+        if decodedcachedir is not None:
+            cache_meta, data_list = _decoded_cache_load(fn, decodedcachedir, sensors)
+            if data_list is not None:
+                _log.debug("Read %s from the decoded cache", fn)
+                if len(data_list) > 0:
+                    out[fn] = data_list
+                continue
+            if cache_meta is not None:
+                sensors_decode = cache_meta["sensors"] + [
+                    i for i in sensors if i not in cache_meta["sensors"]
+                ]
+
+        _log.debug("Decoding %s", fn)
+        dbd = dbdreader.DBD(fn, cacheDir=cachedir)  # type: ignore
+        try:
+            data_list = dbd.get(
+                *sensors_decode,
+                return_nans=True,
+                check_for_invalid_parameters=False,
+            )
+            if len(sensors_decode) == 1:
+                data_list = [data_list]
+        except dbdreader.DbdError as e:  # type: ignore
+            # Consistent with MultiDBD: skip files that are (close to) empty
+            if e.value != dbdreader.DBD_ERROR_NO_DATA_TO_INTERPOLATE_TO:  # type: ignore
+                raise
+            _log.debug("No data to read in %s", fn)
+            data_list = None
+        finally:
+            dbd.close()
+
+        if decodedcachedir is not None:
+            _decoded_cache_save(fn, decodedcachedir, sensors_decode, data_list)
+        if data_list is not None:
+            data_dict = dict(zip(sensors_decode, data_list))
+            out[fn] = [data_dict[i] for i in sensors]
+
+    return out
+
+
+def _dbd_get_per_file(
+    dbd,
+    sensors: list,
+    cachedir: str,
+    max_workers: int | None = None,
+    decodedcachedir: str | None = None,
+):
+    """
+    Per-file version of dbd.get(*sensors, return_nans=True, include_source=True)
+
+    The files of the MultiDBD object dbd are split into dbd/ebd pairs,
+    which are decoded by _decode_binary_pair, in a process pool if
+    max_workers is not 1.
+    The per-file arrays are then concatenated in the same (sorted) file order
+    used by MultiDBD, so that the output is identical to that of MultiDBD.get()
+
+    Parameters
+    ----------
+    dbd : dbdreader.MultiDBD
+        MultiDBD object, created with the binary files to decode
+    sensors : list
+        list of the sensor names to extract
+    cachedir : str
+        Path to the directory with the cache (cac) files
+    max_workers : int | None
+        Number of worker processes. If 1, files are decoded in a for loop.
+        If None, all cores are used, as determined by os.cpu_count()
+    decodedcachedir : str | None
+        Path to the directory of the decoded-binary cache.
+        If None, the decoded-binary cache is not used
+
+    Returns
+    -------
+    tuple
+        A list of (time, value) tuples, one for each sensor,
+        and arrays of the source filenames of the eng and sci data points
+    """
+    sci_params = dbd.parameterNames["sci"]
+    eng_params = dbd.parameterNames["eng"]
+    sci_sensors = [i for i in sensors if i in sci_params]
+    eng_sensors = [i for i in sensors if (i in eng_params) and (i not in sci_params)]
+
+    eng_fns = [i.filename for i in dbd.dbds["eng"]]
+    sci_fns = [i.filename for i in dbd.dbds["sci"]]
+
+    # Pair the eng and sci files from the same segment, by their name sans extension
+    pairs = {}
+    for fn in eng_fns + sci_fns:
+        pairs.setdefault(os.path.splitext(fn)[0], []).append(fn)
+    pairs = [pairs[k] for k in sorted(pairs)]
+
+    if max_workers is None:
+        max_workers = max(1, os.cpu_count())  # type: ignore
+    _log.info(
+        "Decoding %s binary files (%s segments) with %s workers",
+        len(eng_fns) + len(sci_fns),
+        len(pairs),
+        max_workers,
+    )
+    task_function = functools.partial(
+        _decode_binary_pair,
+        cachedir=cachedir,
+        eng_sensors=eng_sensors,
+        sci_sensors=sci_sensors,
+        decodedcachedir=decodedcachedir,
+    )
+    if decodedcachedir is not None:
+        utils.makedirs_pass(decodedcachedir)
+    decoded = {}
+    if max_workers == 1:
+        for pair in pairs:
+            decoded.update(task_function(pair))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers,
+        ) as executor:
+            for i in executor.map(task_function, pairs):
+                decoded.update(i)
+
+    # Merge the per-file arrays, in the MultiDBD file order
+    def _merge(fns, ft_sensors):
+        fns = [fn for fn in fns if fn in decoded]
+        if len(ft_sensors) == 0 or len(fns) == 0:
+            if len(ft_sensors) > 0:
+                _log.warning("No data could be read for: %s", ", ".join(ft_sensors))
+            return {}, np.array([])
+        merged = {}
+        for j, sensor in enumerate(ft_sensors):
+            merged[sensor] = (
+                np.hstack([decoded[fn][j][0] for fn in fns]),
+                np.hstack([decoded[fn][j][1] for fn in fns]),
+            )
+        # The source filename of each data point, using the first sensor
+        source = np.hstack(
+            [np.full(len(decoded[fn][0][0]), os.path.basename(fn)) for fn in fns],
+        )
+        return merged, source
+
+    eng_merged, eng_files = _merge(eng_fns, eng_sensors)
+    sci_merged, sci_files = _merge(sci_fns, sci_sensors)
+    merged = eng_merged | sci_merged
+
+    # Sensors with no data are returned as empty arrays, as by MultiDBD.get()
+    data_list = [merged.get(i, (np.array([]), np.array([]))) for i in sensors]
+
+    return data_list, eng_files, sci_files
+
+
+"""Raw timeseries variables that are not interpolated by timeseries_raw_to_sci"""
+_raw_to_sci_vars_nointerp = ["time", "profile_index", "profile_direction"]
 
 
 def timeseries_raw_to_sci(
@@ -1334,6 +2632,8 @@ def timeseries_raw_to_sci(
     fnamesuffix="",
     maxgap=300,
     pp: dict,
+    window: str | None = None,
+    backend: str = "netcdf",
     **kwargs,
 ):
     """
@@ -1348,58 +2648,61 @@ def timeseries_raw_to_sci(
 
     Parameters
     ----------
-
+    inname : str | xarray.Dataset
+        The raw timeseries; either the path to the raw timeseries file,
+        or the raw timeseries Dataset (e.g., from binary_to_raw_timeseries)
+    outdir : str | None
+        The directory to which to write the science timeseries.
+        If None, then the science timeseries is not written to a file
+    window : str | None, default None
+        If not None, the raw timeseries is processed in time windows of
+        this length (any string accepted by pandas.Timedelta, e.g. '1D'),
+        and each window is appended to the science timeseries file as it is
+        processed, so that memory use is bounded by the window length
+        rather than the deployment length.
+        inname must be a path, and outdir must not be None.
+        See _timeseries_raw_to_sci_windowed for details
+    backend : str, default 'netcdf'
+        The output backend, either 'netcdf' or 'zarr';
+        see utils.backend_ext and utils.write_esd
 
     Returns
     -------
+    xarray.Dataset
+        The science timeseries. If window is not None,
+        the lazily opened science timeseries file
     """
 
-    ds = xr.open_dataset(inname, decode_times=True)
-
-    # Read and parse deployment yaml(s), to get variables
-    deployment = pgutils._get_deployment(deploymentyaml)
-    ncvar = deployment["netcdf_variables"]
-    [ncvar[i]["source"] for i in ncvar]
+    if window is not None:
+        return _timeseries_raw_to_sci_windowed(
+            inname,
+            outdir,
+            deploymentyaml,
+            fnamesuffix=fnamesuffix,
+            maxgap=maxgap,
+            pp=pp,
+            window=window,
+            backend=backend,
+            **kwargs,
+        )
 
-    vars_tokeep = [i for i in ncvar.keys() if (i in ds.keys() and i != "time")]
-    vars_tokeep[2:2] = [
-        "depth_measured",
-        "depth_ctd",
-        "profile_index",
-        "profile_direction",
-    ]
-    vars_sci = [i for i in ncvar if "sci" in ncvar[i]["source"] and i != "time"] + [
-        "depth_ctd",
-    ]
+    if isinstance(inname, xr.Dataset):
+        ds = inname
+    else:
+        ds = xr.open_dataset(inname, decode_times=True)
 
     # Use deployment yaml(s) to specify the variables to keep and interpolate
+    vars_tokeep, vars_sci = _raw_to_sci_vars(ds, deploymentyaml)
     ds = ds[vars_tokeep].dropna(dim="time", how="all")
 
     # For the science variables: interpolate and run find_gaps
     # To be consistent with pyglider, engineering variables are
     # interpolated, but not run through find_gaps
-    t = ds.time.values.astype(np.int64) / 1e9
-    for i in vars_tokeep:
-        _log.info("variable %s", i)
-        if i in ["time", "profile_index", "profile_direction"]:
-            continue
-
-        # interpolate
-        da = ds[i].dropna(dim="time")
-        _t = da.time.values.astype(np.int64) / 1e9
-        val_interp = np.interp(t, _t, da.values, left=np.nan, right=np.nan)
-
-        # To be consistent with pyglider.slocum.binary_to_timeseries,
-        # only find gaps and zero screens for science vars
-        # Ensure that _t, t, and maxgap are all in the same units
-        if i in vars_sci:
-            tg_ind = pgutils.find_gaps(_t, t, maxgap)
-            val_interp[tg_ind] = np.nan
-            val_interp = pgutils._zero_screen(val_interp)
-            _log.debug("number of gaps %s", np.count_nonzero(tg_ind))
-
+    vars_interp = [i for i in vars_tokeep if i not in _raw_to_sci_vars_nointerp]
+    vals_interp = _interp_by_support(ds, vars_interp, vars_sci, maxgap)
+    for i in vars_interp:
         # Update ds object with values and attributes
-        ds[i].values = val_interp
+        ds[i].values = vals_interp[i]
         ds[i].attrs["method"] = "linear fill"
         # The var already has the yaml-specified attributes from binary_to_raw
 
@@ -1441,11 +2744,397 @@ def timeseries_raw_to_sci(
     #     raise ValueError("dstype must be either 'sci' or 'eng'")
 
     # Write out to file
-    outname = f"{outdir}/{ds.attrs['deployment_name'] + fnamesuffix}.nc"
-    _log.info("writing %s", outname)
-    utils.to_netcdf_esd(ds, outname)
+    if outdir is not None:
+        outname = utils.product_path(
+            f"{outdir}/{ds.attrs['deployment_name'] + fnamesuffix}",
+            backend,
+        )
+        _log.info("writing %s", outname)
+        utils.write_esd(
+            ds,
+            outname,
+            backend=backend,
+            policy=utils.get_encoding_policy(pgutils._get_deployment(deploymentyaml)),
+        )
 
-    return outname
+    return ds
+
+
+def _raw_to_sci_vars(ds: xr.Dataset, deploymentyaml) -> tuple[list, list]:
+    """
+    Read and parse deployment yaml(s), to get the variables of the raw
+    timeseries ds to keep (vars_tokeep) and the science variables (vars_sci)
+    for timeseries_raw_to_sci
+    """
+    deployment = pgutils._get_deployment(deploymentyaml)
+    ncvar = deployment["netcdf_variables"]
+    [ncvar[i]["source"] for i in ncvar]
+
+    vars_tokeep = [i for i in ncvar.keys() if (i in ds.keys() and i != "time")]
+    vars_tokeep[2:2] = [
+        "depth_measured",
+        "depth_ctd",
+        "profile_index",
+        "profile_direction",
+    ]
+    vars_sci = [i for i in ncvar if "sci" in ncvar[i]["source"] and i != "time"] + [
+        "depth_ctd",
+    ]
+
+    return vars_tokeep, vars_sci
+
+
+def _timeseries_raw_to_sci_windowed(
+    inname,
+    outdir,
+    deploymentyaml,
+    *,
+    fnamesuffix="",
+    maxgap=300,
+    pp: dict,
+    window: str,
+    backend: str = "netcdf",
+    **kwargs,
+):
+    """
+    timeseries_raw_to_sci, for the raw timeseries file inname,
+    processed in time windows of length window.
+
+    For each window, the raw data are read along with, for each variable,
+    the raw samples immediately before and after the window.
+    These are the samples that bracket the interpolation of the window.
+    Science variables only look ahead by up to maxgap, since any later sample
+    would be in a gap. Then the window is interpolated, run through the
+    row-wise post-processing steps (drop_bogus, EOS derivation, etc),
+    and appended to the science timeseries file along the unlimited
+    time dimension. distance_over_ground is carried across windows,
+    and profiles are calculated with utils.ProfileFinder, so rows are written
+    once their profile values are final.
+
+    The output is the same as timeseries_raw_to_sci. get_derived_eos_raw
+    fills nan latitudes and longitudes with the window, rather than
+    deployment, mean, but these rows are then dropped by drop_bogus.
+    Windows should be much longer than a profile, since rows are held
+    in memory until their profile is final. The profile check is done after
+    writing, using only the profile summary variables.
+    If backend is 'zarr', the windows are appended to a Zarr store.
+    The windows are written to a local staging file, which is published
+    to the output path once all windows are written and checked.
+
+    Returns the lazily opened science timeseries file
+    """
+    if isinstance(inname, xr.Dataset) or outdir is None:
+        raise ValueError("window requires inname to be a path, and an outdir")
+
+    ds_raw = xr.open_dataset(inname, decode_times=True)
+    outname = utils.product_path(
+        f"{outdir}/{ds_raw.attrs['deployment_name'] + fnamesuffix}",
+        backend,
+    )
+    vars_tokeep, vars_sci = _raw_to_sci_vars(ds_raw, deploymentyaml)
+    ds_raw = ds_raw[vars_tokeep]
+    vars_interp = [i for i in vars_tokeep if i not in _raw_to_sci_vars_nointerp]
+
+    time = ds_raw.time.values
+    if time.shape[0] == 0:
+        raise ValueError(f"{inname} has no data")
+    if not np.all(time[1:] >= time[:-1]):
+        raise ValueError(f"The times of {inname} must be sorted")
+    window_td = pd.Timedelta(window).to_timedelta64()
+    maxgap_td = pd.Timedelta(seconds=maxgap).to_timedelta64()
+    edges = np.arange(time[0], time[-1] + window_td, window_td)
+    idx_edges = np.append(np.searchsorted(time, edges, side="left"), len(time))
+    _log.info(
+        "Processing %s in %s windows of %s",
+        inname,
+        len(idx_edges) - 1,
+        window,
+    )
+
+    # Profile summary of the raw timeseries, for join_profiles
+    prof_summ = None
+    if "profile_summary" in pp.keys():
+        prof_summ = pp["profile_summary"]
+    elif "profile_summary_path" in pp.keys():
+        prof_summ = pd.read_csv(
+            pp["profile_summary_path"],
+            parse_dates=["start_time", "end_time"],
+        )
+
+    # Windows are written and appended to a local staging file, which is
+    # only published to outname once complete (see utils.staged_output)
+    with utils.staged_output(outname) as stage_path:
+        last_sample = {i: -1 for i in vars_interp}
+        pf = utils.ProfileFinder(**kwargs)
+        pending = None
+        dist_carry = None
+        written = False
+
+        def _write(ds_w, prof_idx, prof_dir):
+            # Fill the final profile values, and write or append to stage_path
+            nonlocal written
+            ds_w = utils._fill_profile_vars(
+                ds_w,
+                "time",
+                "depth",
+                prof_idx,
+                prof_dir,
+                pf.options,
+            )
+            if prof_summ is not None:
+                ds_w = utils.join_profiles(ds_w, prof_summ, **kwargs)
+            if not written:
+                ds_w = postproc_attrs(ds_w, pp)
+                ds_w = _postproc_sci_finish(ds_w, pp)
+                _log.info("writing %s", outname)
+                utils.write_esd(
+                    ds_w,
+                    stage_path,
+                    backend=backend,
+                    unlimited_dims=["time"],
+                    policy=utils.get_encoding_policy(
+                        pgutils._get_deployment(deploymentyaml),
+                    ),
+                    staged=False,
+                )
+                written = True
+            else:
+                utils.append_esd(ds_w, stage_path)
+
+        for ia, ib in itertools.pairwise(idx_edges):
+            if ia == ib:
+                continue
+
+            # Read the window, and the samples on either side of it
+            rows_left = sorted({j for j in last_sample.values() if j >= 0})
+            rows_right = _next_sample_rows(ds_raw, ib, vars_interp, vars_sci, maxgap_td)
+            rows = np.concatenate([rows_left, np.arange(ia, ib), rows_right]).astype(
+                int
+            )
+            ds_w = xr.concat(
+                [
+                    ds_raw.isel(time=rows_left).load(),
+                    ds_raw.isel(time=slice(ia, ib)).load(),
+                    ds_raw.isel(time=rows_right).load(),
+                ],
+                dim="time",
+                combine_attrs="override",
+            )
+            in_window = np.zeros(rows.shape[0], dtype=bool)
+            in_window[len(rows_left) : len(rows_left) + ib - ia] = True
+            for i in vars_interp:
+                notnan = np.flatnonzero(~pd.isnull(ds_w[i].values[in_window]))
+                if notnan.shape[0] > 0:
+                    last_sample[i] = ia + notnan[-1]
+
+            # Drop rows that are all nan, and interpolate
+            notempty = np.zeros(rows.shape[0], dtype=bool)
+            for i in vars_tokeep:
+                notempty |= ~pd.isnull(ds_w[i].values)
+            ds_w = ds_w.isel(time=notempty)
+            in_window = in_window[notempty]
+            vals_interp = _interp_by_support(ds_w, vars_interp, vars_sci, maxgap)
+            ds_w = ds_w.isel(time=in_window)
+            for i in vars_interp:
+                ds_w[i].values = vals_interp[i][in_window]
+                ds_w[i].attrs["method"] = "linear fill"
+
+            # Row-wise processing steps of timeseries_raw_to_sci
+            ds_w = ds_w.dropna(dim="time", how="all", subset=vars_sci)
+            if ds_w.time.shape[0] == 0:
+                continue
+            if (
+                ("temperature" in ds_w)
+                and ("conductivity" in ds_w)
+                and ("pressure" in ds_w)
+            ):
+                ds_w = pgutils.get_derived_eos_raw(ds_w)
+            if "depth_ctd" in ds_w:
+                ds_w = ds_w.rename({"depth_ctd": "depth"})
+            ds_w = _postproc_values(ds_w, pp)
+            if ds_w.time.shape[0] == 0:
+                continue
+
+            # Distance over ground, carried over from the previous window
+            if dist_carry is None:
+                ds_w = pgutils.get_distance_over_ground(ds_w)
+            else:
+                dist = gsw.distance(
+                    np.append(dist_carry["longitude"], ds_w.longitude.values),
+                    np.append(dist_carry["latitude"], ds_w.latitude.values),
+                )
+                dist = np.cumsum(np.append(dist_carry["distance"], dist / 1000))[1:]
+                ds_w["distance_over_ground"] = ("time", dist, dist_carry["attrs"])
+            dist_carry = {
+                "longitude": ds_w.longitude.values[-1],
+                "latitude": ds_w.latitude.values[-1],
+                "distance": ds_w.distance_over_ground.values[-1],
+                "attrs": ds_w.distance_over_ground.attrs,
+            }
+
+            # Write rows once their profile values are final
+            prof_idx, prof_dir = pf.update(ds_w.time.values, ds_w.depth.values)
+            if pending is not None:
+                ds_w = xr.concat([pending, ds_w], dim="time", combine_attrs="override")
+            num_final = prof_idx.shape[0]
+            if num_final > 0:
+                _write(ds_w.isel(time=slice(0, num_final)), prof_idx, prof_dir)
+            pending = ds_w.isel(time=slice(num_final, None))
+
+        if pending is None:
+            raise ValueError(f"No science timeseries data remained in {inname}")
+        prof_idx, prof_dir = pf.provisional()
+        _write(pending, prof_idx, prof_dir)
+
+        # Profiles check, using only the profile summary variables
+        depth_var = "depth" if prof_summ is not None else "depth_measured"
+        summ_vars = [
+            depth_var,
+            "profile_index",
+            "profile_direction",
+            "distance_over_ground",
+            "latitude",
+            "longitude",
+        ]
+        with xr.open_dataset(stage_path) as ds:
+            ds_summ = ds[summ_vars].load()
+        utils.check_profiles(utils.calc_profile_summary(ds_summ, depth_var))
+
+        # Attributes were calculated from the first rows written,
+        # so update them (e.g., geospatial extents) using all rows
+        processing_level = ds_summ.attrs["processing_level"]
+        attrs = postproc_attrs(ds_summ, pp).attrs
+        attrs["processing_level"] = processing_level
+        utils.update_attrs_esd(stage_path, attrs)
+
+    return xr.open_dataset(outname)
+
+
+def _next_sample_rows(
+    ds_raw: xr.Dataset,
+    ib: int,
+    vars_interp: list,
+    vars_sci: list,
+    maxgap_td: np.timedelta64,
+) -> np.ndarray:
+    """
+    For each variable in vars_interp, find the row index of the first
+    non-nan sample of the (lazily opened) raw timeseries ds_raw at or after
+    row ib. Science variables only look up to maxgap after row ib-1,
+    since any later sample is in a gap.
+    Rows are read in blocks of increasing size
+
+    Returns the sorted, unique row indices
+    """
+    time = ds_raw.time.values
+    sci_end = np.searchsorted(time, time[ib - 1] + maxgap_td, side="right")
+    remaining = list(vars_interp)
+    rows = set()
+    j0, block = ib, 1000
+    while remaining and (j0 < len(time)):
+        remaining = [i for i in remaining if not ((i in vars_sci) and (j0 >= sci_end))]
+        if not remaining:
+            break
+        j1 = min(j0 + block, len(time))
+        ds_block = ds_raw[remaining].isel(time=slice(j0, j1)).load()
+        for i in list(remaining):
+            notnan = np.flatnonzero(~pd.isnull(ds_block[i].values))
+            if notnan.shape[0] > 0:
+                if not ((i in vars_sci) and (j0 + notnan[0] >= sci_end)):
+                    rows.add(j0 + notnan[0])
+                remaining.remove(i)
+        j0, block = j1, block * 2
+
+    return np.array(sorted(rows), dtype=int)
+
+
+def _interp_by_support(
+    ds: xr.Dataset,
+    vars_interp: list,
+    vars_gaps: list,
+    maxgap: float,
+) -> dict:
+    """
+    Linearly interpolate the vars_interp variables of ds onto ds.time,
+    using the non-nan values of each variable.
+
+    Variables are grouped by their non-nan time support, i.e. variables from
+    the same sensor, and the interpolation indices, weights,
+    and (for vars_gaps variables) find_gaps mask are calculated once per group.
+    The values of the vars_gaps variables in gaps larger than maxgap (seconds)
+    are set to nan, and then zero screened.
+    The output is the same as running np.interp, pyglider.utils.find_gaps,
+    and pyglider.utils._zero_screen for each variable.
+
+    Returns a dictionary of {variable name: interpolated values}
+    """
+    t = ds.time.values.astype(np.int64) / 1e9
+
+    # Group variables by their non-nan time support
+    groups = {}
+    for i in vars_interp:
+        notnan = ~pd.isnull(ds[i].values)
+        groups.setdefault(np.packbits(notnan).tobytes(), (notnan, []))[1].append(i)
+
+    vals_interp = {}
+    for notnan, group_vars in groups.values():
+        _log.info("interpolating variables %s", ", ".join(group_vars))
+        _t = t[notnan]
+        values = np.stack([ds[i].values[notnan] for i in group_vars])
+        block = _interp_block(t, _t, values.astype(float))
+
+        # To be consistent with pyglider.slocum.binary_to_timeseries,
+        # only find gaps and zero screens for science vars
+        # Ensure that _t, t, and maxgap are all in the same units
+        is_gaps = np.array([i in vars_gaps for i in group_vars])
+        if is_gaps.any():
+            tg_ind = pgutils.find_gaps(_t, t, maxgap)
+            _log.debug("number of gaps %s", np.count_nonzero(tg_ind))
+            block_gaps = block[is_gaps]
+            block_gaps[:, tg_ind] = np.nan
+            block_gaps[block_gaps == 0] = np.nan
+            block[is_gaps] = block_gaps
+
+        for j, i in enumerate(group_vars):
+            vals_interp[i] = block[j]
+
+    return vals_interp
+
+
+def _interp_block(x: np.ndarray, xp: np.ndarray, fp: np.ndarray) -> np.ndarray:
+    """
+    np.interp(x, xp, fp[k], left=np.nan, right=np.nan) for each row k of
+    the 2D array fp, with the interpolation indices and weights calculated
+    only once. Follows the arithmetic of np.interp, so that output is identical
+    """
+    out = np.full((fp.shape[0], x.shape[0]), np.nan)
+    if xp.shape[0] == 0:
+        return out
+
+    # Index of the sample point at or before each x
+    j = np.searchsorted(xp, x, side="right") - 1
+    inside = (j >= 0) & (x <= xp[-1])
+
+    # x at or after the last sample point
+    is_last = inside & (j == xp.shape[0] - 1)
+    out[:, is_last] = fp[:, -1:]
+
+    # x between two sample points
+    is_mid = inside & ~is_last
+    jm = j[is_mid]
+    xm = x[is_mid]
+    exact = xm == xp[jm]
+    fp_lo, fp_hi = fp[:, jm], fp[:, jm + 1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = (fp_hi - fp_lo) / (xp[jm + 1] - xp[jm])
+        val = slope * (xm - xp[jm]) + fp_lo
+        # If we get nan in one direction, try the other (as in np.interp)
+        val_other = slope * (xm - xp[jm + 1]) + fp_hi
+        val = np.where(np.isnan(val), val_other, val)
+        val = np.where(np.isnan(val) & (fp_lo == fp_hi), fp_lo, val)
+    out[:, is_mid] = np.where(exact, fp_lo, val)
+
+    return out
 
 
 def decompress_dir(binarydir):
@@ -1480,49 +3169,734 @@ def decompress_dir(binarydir):
     _log.info("There are now %s files in %s", len(binarydir_files), binarydir)
 
 
-def grid_esd(inname, paths):
+def _digitize_bins(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    Bin index of each value, for the bin edges edges. As for
+    scipy.stats.binned_statistic, bins include their left edge,
+    and the last bin also includes its right edge.
+    Values outside of the bins, or nan, have an index of -1
+    """
+    nbins = edges.shape[0] - 1
+    idx = np.searchsorted(edges, values, side="right") - 1
+    idx[values == edges[-1]] = nbins - 1
+    idx[(idx < 0) | (idx >= nbins) | np.isnan(values)] = -1
+
+    return idx
+
+
+def _grid_stat(
+    pbin: np.ndarray,
+    dbin: np.ndarray,
+    values: np.ndarray,
+    shape: tuple,
+    method: str,
+) -> np.ndarray:
+    """
+    Calculate the statistic of values in each (profile, depth) bin,
+    using the bin indices pbin and dbin of each value.
+    method is one of 'mean', 'geometric mean', or 'max'.
+    Empty bins are nan
+
+    Returns an array with the given (num profiles, num depth bins) shape
+    """
+    flat = pbin * shape[1] + dbin
+    size = shape[0] * shape[1]
+    count = np.bincount(flat, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if method == "max":
+            stat = np.full(size, -np.inf)
+            np.maximum.at(stat, flat, values)
+        elif method == "geometric mean":
+            stat = np.exp(
+                np.bincount(flat, weights=np.log(values), minlength=size) / count
+            )
+        else:
+            stat = np.bincount(flat, weights=values, minlength=size) / count
+    stat[count == 0] = np.nan
+
+    return stat.reshape(shape)
+
+
+def _gridfile_state_path(outname: str) -> str:
+    """
+    Path of the profile state file of gridded file outname,
+    used by make_gridfiles_esd when incremental is True
+    """
+    return f"{os.path.splitext(outname)[0]}-profiles.npz"
+
+
+def _profile_hashes(
+    ds: xr.Dataset,
+    varnames: list,
+    pbin: np.ndarray,
+    rows: np.ndarray,
+    check: np.ndarray,
+) -> np.ndarray:
+    """
+    Hash the values of varnames in the rows of each profile bin.
+    pbin is the profile bin of each row, and only rows where rows is True
+    are included. The hash of a profile only changes if the data
+    of that profile changes. Only the profiles where check is True
+    are hashed, and only their rows are read
+
+    Returns an array of hex digests, one per profile, with empty strings
+    for the profiles that were not hashed
+    """
+    nprof = check.shape[0]
+    idx = np.flatnonzero(rows)
+    idx = idx[check[pbin[idx]]]
+    order = idx[np.argsort(pbin[idx], kind="stable")]
+    bounds = np.searchsorted(pbin[order], np.arange(nprof + 1))
+    hashes = {i: hashlib.sha1() for i in np.flatnonzero(check)}
+    for var in varnames:
+        values = ds[var].values[order]
+        if np.issubdtype(values.dtype, np.datetime64):
+            values = values.view("int64")
+        elif values.dtype.kind == "O":
+            values = values.astype(str)
+        for i, h in hashes.items():
+            h.update(values[bounds[i] : bounds[i + 1]].tobytes())
+
+    out = np.full(nprof, "", dtype="<U40")
+    for i, h in hashes.items():
+        out[i] = h.hexdigest()
+
+    return out
+
+
+def _gridfile_state_load(
+    outname: str,
+    depth_bins: np.ndarray,
+    varnames: set,
+) -> dict | None:
+    """
+    Load the profile state file of the existing gridded file outname.
+    Returns None if either file does not exist, or if the depth bins
+    or gridded variables have changed, i.e. if no profile columns
+    of outname can be reused
+    """
+    state_path = _gridfile_state_path(outname)
+    if not (os.path.exists(outname) and os.path.isfile(state_path)):
+        _log.info("No existing gridded file and profile state for %s", outname)
+        return None
+
+    with np.load(state_path) as npz:
+        state = {k: npz[k] for k in npz.files}
+    with xr.open_dataset(outname, decode_times=False) as dsold:
+        old_profiles = dsold["profile"].values
+        old_vars = set(dsold.variables)
+    if not (
+        np.array_equal(state["depth_bins"], depth_bins)
+        and np.array_equal(state["profile"], old_profiles)
+        and (old_vars == varnames)
+    ):
+        _log.info("Depth bins or variables of %s have changed", outname)
+        return None
+
+    return state
+
+
+def _gridfile_states_equal(states: list) -> bool:
+    """
+    Return True if the profile states, e.g. of the gridded files
+    made together by make_gridfiles_esd, are the same
+    """
+    return all(
+        np.array_equal(states[0]["profile"], i["profile"])
+        and np.array_equal(states[0]["hash"], i["hash"])
+        and str(states[0].get("frozen_build")) == str(i.get("frozen_build"))
+        and str(states[0].get("frozen_time")) == str(i.get("frozen_time"))
+        for i in states
+    )
+
+
+def _gridfile_reusable(
+    ds: xr.Dataset,
+    varnames: list,
+    pbin: np.ndarray,
+    rows: np.ndarray,
+    profiles: np.ndarray,
+    state: dict,
+    frozen: dict | None,
+) -> tuple:
+    """
+    Determine which profile columns of the existing gridded file(s) with
+    profile state state can be reused, i.e. the profiles that have the same
+    hash as in state (see _profile_hashes for the other arguments).
+
+    If frozen is not None, and has the same build as when the state was
+    saved, then the rows of ds before the frozen time of the state have not
+    changed. Profiles that end before this time, and that are in state,
+    are then not hashed, and are reused
+
+    Returns
+    -------
+    tuple
+        A boolean array, True for profiles that do not need to be regridded,
+        and the hashes of the profiles
+    """
+    nprof = profiles.shape[0]
+    old_profiles = state["profile"]
+    idx = np.searchsorted(old_profiles, profiles)
+    found = idx < old_profiles.shape[0]
+    idx[~found] = 0
+    found &= old_profiles[idx] == profiles
+
+    check = np.ones(nprof, dtype=bool)
+    if (frozen is not None) and (str(state.get("frozen_build")) == frozen["build"]):
+        good = rows & ~np.isnat(ds["time"].values)
+        prof_end = np.full(nprof, np.datetime64("NaT"), dtype="datetime64[ns]")
+        time = ds["time"].values[good].astype("datetime64[ns]")
+        np.maximum.at(prof_end.view("int64"), pbin[good], time.view("int64"))
+        check = ~found | (prof_end >= state["frozen_time"])
+        _log.info(
+            "Hashing %s of %s profiles, with data after %s",
+            np.count_nonzero(check),
+            nprof,
+            state["frozen_time"],
+        )
+
+    hashes = _profile_hashes(ds, varnames, pbin, rows, check)
+    hashes[~check] = state["hash"][idx[~check]]
+    reusable = found & (state["hash"][idx] == hashes)
+
+    return reusable, hashes
+
+
+def _gridfile_write_columns(dsout: xr.Dataset, outname: str, cols: np.ndarray):
+    """
+    Update the existing gridded file outname with the profile columns of
+    dsout, e.g. as written by make_gridfiles_esd when incremental is True.
+    cols are the (sorted) indices of the profiles of dsout in the updated
+    file. Columns of existing profiles are overwritten, in contiguous runs,
+    and new profiles are appended. The attributes of outname are updated
+    """
+    with xr.open_dataset(outname, decode_times=False) as dsold:
+        nold = dsold.sizes["time"]
+    is_old = cols < nold
+    runs = np.split(
+        np.flatnonzero(is_old), np.flatnonzero(np.diff(cols[is_old]) != 1) + 1
+    )
+    for run in runs:
+        if len(run) > 0:
+            utils.write_rows_esd(dsout.isel(time=run), outname, int(cols[run[0]]))
+    if np.any(~is_old):
+        utils.append_esd(dsout.isel(time=np.flatnonzero(~is_old)), outname)
+    utils.update_attrs_esd(outname, dsout.attrs)
+
+
+def _splice_columns(dat, regrid: np.ndarray, dat_old) -> np.ndarray:
+    """
+    Combine the gridded columns (last dimension) dat of the profiles being
+    regridded with the columns dat_old of the profiles being reused.
+    regrid is True for the profiles in dat, and False for those in dat_old
     """
+    dat = np.asarray(dat)
+    out = np.empty(dat.shape[:-1] + regrid.shape, dtype=dat.dtype)
+    out[..., regrid] = dat
+    out[..., ~regrid] = dat_old
+
+    return out
+
+
+def make_gridfiles_esd(
+    inname,
+    outdir: str,
+    deploymentyaml,
+    depth_bins: dict,
+    *,
+    exclude_vars: list | None = None,
+    max_gap=100,
+    incremental: bool = False,
+    depth_var: str = "depth",
+    backend: str = "netcdf",
+    inputs_fingerprint: str | None = None,
+    frozen: dict | None = None,
+) -> list:
+    """
+    Make gridded files of a science timeseries for several sets of depth bins,
+    e.g. 1m and 5m, from a single read of the timeseries.
+    Follows pyglider.ncprocess.make_gridfiles, and the output files have
+    the same variables and attributes.
+
+    The profile bin of each point, and the profile time/lat/lon summaries, are
+    calculated once. The depth bins of each point are calculated once for the
+    finest depth bins. The depth bins of coarser sets of depth bins that nest
+    within the finest bins (e.g., 5m in 1m) are then mapped from
+    the finest bins, rather than being calculated from depth again.
+    Values are then binned in data order, so the results are identical
+    to binning each set of depth bins separately. Geometric means are
+    the same to within floating point rounding
+
+    If incremental is True, a hash of the data of each profile is stored
+    in a profile state file ('{gridded file name}-profiles.npz') next to
+    each gridded file. When rerun, only profiles that are new, or whose data
+    have changed, are gridded. The columns of all other profiles are
+    reused. If the existing profiles are unchanged and any new profiles
+    are after them, then only the columns of the regridded profiles are
+    written to the existing gridded files. Otherwise, the reused columns
+    are copied from the existing gridded files, which are rewritten.
+    Intended for real-time processing, where only the last few profiles
+    change at each surfacing
+
     Parameters
     ----------
-    inname : str or Path
-        netcdf file to break into profiles.
-        Passed directly to inname argument of pyglider.ncprocess.make_gridfiles
+    inname : str, Path, or xarray Dataset
+        Path of the science timeseries netcdf file to grid,
+        or the science timeseries Dataset. A Dataset is not modified
+    outdir : str or Path
+        Directory to which to write the gridded files
+    deploymentyaml : str or Path
+        Deployment yaml file used to make the timeseries file
+    depth_bins : dict
+        Dictionary of {fnamesuffix: depth bin edges}. For each item, a gridded
+        file '{deployment_name}_grid{fnamesuffix}.nc' is written,
+        using the depth bin edges, e.g. np.arange(0, 1200.1, 1)
+    exclude_vars : list | None, default None
+        Variables to not grid, e.g. gridded_exclude_vars
+    max_gap : int, default 100
+        Maximum gap in depth (m) across which to interpolate nan values
+    incremental : bool, default False
+        If True, only regrid the profiles that are new or have changed
+        since the existing gridded files were made. If False, all profiles
+        are gridded, and any profile state files are removed
+    depth_var : str, default "depth"
+        Name of the depth variable used to bin the data, e.g. 'depth_measured'.
+        The depth coordinate of the gridded files is always named 'depth',
+        and neither depth_var nor 'depth' are gridded
+    backend : str, default 'netcdf'
+        The output backend, either 'netcdf' or 'zarr'. If 'zarr', the
+        gridded files are Zarr stores ('.zarr'); see utils.backend_ext
+    inputs_fingerprint : str | None, default None
+        If not None, the fingerprint of the inputs of the gridded files,
+        which is written to the utils.fingerprint_attr attribute of each file.
+        Each file is written to a local staging area, and published
+        with its fingerprint once complete (see utils.staged_output)
+    frozen : dict | None, default None
+        If incremental, the 'time' before which the rows of inname will not
+        change while its 'build' is the same, e.g. from _raw_frozen_since.
+        frozen is saved in the profile state files. When rerun with the same
+        build, only the profiles with data after the saved time, or that are
+        new, are hashed. If None, all profiles are hashed
+
+    Returns
+    -------
+    list of strings
+        The paths of the gridded files, in the order of depth_bins
+    """
+    utils.makedirs_pass(outdir)
+    if exclude_vars is None:
+        exclude_vars = []
+    deployment = pgutils._get_deployment(deploymentyaml)
+    profile_meta = deployment.get("profile_variables", {})
+    policy = utils.get_encoding_policy(deployment)
+
+    if isinstance(inname, xr.Dataset):
+        ds = inname
+        _log.info("Working on: in-memory dataset")
+    else:
+        ds = xr.load_dataset(inname)
+        _log.info(f"Working on: {inname}")
+
+    # Profile bins, shared by all depth bins
+    pidx = ds["profile_index"].values
+    profiles = np.unique(pidx)
+    profiles = profiles[~np.isnan(profiles) & (profiles % 1 == 0) & (profiles > 0)]
+    profile_bins = np.hstack((profiles - 0.5, [profiles[-1] + 0.5]))
+    nprof = profiles.shape[0]
+    _log.info(f"Nprofiles {nprof}")
+    pbin = _digitize_bins(pidx, profile_bins)
+    in_prof = (pidx % 1 == 0) & (pbin >= 0)
+
+    # Variables to grid, and the method used to bin each variable
+    skip_vars = {"time", "latitude", "longitude", "depth", depth_var, "profile_index"}
+    grid_methods = {}
+    for k in ds.keys():
+        if k in skip_vars or "time" in k or k in exclude_vars:
+            continue
+        if not np.issubdtype(ds[k].dtype, np.number):
+            continue
+        if not np.any(~np.isnan(ds[k].values) & (pidx % 1 == 0)):
+            continue
+        if "QC_protocol" in ds[k].attrs.values():
+            grid_methods[k] = "max"
+        elif ds[k].attrs.get("average_method") == "geometric mean":
+            grid_methods[k] = "geometric mean"
+        else:
+            grid_methods[k] = "mean"
+
+    depth_bins = {k: np.asarray(v) for k, v in depth_bins.items()}
+    outnames = {
+        key: utils.product_path(
+            os.path.join(outdir, f"{ds.attrs['deployment_name']}_grid{key}"),
+            backend,
+        )
+        for key in depth_bins.keys()
+    }
+
+    # If incremental, only regrid profiles that are new or have changed
+    prof_vars = ["time", "longitude", "latitude"]
+    regrid = np.ones(nprof, dtype=bool)
+    state = None
+    if incremental:
+        hash_vars = ["time", depth_var, "longitude", "latitude", *grid_methods.keys()]
+        out_vars = {"depth", "profile", "mission_number", "profile_time_start"}
+        out_vars |= {"profile_time_end", *prof_vars, *grid_methods.keys()}
+        states = [
+            _gridfile_state_load(outnames[key], edges, out_vars)
+            for key, edges in depth_bins.items()
+        ]
+        if ("water_velocity_eastward" in grid_methods) and ("u" in profile_meta):
+            _log.info("Gridded u and v are depth means; regridding all profiles")
+        elif any(
+            np.count_nonzero(~np.isnan(ds[i].values) & in_prof) <= 1 for i in prof_vars
+        ):
+            _log.info("Not enough profile time/lat/lon values; regridding all profiles")
+        elif any(i is None for i in states) or not _gridfile_states_equal(states):
+            _log.info("The profile states of the gridded files differ or are missing")
+        else:
+            state = states[0]
+            reusable, hashes = _gridfile_reusable(
+                ds,
+                hash_vars,
+                pbin,
+                in_prof,
+                profiles,
+                state,
+                frozen,
+            )
+            regrid = ~reusable
+        if state is None:
+            hashes = _profile_hashes(
+                ds,
+                hash_vars,
+                pbin,
+                in_prof,
+                np.ones(nprof, dtype=bool),
+            )
+        _log.info(f"Regridding {np.count_nonzero(regrid)} of {nprof} profiles")
+    nsub = np.count_nonzero(regrid)
+    rows = in_prof & regrid[pbin]
+    psub = (np.cumsum(regrid) - 1)[pbin]
+
+    # Reused profile columns: if the existing profiles are unchanged and
+    # precede any new profiles, only the regridded columns are written
+    # to the existing gridded files. Otherwise, the columns are copied
+    # from the existing gridded files, which are then rewritten
+    inplace = False
+    dsolds = {}
+    old_idx = None
+    if not np.all(regrid):
+        old_profiles = state["profile"]  # type: ignore
+        inplace = np.array_equal(profiles[: old_profiles.shape[0]], old_profiles)
+        inplace &= all(utils.is_appendable(i) for i in outnames.values())
+        if not inplace:
+            for key, outname in outnames.items():
+                dsolds[key] = xr.load_dataset(outname)
+            old_idx = np.searchsorted(old_profiles, profiles[~regrid])
+
+    def _splice(key, var, dat):
+        if old_idx is None:
+            return dat
+        dat_old = dsolds[key][var].values[..., old_idx]
+        return _splice_columns(dat, regrid, dat_old.astype(dat.dtype))
+
+    # Depth bins of each point: map coarser bins from the finest bins,
+    # if their edges nest within the finest bins
+    depth = ds[depth_var].values
+    edges_fine = min(depth_bins.values(), key=lambda x: np.diff(x).min())
+    dbin_fine = _digitize_bins(depth, edges_fine)
+    dbins = {}
+    for key, edges in depth_bins.items():
+        if np.all(np.isin(edges, edges_fine)) and (edges[-1] == edges_fine[-1]):
+            fine_to_coarse = _digitize_bins(edges_fine[:-1], edges)
+            dbins[key] = np.where(dbin_fine >= 0, fine_to_coarse[dbin_fine], -1)
+        else:
+            _log.debug("Depth bins %s do not nest in the finest bins", key)
+            dbins[key] = _digitize_bins(depth, edges)
+
+    # Profile time, lat, and lon means, and start/end times
+    dsprof = {}
+    time_1970 = ds.time.values.astype(np.float64)
+    for td in prof_vars:
+        values = time_1970 if td == "time" else ds[td].values
+        good = ~np.isnan(values) & rows
+        if np.count_nonzero(~np.isnan(values) & (pidx % 1 == 0)) > 1:
+            dat = _grid_stat(psub[good], 0, values[good], (nsub, 1), "mean")[:, 0]
+            if td == "time":
+                dat = dat.astype("timedelta64[ns]") + np.datetime64(
+                    "1970-01-01T00:00:00"
+                )
+        else:
+            dat = np.full(nsub, np.nan)
+            _log.info(f"Only {np.count_nonzero(good)} good values for {td}")
+        dsprof[td] = (dat, ds[td].attrs)
+
+    good = ~np.isnat(ds.time.values) & rows
+    for td, method in (("profile_time_start", "min"), ("profile_time_end", "max")):
+        sign = -1 if method == "min" else 1
+        dat = (
+            sign
+            * _grid_stat(
+                psub[good],
+                0,
+                sign * time_1970[good],
+                (nsub, 1),
+                "max",
+            )[:, 0]
+        )
+        dat = dat.astype("timedelta64[ns]") + np.datetime64("1970-01-01T00:00:00")
+        dsprof[td] = (dat, profile_meta.get(td, {}))
+
+    # Output datasets, one per set of depth bins
+    dsouts = {}
+    for key, edges in depth_bins.items():
+        depths = 0.5 * (edges[:-1] + edges[1:])
+        dsout = xr.Dataset(
+            coords={
+                "depth": ("depth", depths),
+                "profile": ("time", profiles[regrid] if inplace else profiles),
+            },
+        )
+        dsout["depth"].attrs = {
+            "units": "m",
+            "long_name": "Depth",
+            "standard_name": "depth",
+            "positive": "down",
+            "source": ds[depth_var].attrs.get("source", ""),
+            "coverage_content_type": "coordinate",
+            "comment": "center of depth bins",
+        }
+        for td, (dat, attrs) in dsprof.items():
+            dsout[td] = (("time"), _splice(key, td, dat), attrs)
+        dsouts[key] = dsout
+    _log.info("Done times!")
+
+    # Grid variables
+    for k, method in grid_methods.items():
+        _log.info("Gridding %s", k)
+        values = ds[k].values
+        good = ~np.isnan(values) & rows
+        for key, dbin in dbins.items():
+            good_bin = good & (dbin >= 0)
+            dat = _grid_stat(
+                psub[good_bin],
+                dbin[good_bin],
+                values[good_bin],
+                (nsub, depth_bins[key].shape[0] - 1),
+                method,
+            )
+            dat = (
+                xr.DataArray(
+                    dat.T,
+                    coords={"depth": dsouts[key]["depth"].values},
+                    dims=("depth", "time"),
+                )
+                .interpolate_na(
+                    dim="depth",
+                    method="linear",
+                    max_gap=max_gap,
+                )
+                .values
+            )
+            dsouts[key][k] = (("depth", "time"), _splice(key, k, dat), ds[k].attrs)
+
+    for key, dsout in dsouts.items():
+        dsout = _gridfile_finish(dsout, ds.attrs, profile_meta)
+        outname = outnames[key]
+        if inputs_fingerprint is not None:
+            dsout.attrs[utils.fingerprint_attr] = inputs_fingerprint
+        state_path = _gridfile_state_path(outname)
+        if inplace:
+            # The state is removed first, so that it does not match
+            # a partially updated file
+            _log.info("Writing %s profiles to %s", nsub, outname)
+            utils.remove_file(state_path)
+            _gridfile_write_columns(dsout, outname, np.flatnonzero(regrid))
+        else:
+            _log.info("Writing %s", outname)
+            time_encoding = {
+                "units": "seconds since 1970-01-01T00:00:00Z",
+                "_FillValue": np.nan,
+                "calendar": "gregorian",
+                "dtype": "float64",
+            }
+            if backend == "zarr":
+                dsout, encoding = utils.zarr_encoding(dsout, policy)
+            else:
+                dsout, encoding = utils.netcdf_encoding(dsout, policy)
+            for var in ["time", "profile_time_start", "profile_time_end"]:
+                encoding[var] = encoding.get(var, {}) | time_encoding
+            with utils.staged_output(outname) as stage_path:
+                if backend == "zarr":
+                    # Zarr writes no fill value if None, rather than False
+                    encoding["time"]["_FillValue"] = None
+                    dsout.to_zarr(
+                        stage_path,
+                        mode="w",
+                        encoding=encoding,
+                        consolidated=True,
+                    )
+                else:
+                    # If incremental, written so that profiles can be appended
+                    encoding["time"]["_FillValue"] = False
+                    dsout.to_netcdf(
+                        stage_path,
+                        encoding=encoding,
+                        unlimited_dims=["time"] if incremental else None,
+                    )
+
+        if incremental:
+            with utils.staged_output(state_path) as stage_path:
+                np.savez(
+                    stage_path,
+                    profile=profiles,
+                    hash=hashes,  # type: ignore
+                    depth_bins=depth_bins[key],
+                    frozen_build="" if frozen is None else frozen["build"],
+                    frozen_time=np.datetime64(
+                        "NaT" if frozen is None else frozen["time"],
+                        "ns",
+                    ),
+                )
+        else:
+            utils.remove_file(state_path)
+    _log.info("Done gridding")
+
+    return list(outnames.values())
+
+
+def _gridfile_finish(dsout: xr.Dataset, attrs: dict, profile_meta: dict):
+    """
+    Final variable and attribute updates of a gridded dataset,
+    as in pyglider.ncprocess.make_gridfiles. attrs are the
+    attributes of the timeseries that was gridded
+    """
+    # fix u and v, because they should really not be gridded...
+    if ("water_velocity_eastward" in dsout.keys()) and ("u" in profile_meta.keys()):
+        dsout["u"] = dsout.water_velocity_eastward.mean(axis=0)
+        dsout["u"].attrs = profile_meta["u"]
+        dsout["v"] = dsout.water_velocity_northward.mean(axis=0)
+        dsout["v"].attrs = profile_meta["v"]
+        dsout = dsout.drop_vars(["water_velocity_eastward", "water_velocity_northward"])
+    dsout.attrs = attrs.copy()
+    dsout.attrs.pop("cdm_data_type")
+
+    # fix to be ISO parsable:
+    if len(dsout.attrs["deployment_start"]) > 18:
+        for attr in [
+            "deployment_start",
+            "deployment_end",
+            "time_coverage_start",
+            "time_coverage_end",
+        ]:
+            dsout.attrs[attr] = dsout.attrs[attr][:19]
+
+    # fix standard_name so they don't overlap! As in pyglider, stop at
+    # the first variable that is missing or has no standard_name
+    for var in [
+        "waypoint_latitude",
+        "waypoint_longitude",
+        "profile_time_start",
+        "profile_time_end",
+    ]:
+        if "standard_name" not in dsout.get(var, xr.DataArray()).attrs:
+            break
+        dsout[var].attrs.pop("standard_name")
+
+    # remove, so they can be encoded later:
+    for var in ["time", "profile_time_start", "profile_time_end"]:
+        for attr in ["units", "calendar", "_FillValue"]:
+            dsout[var].attrs.pop(attr, None)
+
+    # set some attributes for cf guidance
+    # see H.6.2. Profiles along a single trajectory
+    # https://cfconventions.org/Data/cf-conventions/cf-conventions-1.7/build/aphs06.html
+    dsout.attrs["featureType"] = "trajectoryProfile"
+    dsout["profile"].attrs["cf_role"] = "profile_id"
+    dsout["mission_number"] = np.int32(1)
+    dsout["mission_number"].attrs["cf_role"] = "trajectory_id"
+    dsout = dsout.set_coords(["latitude", "longitude", "time"])
+    coord_vars = ["profile", "depth", "latitude", "longitude", "time", "mission_number"]
+    for k in dsout:
+        if k in coord_vars:
+            dsout[k].attrs["coverage_content_type"] = "coordinate"
+        else:
+            dsout[k].attrs["coverage_content_type"] = "physicalMeasurement"
+
+    return dsout
+
+
+def grid_esd(
+    inname,
+    paths,
+    inputs_fingerprint=None,
+    incremental=False,
+    depth_var="depth",
+    backend="netcdf",
+    frozen=None,
+):
+    """
+    Parameters
+    ----------
+    inname : str, Path, or xarray Dataset
+        netcdf file, or Dataset, to break into profiles.
+        Passed directly to inname argument of make_gridfiles_esd
     paths : dict
         A dictionary of file/directory paths for various processing steps.
         Intended to be the output of get_path_glider()
         See this function for the expected key/value pairs
+    inputs_fingerprint : str | None, default None
+        If not None, the fingerprint of the inputs of the gridded products,
+        which is written to the utils.fingerprint_attr attribute of each file
+    incremental : bool, default False
+        Passed to the incremental argument of make_gridfiles_esd.
+        If True, only new or changed profiles are regridded
+    depth_var : str, default "depth"
+        Name of the depth variable used to bin the data.
+        Passed to the depth_var argument of make_gridfiles_esd
+    backend : str, default "netcdf"
+        The output backend, either 'netcdf' or 'zarr'.
+        Passed to the backend argument of make_gridfiles_esd
+    frozen : dict | None, default None
+        Passed to the frozen argument of make_gridfiles_esd
 
     Returns
     -------
     list of strings
         A list of the generated gridded datasets, i.e.
-        a list of the output(s) from pyglider.ncprocess.make_gridfiles
+        the output of make_gridfiles_esd
     """
 
-    outnames = []
-    for i in bin_size:
-        _log.info("Generating %sm gridded data", i)
-        outname_gr = pgncprocess.make_gridfiles(
-            inname,
-            paths["griddir"],
-            paths["deploymentyaml"],
-            depth_bins=np.arange(0, depth_max, i),
-            fnamesuffix=f"-{paths['mode']}-{i}m",
-            exclude_vars=gridded_exclude_vars,
-        )
-        outnames.append(outname_gr)
+    _log.info("Generating %s gridded data", ", ".join(f"{i}m" for i in bin_size))
+    outnames = make_gridfiles_esd(
+        inname,
+        paths["griddir"],
+        paths["deploymentyaml"],
+        {f"-{paths['mode']}-{i}m": np.arange(0, depth_max, i) for i in bin_size},
+        exclude_vars=gridded_exclude_vars,
+        incremental=incremental,
+        depth_var=depth_var,
+        backend=backend,
+        inputs_fingerprint=inputs_fingerprint,
+        frozen=frozen,
+    )
 
     return outnames
 
 
-def make_gridfiles_depth_measured(paths):
+def make_gridfiles_depth_measured(
+    paths,
+    ds_sci: xr.Dataset | None = None,
+    backend: str = "netcdf",
+):
     """
     Make gridfiles using the measured depth. This function will be used
     if for instance the CTD was turned off during parts of a deployment, and
     thus the depth calculated from the CTD does not span the full timeseries.
 
-    A temporary nc file is written, to pass to
-    pyglider.ncprocess.make_gridfiles. The science dataset is not altered.
+    The science dataset is gridded in memory by make_gridfiles_esd, binned by
+    'depth_measured'. The science dataset is not altered.
 
     Parameters
     ----------
@@ -1530,6 +3904,11 @@ def make_gridfiles_depth_measured(paths):
         A dictionary of file/directory paths for various processing steps.
         Intended to be the output of get_path_glider()
         See this function for the expected key/value pairs
+    ds_sci : xarray Dataset | None, default None
+        The science timeseries. If None, it is read from paths["tsscipath"],
+        with the extension of backend
+    backend : str, default 'netcdf'
+        The output backend, either 'netcdf' or 'zarr'; passed to grid_esd
 
     Returns
     -------
@@ -1537,33 +3916,27 @@ def make_gridfiles_depth_measured(paths):
     """
 
     _log.info("Generating gridded files using measured_depth")
-    outname_tssci = paths["tsscipath"]
-    outname_gr1m = paths["gr1path"]
-    outname_gr5m = paths["gr5path"]
-
-    utils.remove_file(outname_gr1m)
-    utils.remove_file(outname_gr5m)
-    if not os.path.isfile(outname_tssci):
-        raise FileNotFoundError(f"Could not find {outname_tssci}")
+    outname_tssci = utils.product_path(paths["tsscipath"], backend)
+    if ds_sci is None:
+        if not os.path.exists(outname_tssci):
+            raise FileNotFoundError(f"Could not find {outname_tssci}")
+        ds_sci = xr.load_dataset(outname_tssci)
 
     _log.debug("Excluded vars: %s", ", ".join(gridded_exclude_vars))
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # Creating temporary science dataset with measured depth as depth
-        temp_file = os.path.join(temp_dir, os.path.basename(outname_tssci))
-        _log.debug("temp_file %s", temp_file)
-        ds_sci_tmp = xr.load_dataset(outname_tssci)
-        ds_sci_tmp = ds_sci_tmp.drop_vars(["depth"]).rename({"depth_measured": "depth"})
-
-        # Add a comment that the bins were created useing depth_measured
-        tmp_comment = (
-            "Glider data was gridded using the glider measured depth (m_depth)"
-        )
-        if not ds_sci_tmp.attrs["comment"].strip():
-            ds_sci_tmp.attrs["comment"] = tmp_comment
-        else:
-            ds_sci_tmp.attrs["comment"] += ". " + tmp_comment
-        utils.to_netcdf_esd(ds_sci_tmp, temp_file)
+    # Add a comment that the bins were created useing depth_measured,
+    # to a shallow copy so the science dataset is not altered
+    ds_sci = ds_sci.copy(deep=False)
+    ds_sci.attrs = ds_sci.attrs.copy()
+    tmp_comment = "Glider data was gridded using the glider measured depth (m_depth)"
+    if not ds_sci.attrs["comment"].strip():
+        ds_sci.attrs["comment"] = tmp_comment
+    else:
+        ds_sci.attrs["comment"] += ". " + tmp_comment
 
-        outnames = grid_esd(temp_file, paths=paths)
-    return outnames
+    return grid_esd(
+        ds_sci,
+        paths=paths,
+        depth_var="depth_measured",
+        backend=backend,
+    )
@@ -1,8 +1,13 @@
 import concurrent.futures
+import contextlib
 import functools
 import logging
 import os
+import time
+import traceback
 import typing
+import uuid
+from multiprocessing import shared_memory
 
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
@@ -194,6 +199,315 @@ eng_vars = [
     "profile_direction",
 ]
 
+"""
+Raw dataset variables used by each engineering thisVsThat plot made by
+eng_plots_to_make, by plot key. The function that makes each plot
+(see _eng_plot_builders) is only given these variables
+"""
+eng_tvt_plot_vars = {
+    "oilVol": ["commanded_oil_volume", "measured_oil_volume"],
+    "diveEnergy": ["total_num_inflections", "amphr", "total_amphr"],
+    "diveDepth": ["target_depth", "depth_measured"],
+    "inflections": ["total_num_inflections", "total_amphr"],
+    "diveAmpHr": ["depth_measured", "amphr"],
+    "leakDetect": ["leak_detect", "leak_detect_forward", "leak_detect_science"],
+    "vacuumDepth": ["vacuum", "depth_measured"],
+}
+
+"""
+List of raw dataset variables used by eng_plots_to_make,
+i.e. the variables needed for the engineering thisVsThat plots
+"""
+eng_tvt_vars = list(dict.fromkeys(v for i in eng_tvt_plot_vars.values() for v in i))
+
+
+def plot_vars_manifest(depth_var: str = "depth") -> dict:
+    """
+    Get the variables needed by each family of plots made by esd_all_plots,
+    so that only these variables are read from the dataset files.
+    Built from sci_vars, eng_vars, and eng_tvt_plot_vars
+
+    Parameters
+    ----------
+    depth_var : str
+        Name of the depth variable in the science dataset.
+        See 'sci_timeseries_loop' for more details
+
+    Returns
+    -------
+    dict
+        Dictionary of {plot family: list of variable names}.
+        Variables that are not in a dataset are ignored when it is read
+    """
+    scatter = ["time", "longitude", "latitude"]
+    gridded = [*sci_vars.keys(), "profile", "depth", *scatter]
+
+    return {
+        "scatter": scatter,
+        "sci_gridded": gridded,
+        "sci_surface_map": gridded,
+        "sci_timeseries": [
+            *sci_vars.keys(),
+            depth_var,
+            "profile_index",
+            "salinity",
+            "potential_temperature",
+            *scatter,
+        ],
+        "eng_timeseries": [*eng_vars, "time"],
+        "eng_tvt": [*eng_tvt_vars, "time"],
+    }
+
+
+def load_plot_dataset(path, varnames: list) -> xr.Dataset:
+    """
+    Lazily open the dataset at path (e.g., a NetCDF file or Zarr store),
+    and load only the variables in varnames that are in the dataset.
+    Global and variable attributes are kept
+    """
+    with xr.open_dataset(path) as ds:
+        names = list(dict.fromkeys(i for i in varnames if i in ds.variables))
+        _log.debug("Loading %s of %s variables from %s", len(names), len(ds), path)
+        return ds[names].load()
+
+
+# Shared memory datasets attached by this (worker) process, by token.
+# Holds the SharedMemory objects, so that the array views stay valid
+_shared_attached = {}
+
+
+@contextlib.contextmanager
+def shared_dataset(ds: xr.Dataset):
+    """
+    Context manager to share ds with plotting worker processes.
+    The numeric (including datetime) arrays of ds are copied once into
+    multiprocessing.shared_memory blocks, and a small descriptor of ds is
+    yielded. Workers rebuild ds from the descriptor with
+    attach_shared_dataset, as zero-copy, read-only views of the blocks.
+    String and empty arrays are stored in the descriptor itself.
+    The shared memory blocks are freed when the with block exits
+
+    Usage:
+    with shared_dataset(ds) as ds_shared: pass ds_shared to the workers
+    """
+    blocks = []
+    descriptor = {
+        "token": uuid.uuid4().hex,
+        "attrs": ds.attrs,
+        "coords": list(ds.coords),
+        "variables": {},
+    }
+    try:
+        for name, variable in ds.variables.items():
+            values = variable.values
+            var_desc = {"dims": variable.dims, "attrs": variable.attrs}
+            if (values.dtype.kind in ["U", "S", "O"]) or (values.size == 0):
+                var_desc["values"] = values
+            else:
+                shm = shared_memory.SharedMemory(create=True, size=values.nbytes)
+                blocks.append(shm)
+                view = np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)
+                view[...] = values
+                var_desc.update(
+                    {"shm": shm.name, "shape": values.shape, "dtype": values.dtype},
+                )
+            descriptor["variables"][name] = var_desc
+        _log.debug(
+            "Shared %s arrays (%s bytes)",
+            len(blocks),
+            sum([i.size for i in blocks]),
+        )
+        yield descriptor
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+
+def attach_shared_dataset(descriptor: dict) -> xr.Dataset:
+    """
+    Rebuild the Dataset shared by shared_dataset from its descriptor.
+    Arrays are read-only views of the shared memory blocks.
+    Each process attaches to the blocks of a descriptor once,
+    and then reuses the Dataset
+    """
+    token = descriptor["token"]
+    if token in _shared_attached:
+        return _shared_attached[token][0]
+
+    blocks = []
+    variables = {}
+    for name, var_desc in descriptor["variables"].items():
+        if "shm" in var_desc:
+            shm = shared_memory.SharedMemory(name=var_desc["shm"])
+            blocks.append(shm)
+            values = np.ndarray(
+                var_desc["shape"],
+                dtype=var_desc["dtype"],
+                buffer=shm.buf,
+            )
+            values.flags.writeable = False
+        else:
+            values = var_desc["values"]
+        variables[name] = xr.Variable(var_desc["dims"], values, var_desc["attrs"])
+    ds = xr.Dataset(variables, attrs=descriptor["attrs"])
+    ds = ds.set_coords(descriptor["coords"])
+    _shared_attached[token] = (ds, blocks)
+
+    return ds
+
+
+def _shared_plot_task(var, func, shared: dict, **kwargs):
+    """
+    Run func(var, **kwargs), for the plotting loops, with the datasets
+    shared by shared_dataset. shared is a dictionary of
+    {func argument name: shared_dataset descriptor}
+    """
+    for arg, descriptor in shared.items():
+        kwargs[arg] = attach_shared_dataset(descriptor)
+    return func(var, **kwargs)
+
+
+"""
+Relative expected cost of each plotting function, per data point of the
+plotted variable (or of the dataset time dimension, for scatter and tvt plots).
+Used by esd_all_plots to start the slowest plots first; only the ratios matter.
+Approximate, from the plot times of a test deployment. Glidertools gridding
+and cartopy maps are expensive, and so are weighted as the slowest plots
+"""
+plot_cost = {
+    "scatter_plot": 1.0,
+    "eng_timeseries_plot": 1.0,
+    "eng_tvt_loop_helper": 1.0,
+    "sci_timeseries_plot": 3.0,
+    "sci_timesection_gt_plot": 6.0,
+    "ts_plot": 3.0,
+    "sci_timesection_plot": 6.0,
+    "sci_spatialsection_plot": 6.0,
+    "sci_spatialgrid_plot": 6.0,
+    "sci_surface_map": 10.0,
+}
+
+
+def plot_tasks(
+    ds_key: str,
+    ds: xr.Dataset,
+    crs=None,
+    ds_sci_depth_var: str = "depth",
+    base_path: str | None = None,
+) -> list:
+    """
+    Make the list of plot tasks of esd_all_plots for one dataset
+
+    Parameters
+    ----------
+    ds_key : str
+        Dataset type: one of 'eng', 'sci', 'raw', or 'gr5m'
+    ds : xarray Dataset
+        The dataset, as loaded by esd_all_plots
+    crs, ds_sci_depth_var, base_path
+        See esd_all_plots
+
+    Returns
+    -------
+    list
+        List of task dictionaries, with keys:
+        'func': the plotting function; 'args': its positional arguments;
+        'data': dictionary of {func argument name: esd_all_plots dataset key};
+        'kwargs': its other keyword arguments;
+        'cost': the expected relative cost of the task (see plot_cost)
+    """
+
+    def task(func, args, size, **kwargs):
+        data = {"ds": ds_key}
+        if func is sci_surface_map:
+            data["bar"] = "bar"
+        return {
+            "func": func,
+            "args": args,
+            "data": data,
+            "kwargs": kwargs | {"base_path": base_path},
+            "cost": plot_cost.get(func.__name__, 1.0) * size,
+        }
+
+    def var_size(var):
+        return ds[var].size if var in ds.variables else 0
+
+    ntime = ds.sizes.get("time", 0)
+    tasks = []
+    if ds_key in ["eng", "sci", "raw"]:
+        tasks.append(task(scatter_plot, (), ntime, ds_type=ds_key))
+
+    if ds_key == "eng":
+        for var in eng_vars:
+            tasks.append(task(eng_timeseries_plot, (var,), var_size(var)))
+    elif ds_key == "sci":
+        for var in sci_vars:
+            size = var_size(var)
+            depth_kwargs = {"depth_var": ds_sci_depth_var}
+            tasks.append(task(sci_timeseries_plot, (var,), size, **depth_kwargs))
+            tasks.append(task(sci_timesection_gt_plot, (var,), size, **depth_kwargs))
+            tasks.append(task(ts_plot, (var,), size))
+    elif ds_key == "raw":
+        for key in _eng_plot_builders(ds):
+            tasks.append(task(eng_tvt_loop_helper, (key,), ntime))
+    elif ds_key == "gr5m":
+        for var in sci_vars:
+            size = var_size(var)
+            tasks.append(task(sci_timesection_plot, (var,), size))
+            tasks.append(task(sci_spatialsection_plot, (var,), size))
+            tasks.append(task(sci_spatialgrid_plot, (var,), size))
+        if crs is not None:
+            for var in sci_vars:
+                tasks.append(task(sci_surface_map, (var,), var_size(var), crs=crs))
+    else:
+        _log.error("Unknown dataset key %s", ds_key)
+        raise ValueError(f"Unknown dataset key {ds_key}")
+
+    return tasks
+
+
+def _task_name(task: dict) -> str:
+    """Readable name of a plot task, for logging"""
+    args = ", ".join([str(i) for i in task["args"]])
+    return f"{task['func'].__name__}({args}) [{task['data']['ds']}]"
+
+
+def _run_plot_task(task: dict, datasets: dict) -> dict:
+    """
+    Run a plot task from plot_tasks, with datasets, a dictionary of
+    {dataset key: xarray Dataset}. Exceptions are caught, so that one
+    failed plot does not stop the others. Returns the task result,
+    with the elapsed seconds and the traceback (None if the task succeeded)
+    """
+    data = {arg: datasets.get(key) for arg, key in task["data"].items()}
+    error = None
+    t0 = time.perf_counter()
+    try:
+        task["func"](*task["args"], **data, **task["kwargs"])
+    except Exception:
+        error = traceback.format_exc()
+        plt.close("all")
+
+    return {
+        "task": _task_name(task),
+        "seconds": time.perf_counter() - t0,
+        "error": error,
+    }
+
+
+def _run_shared_plot_task(task: dict, shared: dict) -> dict:
+    """
+    Run a plot task in a worker process, with the datasets shared by
+    shared_dataset. shared is a dictionary of
+    {dataset key: shared_dataset descriptor}
+    """
+    datasets = {}
+    for key in task["data"].values():
+        if key in shared:
+            datasets[key] = attach_shared_dataset(shared[key])
+    return _run_plot_task(task, datasets)
+
 
 def esd_all_plots(
     ds_paths: dict,
@@ -204,7 +518,16 @@ def esd_all_plots(
     max_workers: int | None = 1,
 ):
     """
-    Wrapper to run all of the plotting loop functions
+    Wrapper to make all of the plots of the plotting loop functions.
+    Each dataset is opened lazily, and only the variables needed by its plots
+    (see plot_vars_manifest) are loaded.
+
+    All plots are scheduled as individual tasks (see plot_tasks).
+    If max_workers is 1, datasets are loaded one at a time, and released once
+    their plots are made. Otherwise, all datasets are shared with the workers
+    of a single process pool (see shared_dataset), and the tasks are run
+    on this pool from the longest to the shortest expected task (see plot_cost).
+    A task that fails is logged, and does not stop the others
 
     Parameters
     ----------
@@ -235,59 +558,123 @@ def esd_all_plots(
 
     Returns
     -------
-        Nothing
+    list
+        List of task results, in the order the tasks completed.
+        Each result is a dictionary with the task name ('task'),
+        its run time ('seconds'), and, if it failed, its traceback ('error')
     """
 
     _log.info("Doing all of the plots")
+    manifest = plot_vars_manifest(ds_sci_depth_var)
+    load_vars = {
+        "eng": manifest["scatter"] + manifest["eng_timeseries"],
+        "sci": manifest["scatter"] + manifest["sci_timeseries"],
+        "raw": manifest["scatter"] + manifest["eng_tvt"],
+        "gr5m": manifest["sci_gridded"] + manifest["sci_surface_map"],
+    }
+    path_keys = {
+        "eng": "outname_tseng",
+        "sci": "outname_tssci",
+        "raw": "outname_tsraw",
+        "gr5m": "outname_gr5m",
+    }
 
-    # Load datasets
-    _log.info("Loading datasets")
-    ds_eng = xr.load_dataset(ds_paths["outname_tseng"])
-    ds_sci = xr.load_dataset(ds_paths["outname_tssci"])
-    ds_gr5m = xr.load_dataset(ds_paths["outname_gr5m"])
-    ds_raw = xr.load_dataset(ds_paths["outname_tsraw"])
+    def load(ds_key):
+        _log.info("Loading %s dataset", ds_key)
+        ds = load_plot_dataset(ds_paths[path_keys[ds_key]], load_vars[ds_key])
+        if ds_key == "raw":
+            ll_good = ~(np.isnan(ds.longitude) | np.isnan(ds.latitude))
+            ds = ds.where(ll_good, drop=True)
+        return ds
 
     # Delete old plots
     if base_path is not None:
         utils.rmtree(os.path.join(base_path))
 
-    # Scatter plots
-    scatter_plot(ds_eng, "eng", base_path)
-    scatter_plot(ds_sci, "sci", base_path)
-    ll_good = ~(np.isnan(ds_raw.longitude) | np.isnan(ds_raw.latitude))
-    ds_raw = ds_raw.where(ll_good, drop=True)
-    scatter_plot(ds_raw, "raw", base_path)
-
-    # Sci/eng loops
-    sci_gridded_loop(ds_gr5m, base_path, max_workers=max_workers)
-    sci_timeseries_loop(
-        ds_sci,
-        depth_var=ds_sci_depth_var,
-        base_path=base_path,
-        max_workers=max_workers,
-    )
-    eng_timeseries_loop(ds_eng, base_path, max_workers=max_workers)
-    eng_tvt_loop(ds_raw, base_path, max_workers=max_workers)
-    # sci_ts_loop(ds_sci, base_path, max_workers=max_workers)
-
-    if bar_file is not None:
+    if (crs is not None) and (bar_file is not None):
         _log.info(f"Loading bar file from {bar_file}")
         bar = xr.load_dataset(bar_file).rename({"latitude": "lat", "longitude": "lon"})
         bar = bar.where(bar.z <= 0, drop=True)
     else:
-        _log.info("No bar file path")
+        _log.info("No bar file path, or no crs")
         bar = None
+    if crs is None:
+        _log.info("No crs provided, and thus skipping surface maps")
 
-    if crs is not None:
-        sci_surface_map_loop(
-            ds_gr5m,
+    def tasks_for(ds_key, ds):
+        return plot_tasks(
+            ds_key,
+            ds,
             crs=crs,
+            ds_sci_depth_var=ds_sci_depth_var,
             base_path=base_path,
-            bar=bar,
-            max_workers=max_workers,
         )
+
+    results = []
+    t0 = time.perf_counter()
+    if max_workers == 1:
+        _log.info("Plotting with one worker, not in parallel")
+        for ds_key in path_keys:
+            datasets = {ds_key: load(ds_key), "bar": bar}
+            for task in tasks_for(ds_key, datasets[ds_key]):
+                results.append(_run_plot_task(task, datasets))
+            del datasets
     else:
-        _log.info("No crs provided, and thus skipping surface maps")
+        if max_workers is None:
+            max_workers = max(1, os.cpu_count())  # type: ignore
+        with contextlib.ExitStack() as stack:
+            # Share each dataset as it is loaded, so that only the
+            # shared copies of the datasets are held at once
+            shared = {}
+            tasks = []
+            for ds_key in path_keys:
+                ds = load(ds_key)
+                tasks.extend(tasks_for(ds_key, ds))
+                shared[ds_key] = stack.enter_context(shared_dataset(ds))
+                del ds
+            if bar is not None:
+                shared["bar"] = stack.enter_context(shared_dataset(bar))
+                del bar
+
+            tasks.sort(key=lambda task: task["cost"], reverse=True)
+            _log.info(
+                "Starting %s plot tasks with %s workers",
+                len(tasks),
+                max_workers,
+            )
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+            ) as executor:
+                futures = {
+                    executor.submit(_run_shared_plot_task, task, shared): task
+                    for task in tasks
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    try:
+                        results.append(future.result())
+                    except Exception:
+                        # e.g., the worker process died
+                        results.append(
+                            {
+                                "task": _task_name(futures[future]),
+                                "seconds": np.nan,
+                                "error": traceback.format_exc(),
+                            },
+                        )
+
+    failed = [i for i in results if i["error"] is not None]
+    for result in failed:
+        _log.error("Plot task %s failed:\n%s", result["task"], result["error"])
+    for result in sorted(results, key=lambda i: -np.nan_to_num(i["seconds"]))[:5]:
+        _log.info("Plot task %s took %.1f s", result["task"], result["seconds"])
+    _log.info(
+        "Completed %s plot tasks (%s failed) in %.1f s",
+        len(results),
+        len(failed),
+        time.perf_counter() - t0,
+    )
+
+    return results
 
 
 def sci_gridded_loop_helper(
@@ -360,16 +747,18 @@ def sci_gridded_loop(
         if max_workers is None:
             max_workers = max(1, os.cpu_count())  # type: ignore
         _log.info("Starting parallel plotting with %s workers", max_workers)
-        task_function = functools.partial(
-            sci_gridded_loop_helper,
-            ds=ds,
-            base_path=base_path,
-            show=show,
-        )
-        with concurrent.futures.ProcessPoolExecutor(
-            max_workers=max_workers,
-        ) as executor:
-            executor.map(task_function, vars_toloop)
+        with shared_dataset(ds) as ds_shared:
+            task_function = functools.partial(
+                _shared_plot_task,
+                func=sci_gridded_loop_helper,
+                shared={"ds": ds_shared},
+                base_path=base_path,
+                show=show,
+            )
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+            ) as executor:
+                list(executor.map(task_function, vars_toloop))
 
     _log.info("Completed gridded science plots")
 
@@ -412,31 +801,50 @@ def eng_tvt_loop(
     if base_path is not None:
         utils.rmtree(os.path.join(base_path, tvt_path))
 
-    eng_dict = eng_plots_to_make(ds)
-    vars_toloop = eng_dict.keys()
+    vars_toloop = list(_eng_plot_builders(ds).keys())
     if max_workers == 1:
         _log.info("Plotting with one worker, not in parallel")
+        eng_dict = eng_plots_to_make(ds)
         for key in vars_toloop:
             eng_tvt_plot(key, ds, eng_dict, base_path=base_path, show=show)
     else:
         if max_workers is None:
             max_workers = max(1, os.cpu_count())  # type: ignore
         _log.info("Starting parallel plotting with %s workers", max_workers)
-        task_function = functools.partial(
-            eng_tvt_plot,
-            ds=ds,
-            eng_dict=eng_dict,
-            base_path=base_path,
-            show=show,
-        )
-        with concurrent.futures.ProcessPoolExecutor(
-            max_workers=max_workers,
-        ) as executor:
-            executor.map(task_function, vars_toloop)
+        # Each worker makes only the eng_dict entry of its key,
+        # rather than pickling its arrays into every task
+        with shared_dataset(ds) as ds_shared:
+            task_function = functools.partial(
+                _shared_plot_task,
+                func=eng_tvt_loop_helper,
+                shared={"ds": ds_shared},
+                base_path=base_path,
+                show=show,
+            )
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+            ) as executor:
+                list(executor.map(task_function, vars_toloop))
 
     _log.info("Completed engineering tvt plots")
 
 
+def eng_tvt_loop_helper(
+    key: str,
+    ds: xr.Dataset,
+    base_path: str | None = None,
+    show: bool = False,
+):
+    """
+    See eng_tvt_loop for variables
+    In short, a small wrapper function that can be passed to
+    concurrent.futures.ProcessPoolExecutor. Only the eng_dict entry
+    of key is made from ds
+    """
+    eng_dict = eng_plots_to_make(ds, keys=[key])
+    eng_tvt_plot(key, ds, eng_dict, base_path=base_path, show=show)
+
+
 def sci_timeseries_loop_helper(
     var: str,
     ds: xr.Dataset,
@@ -533,17 +941,19 @@ def sci_timeseries_loop(
         if max_workers is None:
             max_workers = max(1, os.cpu_count())  # type: ignore
         _log.info("Starting parallel plotting with %s workers", max_workers)
-        task_function = functools.partial(
-            sci_timeseries_loop_helper,
-            ds=ds,
-            depth_var=depth_var,
-            base_path=base_path,
-            show=show,
-        )
-        with concurrent.futures.ProcessPoolExecutor(
-            max_workers=max_workers,
-        ) as executor:
-            executor.map(task_function, vars_toloop)
+        with shared_dataset(ds) as ds_shared:
+            task_function = functools.partial(
+                _shared_plot_task,
+                func=sci_timeseries_loop_helper,
+                shared={"ds": ds_shared},
+                depth_var=depth_var,
+                base_path=base_path,
+                show=show,
+            )
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+            ) as executor:
+                list(executor.map(task_function, vars_toloop))
 
     _log.info("Completed science timeseries plots")
 
@@ -597,16 +1007,18 @@ def eng_timeseries_loop(
         if max_workers is None:
             max_workers = max(1, os.cpu_count())  # type: ignore
         _log.info("Starting parallel plotting with %s workers", max_workers)
-        task_function = functools.partial(
-            eng_timeseries_plot,
-            ds=ds,
-            base_path=base_path,
-            show=show,
-        )
-        with concurrent.futures.ProcessPoolExecutor(
-            max_workers=max_workers,
-        ) as executor:
-            executor.map(task_function, vars_toloop)
+        with shared_dataset(ds) as ds_shared:
+            task_function = functools.partial(
+                _shared_plot_task,
+                func=eng_timeseries_plot,
+                shared={"ds": ds_shared},
+                base_path=base_path,
+                show=show,
+            )
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+            ) as executor:
+                list(executor.map(task_function, vars_toloop))
 
     _log.info("Completed engineering timeseries plots")
 
@@ -738,20 +1150,24 @@ def sci_surface_map_loop(
         if max_workers is None:
             max_workers = max(1, os.cpu_count())  # type: ignore
         _log.info("Starting parallel plotting with %s workers", max_workers)
-        task_function = functools.partial(
-            sci_surface_map,
-            ds=ds,
-            crs=crs,
-            base_path=base_path,
-            show=show,
-            bar=bar,
-            figsize_x=figsize_x,
-            figsize_y=figsize_y,
-        )
-        with concurrent.futures.ProcessPoolExecutor(
-            max_workers=max_workers,
-        ) as executor:
-            executor.map(task_function, vars_toloop)
+        with contextlib.ExitStack() as stack:
+            shared = {"ds": stack.enter_context(shared_dataset(ds))}
+            if bar is not None:
+                shared["bar"] = stack.enter_context(shared_dataset(bar))
+            task_function = functools.partial(
+                _shared_plot_task,
+                func=sci_surface_map,
+                shared=shared,
+                crs=crs,
+                base_path=base_path,
+                show=show,
+                figsize_x=figsize_x,
+                figsize_y=figsize_y,
+            )
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+            ) as executor:
+                list(executor.map(task_function, vars_toloop))
 
     _log.info("Completed surface maps")
 
@@ -759,7 +1175,8 @@ def sci_surface_map_loop(
 def save_plot(fig: matplotlib.figure.Figure, fname: str):
     """
     Wrapper function to save the matplotlib 'figure' object to 'fname'.
-    Create directory to 'fname' if necessary.
+    Create directory to 'fname' if necessary. The figure is saved to
+    a local staging file, and then published to 'fname' (utils.staged_output)
 
     Parameters
     ----------
@@ -777,7 +1194,8 @@ def save_plot(fig: matplotlib.figure.Figure, fname: str):
         os.makedirs(file_dir)
 
     _log.debug(f"Saving {fname}")
-    fig.savefig(fname)
+    with utils.staged_output(fname) as stage_path:
+        fig.savefig(stage_path)
 
 
 def scatter_plot(
@@ -1220,57 +1638,46 @@ def sci_spatialgrid_plot(
     return fig
 
 
-def eng_plots_to_make(ds: xr.Dataset):
+def _eng_plot_builders(ds: xr.Dataset) -> dict:
     """
-    Create dictionary used to make engineering plots.
-    This output is intended to be passed to eng_tvt_plot()
-
-    Parameters
-    ----------
-    ds : xarray dataset
-        Timeseries glider raw dataset.
-        This is intended to be produced by slocum.binary_to_nc
-
-    Returns
-    -------
-    Dictionary used by eng_tvt_plot to make plots
+    Dictionary of {eng_plots_to_make key: function that makes its entry}.
+    Entries are only computed when their function is called,
+    so that a single entry can be made without computing the others.
+    Each function is given only the variables of its key in eng_tvt_plot_vars
     """
 
-    da_c_depth = ds["target_depth"].dropna(dim="time")
-    da_m_depth = ds["depth_measured"].interp(time=da_c_depth.time)
+    def dive_depth(ds):
+        da_c_depth = ds["target_depth"].dropna(dim="time")
+        da_m_depth = ds["depth_measured"].interp(time=da_c_depth.time)
+        return {"X": da_c_depth, "Y": [da_m_depth], "C": ["C0"], "cb": None}
 
-    plots_to_make = {
-        "oilVol": {
+    builders = {
+        "oilVol": lambda ds: {
             "X": ds["commanded_oil_volume"],
             "Y": [ds["measured_oil_volume"]],
             "C": ["C0"],
             "cb": None,
         },
-        "diveEnergy": {
+        "diveEnergy": lambda ds: {
             "X": ds["total_num_inflections"],
             "Y": [ds["amphr"], ds["total_amphr"]],
             "C": ["C0", "C1"],
             "cb": None,
         },
-        "diveDepth": {
-            "X": da_c_depth,
-            "Y": [da_m_depth],
-            "C": ["C0"],
-            "cb": None,
-        },
-        "inflections": {
+        "diveDepth": dive_depth,
+        "inflections": lambda ds: {
             "X": ds["total_num_inflections"],
             "Y": [ds["total_amphr"]],
             "C": ["C0"],
             "cb": None,
         },
-        "diveAmpHr": {
+        "diveAmpHr": lambda ds: {
             "X": ds["depth_measured"],
             "Y": [ds["amphr"]],
             "C": ["C0"],
             "cb": None,
         },
-        "leakDetect": {
+        "leakDetect": lambda ds: {
             "X": ds["time"],
             "Y": [
                 ds["leak_detect"].rolling(time=900, min_periods=10).mean(),
@@ -1280,7 +1687,7 @@ def eng_plots_to_make(ds: xr.Dataset):
             "C": ["C0", "C1", "C2"],
             "cb": None,
         },
-        "vacuumDepth": {
+        "vacuumDepth": lambda ds: {
             "X": ds["time"],
             "Y": [ds["vacuum"]],
             "C": [ds["depth_measured"]],
@@ -1288,7 +1695,38 @@ def eng_plots_to_make(ds: xr.Dataset):
         },
     }
 
-    return plots_to_make
+    def subset(key, func):
+        return lambda: func(ds[eng_tvt_plot_vars[key]])
+
+    return {key: subset(key, func) for key, func in builders.items()}
+
+
+def eng_plots_to_make(ds: xr.Dataset, keys: list | None = None):
+    """
+    Create dictionary used to make engineering plots.
+    This output is intended to be passed to eng_tvt_plot()
+
+    Parameters
+    ----------
+    ds : xarray dataset
+        Timeseries glider raw dataset.
+        This is intended to be produced by slocum.binary_to_nc
+    keys : list | None (default None)
+        Keys of the plots to make. If None, all of the plots are made.
+        The entries of other keys are not computed, e.g. so that
+        a worker making one plot does not compute the rolling means
+        used by the leakDetect plot
+
+    Returns
+    -------
+    Dictionary used by eng_tvt_plot to make plots
+    """
+
+    builders = _eng_plot_builders(ds)
+    if keys is None:
+        keys = list(builders.keys())
+
+    return {key: builders[key]() for key in keys}
 
 
 def eng_tvt_plot(
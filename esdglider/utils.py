@@ -1,11 +1,17 @@
 import collections
+import contextlib
+import glob
+import hashlib
+import json
 import logging
 import os
 import shutil
+import tempfile
 from datetime import datetime, timezone
 from pathlib import Path
 
 import gsw
+import netCDF4
 import numpy as np
 import pandas as pd
 import pytz
@@ -20,23 +26,543 @@ Utilities, mostly specific to ESD needs and ways of processing
 """
 
 
+"""
+Default NetCDF encoding policy used by to_netcdf_esd, and the other writers
+of ESD glider files. compression is one of 'zlib', 'zstd', or None, and is
+applied to all non-scalar variables with complevel and shuffle. Variables
+along only the time dimension are chunked in time_chunksize values.
+float64 variables listed in float32 are written as float32, and string
+variables listed in categorical are written as NetCDF enums. Both are empty
+by default, i.e. opt-in. Enum variables are read by xarray as their integer
+codes; see decode_categorical. The 'netcdf_encoding' section of a deployment
+yaml updates these values; see get_encoding_policy
+"""
+encoding_policy_default = {
+    "compression": "zlib",
+    "complevel": 4,
+    "shuffle": True,
+    "time_chunksize": 65536,
+    "float32": [],
+    "categorical": [],
+}
+
+
+def get_encoding_policy(deployment=None) -> dict:
+    """
+    Get the NetCDF encoding policy: encoding_policy_default, updated with
+    the 'netcdf_encoding' section of a deployment yaml, if present. E.g.:
+
+    netcdf_encoding:
+      compression: zstd
+      float32: [conductivity, temperature, chlorophyll]
+      categorical: [source_filename]
+
+    Parameters
+    ----------
+    deployment : str | dict | None, default None
+        The path to the deployment yaml, or the deployment yaml as a dictionary.
+        If None, encoding_policy_default is returned
+
+    Returns
+    -------
+    dict
+        The encoding policy, with the same keys as encoding_policy_default
+    """
+    if isinstance(deployment, str):
+        deployment = read_deploymentyaml(deployment)
+
+    policy = encoding_policy_default.copy()
+    if deployment is not None:
+        policy.update(deployment.get("netcdf_encoding", {}))
+    if policy["compression"] not in ["zlib", "zstd", None]:
+        _log.error("Invalid compression: %s", policy["compression"])
+        raise ValueError("compression must be one of 'zlib', 'zstd', or None")
+    if (policy["compression"] == "zstd") and not getattr(
+        netCDF4,
+        "__has_zstandard_support__",
+        False,
+    ):
+        _log.warning("netCDF4 does not support zstd compression; using zlib")
+        policy["compression"] = "zlib"
+
+    return policy
+
+
+def netcdf_encoding(ds: xr.Dataset, policy: dict | None = None):
+    """
+    Get the NetCDF encoding of the variables of ds from an encoding policy.
+    Variables in policy['categorical'] are converted to integer codes, and so
+    a shallow copy of ds is returned with the encoding
+
+    Parameters
+    ----------
+    ds : xarray Dataset
+        The dataset to write
+    policy : dict | None, default None
+        The encoding policy, e.g. the output of get_encoding_policy.
+        If None, encoding_policy_default is used
+
+    Returns
+    -------
+    tuple
+        The (shallow copy of) ds to write, and the encoding dictionary
+        to pass to ds.to_netcdf
+    """
+    if policy is None:
+        policy = encoding_policy_default
+    if policy["compression"] == "zlib":
+        compression = {"zlib": True}
+    elif policy["compression"] == "zstd":
+        compression = {"compression": "zstd"}
+    else:
+        compression = {}
+    if len(compression) > 0:
+        compression["complevel"] = policy["complevel"]
+        compression["shuffle"] = policy["shuffle"]
+
+    ds = ds.copy(deep=False)
+    encoding = {}
+    for var in list(ds.variables):
+        variable = ds[var].variable
+        if (variable.ndim == 0) or (variable.size == 0):
+            continue
+        # Keep value encodings, e.g. from the file ds was read from,
+        # but not storage encodings such as chunksizes
+        enc = {
+            k: v
+            for k, v in variable.encoding.items()
+            if k in ["_FillValue", "missing_value", "dtype", "units", "calendar"]
+        }
+        enc.update(compression)
+        if variable.dtype.kind in ["U", "S", "O"]:
+            if var not in policy["categorical"]:
+                encoding[var] = enc
+                continue
+            # Categorical: NetCDF enum of the unique values
+            names, codes = np.unique(variable.values.astype(str), return_inverse=True)
+            dtype = np.min_scalar_type(max(names.shape[0] - 1, 0))
+            enc["dtype"] = np.dtype(
+                dtype,
+                metadata={
+                    "enum": {str(j): i for i, j in enumerate(names)},
+                    "enum_name": f"{var}_enum",
+                },
+            )
+            ds[var] = variable.copy(data=codes.reshape(variable.shape).astype(dtype))
+        elif (var in policy["float32"]) and (variable.dtype == np.float64):
+            enc["dtype"] = "float32"
+        if variable.dims == ("time",):
+            enc["chunksizes"] = (min(policy["time_chunksize"], variable.size),)
+        encoding[var] = enc
+
+    return ds, encoding
+
+
+def decode_categorical(ds: xr.Dataset) -> xr.Dataset:
+    """
+    Decode the NetCDF enum (categorical) variables of ds, e.g. those written
+    by to_netcdf_esd for policy['categorical'], back to strings.
+    xr.open_dataset reads these variables as their integer codes.
+    Returns a shallow copy of ds
+    """
+    ds = ds.copy(deep=False)
+    for var in list(ds.variables):
+        dtype_meta = getattr(ds[var].encoding.get("dtype"), "metadata", None) or {}
+        if "enum" not in dtype_meta:
+            continue
+        lookup = np.empty(max(dtype_meta["enum"].values()) + 1, dtype=object)
+        for name, value in dtype_meta["enum"].items():
+            lookup[value] = name
+        variable = ds[var].variable
+        values = lookup[variable.values.astype(np.int64)].astype(str)
+        ds[var] = xr.Variable(variable.dims, values, variable.attrs)
+
+    return ds
+
+
+def publish_file(stage_path, outname):
+    """
+    Publish the staged file or directory (e.g., Zarr store) stage_path
+    to outname. stage_path is first copied to a temporary name in the
+    directory of outname, if it is on another file system, and then renamed
+    to outname, so that outname is never a partially written product.
+    An existing directory at outname is replaced
+    """
+    outname = str(outname)
+    out_dir = os.path.dirname(os.path.abspath(outname))
+    makedirs_pass(out_dir)
+    if os.stat(stage_path).st_dev != os.stat(out_dir).st_dev:
+        _log.debug("Copying %s to the directory of %s", stage_path, outname)
+        if os.path.isdir(stage_path):
+            tmp_path = tempfile.mkdtemp(dir=out_dir, suffix=".tmp")
+            shutil.copytree(stage_path, tmp_path, dirs_exist_ok=True)
+        else:
+            with tempfile.NamedTemporaryFile(
+                dir=out_dir,
+                suffix=".tmp",
+                delete=False,
+            ) as f:
+                tmp_path = f.name
+            shutil.copyfile(stage_path, tmp_path)
+        stage_path = tmp_path
+
+    _log.debug("Publishing %s", outname)
+    if os.path.isdir(outname):
+        # Directories cannot be replaced by a rename, so move the old one aside
+        old_path = tempfile.mkdtemp(dir=out_dir, suffix=".old")
+        os.replace(outname, os.path.join(old_path, "old"))
+        os.replace(stage_path, outname)
+        shutil.rmtree(old_path)
+    else:
+        os.replace(stage_path, outname)
+
+
+@contextlib.contextmanager
+def staged_output(outname, stagedir=None):
+    """
+    Context manager for crash-safe writing of the product outname.
+    Yields a path, with the same file name as outname, in a new temporary
+    directory in the local staging area stagedir. When the with block
+    completes, the file (or directory) written to this path is published
+    to outname by publish_file. If the block fails or is interrupted,
+    outname is not changed. The temporary directory is always removed.
+
+    If stagedir is None, the default temporary directory is used,
+    i.e. tempfile.gettempdir(), which can be set with the TMPDIR
+    environment variable
+
+    Usage: with staged_output(outname) as stage_path: ds.to_netcdf(stage_path)
+    """
+    stage_dir = tempfile.mkdtemp(prefix="esdglider-", dir=stagedir)
+    try:
+        stage_path = os.path.join(stage_dir, os.path.basename(str(outname)))
+        yield stage_path
+        publish_file(stage_path, outname)
+    finally:
+        shutil.rmtree(stage_dir, ignore_errors=True)
+
+
 # For IOOS-compliant encoding when writing to NetCDF
-def to_netcdf_esd(ds: xr.Dataset, outname: str):
+def to_netcdf_esd(
+    ds: xr.Dataset,
+    outname: str,
+    unlimited_dims=None,
+    policy: dict | None = None,
+):
+    """
+    Write ds to outname, with the time encoding required for IOOS compliance,
+    and the encoding of the other variables from the encoding policy
+    (see netcdf_encoding). If policy is None, encoding_policy_default is used
+    """
     _log.info(f"Writing dataset with ESD encoding to: {outname}")
+    ds, encoding = netcdf_encoding(ds, policy)
+    encoding["time"] = encoding.get("time", {}) | {
+        "units": "seconds since 1970-01-01T00:00:00Z",
+        "_FillValue": np.nan,
+        "calendar": "gregorian",
+        "dtype": "float64",
+    }
     ds.to_netcdf(
         outname,
         "w",
-        encoding={
-            "time": {
-                "units": "seconds since 1970-01-01T00:00:00Z",
-                "_FillValue": np.nan,
-                "calendar": "gregorian",
-                "dtype": "float64",
-            },
-        },
+        encoding=encoding,
+        unlimited_dims=unlimited_dims,
     )
 
 
+def append_netcdf_esd(ds: xr.Dataset, outname: str):
+    """
+    Append ds along the time dimension of the existing NetCDF file outname.
+    outname must have been written by to_netcdf_esd with
+    unlimited_dims=["time"], and must have the same time variables as ds.
+    Values are encoded using the units and calendar of the file
+    """
+    _log.debug("Appending %s values to: %s", ds.time.shape[0], outname)
+    with netCDF4.Dataset(outname, "a") as nc:
+        file_vars = [i for i, v in nc.variables.items() if "time" in v.dimensions]
+        ds_vars = [i for i, v in ds.variables.items() if "time" in v.dims]
+        if sorted(file_vars) != sorted(ds_vars):
+            _log.error("file variables %s", file_vars)
+            _log.error("ds variables %s", ds_vars)
+            raise ValueError(f"The time variables of ds and {outname} must match")
+
+        _netcdf_write_rows(nc, ds, ds_vars, len(nc.dimensions["time"]))
+
+
+def _netcdf_write_rows(nc, ds: xr.Dataset, names: list, start: int):
+    """
+    Write the values of the variables names of ds to rows (time indices)
+    start onwards of the open netCDF4 Dataset nc.
+    Values are encoded using the units and calendar of the file
+    """
+    for var in names:
+        variable = ds[var].variable.copy(deep=False)
+        if np.issubdtype(variable.dtype, np.datetime64):
+            variable.encoding = {
+                "units": nc[var].units,
+                "calendar": nc[var].calendar,
+                "dtype": nc[var].dtype,
+            }
+        else:
+            variable.encoding = {}
+        values = xr.conventions.encode_cf_variable(variable, name=var).values
+        rows = [slice(None)] * values.ndim
+        axis = variable.dims.index("time")
+        rows[axis] = slice(start, start + values.shape[axis])
+        nc[var][tuple(rows)] = values
+
+
+"""
+File (or store directory) extension of each output backend.
+'netcdf' products are single NetCDF files. 'zarr' products are Zarr stores,
+which are chunked in time, and can be appended to and read by variable or
+time range. The zarr package is an optional dependency, required only for
+the 'zarr' backend. See write_esd and zarr_to_netcdf_esd
+"""
+backend_ext = {"netcdf": ".nc", "zarr": ".zarr"}
+
+
+def _check_backend(backend: str):
+    if backend not in backend_ext:
+        _log.error("Invalid backend: %s", backend)
+        raise ValueError(f"backend must be one of {list(backend_ext.keys())}")
+
+
+def product_path(path, backend: str = "netcdf") -> str:
+    """
+    Return path, e.g. from get_path_glider, with the extension of backend.
+    For instance, with backend 'zarr', 'x-sci.nc' becomes 'x-sci.zarr'
+    """
+    _check_backend(backend)
+    return os.path.splitext(str(path))[0] + backend_ext[backend]
+
+
+def is_zarr(path) -> bool:
+    """
+    Return True if path is (the path of) a Zarr store
+    """
+    return str(path).rstrip("/").endswith(backend_ext["zarr"])
+
+
+def zarr_encoding(ds: xr.Dataset, policy: dict | None = None):
+    """
+    Get the Zarr encoding of the variables of ds from an encoding policy.
+    The same as netcdf_encoding, except that categorical variables are not
+    encoded (Zarr has no enum type), and the compression is a Blosc codec
+
+    Returns
+    -------
+    tuple
+        The (shallow copy of) ds to write, and the encoding dictionary
+        to pass to ds.to_zarr
+    """
+    import zarr
+
+    if policy is None:
+        policy = encoding_policy_default
+    ds, encoding_nc = netcdf_encoding(ds, policy | {"categorical": []})
+    if policy["compression"] is None:
+        compressors = None
+    else:
+        compressors = [
+            zarr.codecs.BloscCodec(
+                cname=policy["compression"],
+                clevel=policy["complevel"],
+                shuffle="shuffle" if policy["shuffle"] else "noshuffle",
+            ),
+        ]
+
+    encoding = {}
+    for var, enc_nc in encoding_nc.items():
+        enc = {
+            k: v
+            for k, v in enc_nc.items()
+            if k in ["_FillValue", "missing_value", "dtype", "units", "calendar"]
+        }
+        if ds[var].dtype.kind not in ["U", "S", "O"]:
+            enc["compressors"] = compressors
+        if "chunksizes" in enc_nc:
+            # Not limited to the variable size, so that appended values
+            # fill the chunks of the first write
+            enc["chunks"] = (policy["time_chunksize"],)
+        encoding[var] = enc
+
+    return ds, encoding
+
+
+def to_zarr_esd(ds: xr.Dataset, outname: str, policy: dict | None = None):
+    """
+    Write ds to the Zarr store outname, with the same time encoding as
+    to_netcdf_esd, and the encoding of the other variables from the
+    encoding policy (see zarr_encoding). Any existing store is overwritten.
+    The store can be appended to along time with append_esd
+    """
+    _log.info(f"Writing dataset with ESD encoding to: {outname}")
+    ds, encoding = zarr_encoding(ds, policy)
+    encoding["time"] = encoding.get("time", {}) | {
+        "units": "seconds since 1970-01-01T00:00:00Z",
+        "_FillValue": np.nan,
+        "calendar": "gregorian",
+        "dtype": "float64",
+    }
+    ds.to_zarr(outname, mode="w", encoding=encoding, consolidated=True)
+
+
+def write_esd(
+    ds: xr.Dataset,
+    outname: str,
+    backend: str = "netcdf",
+    unlimited_dims=None,
+    policy: dict | None = None,
+    staged: bool = True,
+):
+    """
+    Write ds to outname with to_netcdf_esd (backend 'netcdf') or
+    to_zarr_esd (backend 'zarr'). unlimited_dims is ignored for Zarr stores,
+    which can always be appended to.
+    If staged, ds is written to the local staging area and then published to
+    outname (see staged_output), so that a crash while writing does not leave
+    a partial file, or remove the previous file, at outname
+    """
+    _check_backend(backend)
+    if staged:
+        with staged_output(outname) as stage_path:
+            write_esd(ds, stage_path, backend, unlimited_dims, policy, staged=False)
+    elif backend == "zarr":
+        to_zarr_esd(ds, outname, policy=policy)
+    else:
+        to_netcdf_esd(ds, outname, unlimited_dims=unlimited_dims, policy=policy)
+
+
+def append_esd(ds: xr.Dataset, outname: str):
+    """
+    Append ds along the time dimension of the existing file or Zarr store
+    outname, e.g. as written by write_esd. See append_netcdf_esd
+    """
+    if is_zarr(outname):
+        _log.debug("Appending %s values to: %s", ds.time.shape[0], outname)
+        import zarr
+
+        # As for NetCDF files, only append values: the attributes of the
+        # store are kept, rather than updated from ds
+        ds = ds.drop_attrs(deep=True)
+        ds.attrs = dict(zarr.open_group(str(outname), mode="r").attrs)
+        ds.to_zarr(outname, mode="a", append_dim="time", consolidated=True)
+    else:
+        append_netcdf_esd(ds, outname)
+
+
+def write_rows_esd(ds: xr.Dataset, outname: str, start: int):
+    """
+    Overwrite rows start to start + len(ds.time) of the existing file or
+    Zarr store outname with the variables of ds along the time dimension
+    (including coordinates), e.g. values that were recalculated after data
+    were appended. Other variables, and the attributes of outname,
+    are not changed
+    """
+    ds = ds.reset_coords()
+    names = [i for i, v in ds.variables.items() if "time" in v.dims]
+    stop = start + ds.sizes["time"]
+    _log.debug("Writing %s to rows %s-%s of: %s", names, start, stop, outname)
+    if is_zarr(outname):
+        # Region writes may only contain variables along the time dimension,
+        # and silently skip index variables, so drop the time index
+        ds = ds.drop_vars([i for i in ds.variables if i not in names])
+        ds = ds.drop_attrs(deep=True).drop_indexes("time")
+        for var in names:
+            ds[var].encoding = {}
+        ds.to_zarr(
+            outname,
+            mode="r+",
+            region={"time": slice(start, stop)},
+            consolidated=True,
+        )
+    else:
+        with netCDF4.Dataset(outname, "a") as nc:
+            _netcdf_write_rows(nc, ds, names, start)
+
+
+def is_appendable(path) -> bool:
+    """
+    Return True if data can be appended to the file or Zarr store at path
+    with append_esd: i.e., if path is a Zarr store, or a NetCDF file
+    with an unlimited time dimension and no categorical (enum) variables,
+    whose categories are fixed when the file is written
+    """
+    if is_zarr(path):
+        return True
+    with netCDF4.Dataset(path) as nc:
+        if ("time" not in nc.dimensions) or not nc.dimensions["time"].isunlimited():
+            return False
+        return not any(
+            isinstance(v.datatype, netCDF4.EnumType) for v in nc.variables.values()
+        )
+
+
+def update_attrs_esd(path, attrs: dict):
+    """
+    Add or update the global attributes attrs of the existing NetCDF file
+    or Zarr store at path, without rewriting the data
+    """
+    if is_zarr(path):
+        import zarr
+
+        zarr.open_group(str(path), mode="r+").attrs.update(attrs)
+        zarr.consolidate_metadata(str(path))
+    else:
+        with netCDF4.Dataset(path, "r+") as nc:
+            nc.setncatts(attrs)
+
+
+def zarr_to_netcdf_esd(inname, outname: str, policy: dict | None = None):
+    """
+    Convert the Zarr store inname, e.g. as written by write_esd,
+    to the IOOS-compliant NetCDF file outname, e.g. for delivery to
+    NGDAC or ERDDAP. Time variables are written with the same encoding as
+    to_netcdf_esd, and the encoding of the other variables is from the
+    encoding policy (see netcdf_encoding)
+
+    Parameters
+    ----------
+    inname : str or Path
+        Path to the Zarr store
+    outname : str
+        Path of the NetCDF file to write
+    policy : dict | None, default None
+        The encoding policy. If None, encoding_policy_default is used
+
+    Returns
+    -------
+    str
+        outname
+    """
+    _log.info("Converting %s to NetCDF", inname)
+    with xr.open_zarr(inname) as ds:
+        ds = ds.load()
+    ds, encoding = netcdf_encoding(ds, policy)
+    for var in ds.variables:
+        if var not in encoding:
+            continue
+        if np.issubdtype(ds[var].dtype, np.datetime64):
+            encoding[var].update(
+                {
+                    "units": "seconds since 1970-01-01T00:00:00Z",
+                    "calendar": "gregorian",
+                    "dtype": "float64",
+                },
+            )
+            # Time variables written without a fill value, i.e. gridded time,
+            # are written to NetCDF with _FillValue False, as in
+            # make_gridfiles_esd
+            encoding[var].setdefault("_FillValue", False)
+        else:
+            encoding[var].setdefault("_FillValue", None)
+    with staged_output(outname) as stage_path:
+        ds.to_netcdf(stage_path, "w", encoding=encoding)
+
+    return outname
+
+
 """
 default optionsList for findProfiles.
 Pulled outside so it can also be used by get_fill_profiles. Values from:
@@ -110,6 +636,20 @@ def findProfiles(stamp: np.ndarray, depth: np.ndarray, **kwargs):
         ", ".join([f"{k}: {v}" for k, v in optionsList.items()]),
     )
 
+    profileIndex, profileDirection = _find_profiles_core(stamp, depth, optionsList)
+
+    return profileIndex, profileDirection, optionsList
+
+
+def _find_profiles_core(stamp: np.ndarray, depth: np.ndarray, optionsList: dict):
+    """
+    The calculations of findProfiles, after the inputs have been
+    converted to 1D float arrays (stamp in elapsed seconds),
+    and the options have been set.
+    Also used by ProfileFinder
+
+    Returns profile_index and profile_direction arrays
+    """
     validIndex = np.argwhere(
         np.logical_not(np.isnan(depth)) & np.logical_not(np.isnan(stamp)),
     ).flatten()
@@ -175,12 +715,126 @@ def findProfiles(stamp: np.ndarray, depth: np.ndarray, **kwargs):
     profileDirection = np.empty((len(depth)))
     profileDirection[:] = np.nan
 
-    for i in range(len(validIndex) - 1):
-        iStart = validIndex[i]
-        iEnd = validIndex[i + 1]
-        profileDirection[iStart:iEnd] = sdy[i]
+    # Direction from each valid point up to (not including) the next valid point
+    # Equivalent to looping through validIndex and slice-assigning sdy[i]
+    if len(validIndex) > 1:
+        profileDirection[validIndex[0] : validIndex[-1]] = np.repeat(
+            sdy,
+            np.diff(validIndex),
+        )
+
+    return profileIndex, profileDirection
 
-    return profileIndex, profileDirection, optionsList
+
+def _profile_seam(profile_index: np.ndarray) -> int:
+    """
+    Return the seam of profile_index: the index of the point before the
+    second to last profile, i.e. the cast head of that profile.
+    Casts before the seam are not affected by data added after the end of
+    profile_index, and findProfiles results from the seam onward are the same
+    as those of the full array, offset by profile_index[seam] - 0.5.
+    Returns -1 if there are fewer than two profiles
+    """
+    profiles = np.unique(profile_index[profile_index % 1 == 0])
+    if len(profiles) < 2:
+        return -1
+    return int(np.argmax(profile_index == profiles[-2])) - 1
+
+
+class ProfileFinder:
+    """
+    Stateful, chunk-by-chunk version of findProfiles,
+    for computing profiles in bounded memory, e.g. for real-time data.
+
+    Chunks of stamp and depth are added with update(), which returns
+    the profile index and direction values that are final, i.e. that will
+    not change when more data are added. Values for the remaining points,
+    i.e. the last profile(s) and open cast, are provisional,
+    and can be returned with provisional().
+    Only points after the last final point are kept in memory.
+
+    The concatenated outputs of update(), followed by provisional(),
+    are identical to the output of findProfiles on the concatenated inputs.
+
+    Parameters
+    ----------
+    **kwargs
+        findProfiles arguments; see profileOptionsList
+
+    Examples
+    --------
+    pf = ProfileFinder(**kwargs)
+    out = [pf.update(stamp, depth) for stamp, depth in chunks]
+    out.append(pf.provisional())
+    profile_index = np.concatenate([i[0] for i in out])
+    profile_direction = np.concatenate([i[1] for i in out])
+    """
+
+    def __init__(self, **kwargs):
+        self.options = profileOptionsList.copy()
+        self.options.update(
+            {key: value for key, value in kwargs.items() if key in self.options},
+        )
+        _log.info(
+            "Running ProfileFinder with the following kwargs: %s",
+            ", ".join([f"{k}: {v}" for k, v in self.options.items()]),
+        )
+        self.num_final = 0
+        self._t0 = None
+        self._stamp = np.array([], dtype=float)
+        self._depth = np.array([], dtype=float)
+        self._offset = 0.0
+
+    def update(self, stamp, depth):
+        """
+        Add a chunk of stamp and depth values, which must be after
+        all previously added values. As for findProfiles, datetime stamps
+        are converted to elapsed seconds since the first stamp.
+
+        Returns
+        -------
+        tuple
+            profile_index and profile_direction arrays, for the points
+            that are now final and had not yet been returned.
+            These arrays may be empty
+        """
+        stamp = np.asarray(stamp).flatten()
+        if np.issubdtype(stamp.dtype, np.datetime64) and len(stamp) > 0:
+            if self._t0 is None:
+                self._t0 = stamp[0]
+            stamp = (stamp - self._t0).astype("timedelta64[s]").astype(float)
+        self._stamp = np.concatenate([self._stamp, stamp.astype(float)])
+        self._depth = np.concatenate(
+            [self._depth, np.asarray(depth, dtype=float).flatten()],
+        )
+
+        prof_idx, prof_dir = self.provisional()
+        seam = _profile_seam(prof_idx)
+        if seam <= 0:
+            return prof_idx[:0], prof_dir[:0]
+
+        # Only keep points from the seam onwards
+        self._offset = prof_idx[seam] - 0.5
+        self._stamp = self._stamp[seam:]
+        self._depth = self._depth[seam:]
+        self.num_final += seam
+
+        return prof_idx[:seam], prof_dir[:seam]
+
+    def provisional(self):
+        """
+        Returns
+        -------
+        tuple
+            profile_index and profile_direction arrays for the points
+            that have been added but are not yet final
+        """
+        prof_idx, prof_dir = _find_profiles_core(
+            self._stamp,
+            self._depth,
+            self.options,
+        )
+        return prof_idx + self._offset, prof_dir
 
 
 def get_fill_profiles(ds, time_var, depth_var, **kwargs) -> xr.Dataset:
@@ -202,6 +856,93 @@ def get_fill_profiles(ds, time_var, depth_var, **kwargs) -> xr.Dataset:
     depth_vals = ds[depth_var].values
     prof_idx, prof_dir, prof_opt = findProfiles(time_vals, depth_vals, **kwargs)
 
+    return _fill_profile_vars(ds, time_var, depth_var, prof_idx, prof_dir, prof_opt)
+
+
+def update_fill_profiles(
+    ds: xr.Dataset,
+    time_var: str,
+    depth_var: str,
+    prev_index: xr.DataArray,
+    prev_direction: xr.DataArray,
+    t0=None,
+    **kwargs,
+) -> xr.Dataset:
+    """
+    Update profile index and direction values, after new data points
+    have been added to a dataset whose profiles were previously calculated.
+    The result is the same as from get_fill_profiles,
+    but findProfiles is only run on the data near and after the 'seam'.
+
+    The seam is the cast head of the second to last profile of the
+    previous data. Casts before this point are not affected by new data,
+    so findProfiles is run from the seam onwards, and the profile indices
+    are offset by the previous profile index at the seam.
+    If a seam cannot be found (e.g., fewer than two profiles, new data
+    before the seam, or different findProfiles arguments),
+    findProfiles is run on all of ds.
+
+    ds : `xarray.Dataset`
+        Dataset with both the previous and new data points, sorted by time.
+        This may start after the first previous data point (e.g., with
+        only the end of a raw timeseries), as long as it includes the seam
+    time_var, depth_var: Variable names of time and depth in ds
+    prev_index, prev_direction : `xarray.DataArray`
+        The previously calculated profile_index and profile_direction values,
+        with the previous data points' time_var as the coordinate.
+        These must start at the same data point as ds
+    t0 : numpy.datetime64 or None (default None)
+        The first time of the full dataset. findProfiles truncates
+        elapsed times since the first time to whole seconds, so if ds
+        does not start at the first data point, t0 must be given to get
+        the same values as get_fill_profiles. If None, the first time of ds
+    kwargs : passed to findProfiles
+
+    returns Dataset
+    """
+    # Elapsed seconds relative to the first time, as calculated by findProfiles
+    time_vals = ds[time_var].values
+    stamp = time_vals
+    if np.issubdtype(stamp.dtype, np.datetime64) and len(stamp) > 0:
+        t0 = stamp[0] if t0 is None else t0
+        stamp = (stamp - t0).astype("timedelta64[s]").astype(float)
+    depth_vals = ds[depth_var].values
+
+    prof_opt = profileOptionsList.copy()
+    prof_opt.update({k: v for k, v in kwargs.items() if k in prof_opt.keys()})
+    prev_opt = {k: prev_index.attrs.get(k) for k in prof_opt.keys()}
+    if prev_opt != prof_opt:
+        _log.info("findProfiles arguments have changed; recalculating all profiles")
+        prof_idx, prof_dir, prof_opt = findProfiles(stamp, depth_vals, **kwargs)
+        return _fill_profile_vars(ds, time_var, depth_var, prof_idx, prof_dir, prof_opt)
+
+    # Find the seam: the last row before the second to last profile
+    prev_idx = prev_index.values
+    prev_time = prev_index[time_var].values
+    seam = _profile_seam(prev_idx)
+    i = np.searchsorted(time_vals, prev_time[seam]) if seam >= 0 else -1
+    if (
+        (seam < 0)
+        or (i != seam)
+        or not np.array_equal(time_vals[: i + 1], prev_time[: seam + 1])
+    ):
+        _log.info("Could not find a profile seam; recalculating all profiles")
+        prof_idx, prof_dir, prof_opt = findProfiles(stamp, depth_vals, **kwargs)
+        return _fill_profile_vars(ds, time_var, depth_var, prof_idx, prof_dir, prof_opt)
+
+    _log.info("Recalculating profiles after %s", time_vals[seam])
+    new_idx, new_dir, _ = findProfiles(stamp[seam:], depth_vals[seam:], **kwargs)
+
+    prof_idx = np.concatenate([prev_idx[:seam], new_idx + (prev_idx[seam] - 0.5)])
+    prof_dir = np.concatenate([prev_direction.values[:seam], new_dir])
+
+    return _fill_profile_vars(ds, time_var, depth_var, prof_idx, prof_dir, prof_opt)
+
+
+def _fill_profile_vars(ds, time_var, depth_var, prof_idx, prof_dir, prof_opt):
+    """
+    Fill profile index and direction values and attributes into ds
+    """
     idx_comment = (
         "N = inside profile N, N + 0.5 = between profiles N and N + 1. "
         + "Parameters listed as attributes"
@@ -234,6 +975,48 @@ def get_fill_profiles(ds, time_var, depth_var, **kwargs) -> xr.Dataset:
     return ds
 
 
+def update_distance_over_ground(ds: xr.Dataset, n_prev: int) -> xr.Dataset:
+    """
+    Update the distance_over_ground values of ds, after new data points
+    have been appended to data whose distance_over_ground was previously
+    calculated by pyglider.utils.get_distance_over_ground.
+
+    The first n_prev rows of ds are previous data points, and must include
+    the last previous point with a good latitude and longitude, if any.
+    Distances are only recalculated from this point onwards, starting from
+    its previous value, and so are the same as from
+    get_distance_over_ground on the full dataset.
+
+    Returns ds
+    """
+    good = ~np.isnan(ds["latitude"].values + ds["longitude"].values)
+    prev_good = np.flatnonzero(good[:n_prev])
+    start = prev_good[-1] if len(prev_good) > 0 else 0
+    dist_prev = ds["distance_over_ground"].values[start] if len(prev_good) > 0 else 0
+
+    values = ds["distance_over_ground"].values.copy()
+    good_start = good[start:]
+    if np.any(good_start):
+        lat = ds["latitude"][start:][good_start].values
+        lon = ds["longitude"][start:][good_start].values
+        dist = [dist_prev]
+        if len(lat) > 1:
+            dist = np.append(dist_prev, gsw.distance(lon, lat) / 1000)
+        dist = np.cumsum(dist)
+        time = ds["time"][start:]
+        values[start:] = np.interp(time, time[good_start], dist)
+    else:
+        # No good positions, as in get_distance_over_ground
+        values[n_prev:] = 0 * ds["latitude"].values[n_prev:]
+    ds["distance_over_ground"] = (
+        ("time"),
+        values,
+        ds["distance_over_ground"].attrs,
+    )
+
+    return ds
+
+
 def join_profiles(ds, df, **kwargs):
     """
     'Join' profile indexes to a dataset by time,
@@ -257,10 +1040,17 @@ def join_profiles(ds, df, **kwargs):
 
     time_values = ds["time"].values
     idx_values = np.full(time_values.shape, np.nan, dtype=np.float64)
-    for _, row in df.iterrows():
-        # time start/ends are mutually exclusive, so use >= and <=
-        mask = (time_values >= row["start_time"]) & (time_values <= row["end_time"])
-        idx_values[mask] = row["profile_index"]
+
+    # Profile start/end times are mutually exclusive, so each time value
+    # is in the profile with the last start_time <= time, if time <= end_time.
+    # Stable sort, so that for any overlaps later rows take precedence
+    df = df.iloc[np.argsort(df["start_time"].to_numpy(), kind="stable")]
+    start_time = df["start_time"].to_numpy().astype(time_values.dtype)
+    end_time = df["end_time"].to_numpy().astype(time_values.dtype)
+    i = np.searchsorted(start_time, time_values, side="right") - 1
+    mask = i >= 0
+    mask[mask] = time_values[mask] <= end_time[i[mask]]
+    idx_values[mask] = df["profile_index"].to_numpy()[i[mask]]
 
     # Sanity checks, if relevant
     if "profile_index" in ds.keys():
@@ -297,59 +1087,208 @@ def join_profiles(ds, df, **kwargs):
     return ds
 
 
-def drop_bogus_times(
+"""
+Default valid ranges, as [min, max], used by drop_bogus to change out of
+range values to nan. Ranges from the netcdf_variables of a deployment yaml
+(see get_valid_ranges) are added to, and override, these ranges
+"""
+valid_ranges_default = {
+    "conductivity": [0, 60],
+    "temperature": [-5, 100],
+    "pressure": [-2, 1500],
+    "chlorophyll": [0, 30],
+    "cdom": [0, 30],
+    "backscatter_700": [0, 5],
+    "oxygen_concentration": [-100, 500],
+    "salinity": [0, 50],
+    "potential_density": [900, 1050],
+    "density": [1000, 1050],
+    "potential_temperature": [-5, 100],
+}
+
+
+def get_valid_ranges(deployment) -> dict:
+    """
+    Get the valid ranges of variables from the netcdf_variables
+    of a deployment yaml. Only variables with both a valid_min
+    and valid_max are included
+
+    Parameters
+    ----------
+    deployment : str | dict
+        The path to the deployment yaml, or the deployment yaml as a dictionary
+
+    Returns
+    -------
+    dict
+        Dictionary of {variable name: [valid_min, valid_max]}
+    """
+    if isinstance(deployment, str):
+        deployment = read_deploymentyaml(deployment)
+
+    valid_ranges = {}
+    for var, value in deployment.get("netcdf_variables", {}).items():
+        if not isinstance(value, dict):
+            continue
+        if ("valid_min" in value.keys()) and ("valid_max" in value.keys()):
+            valid_ranges[var] = [float(value["valid_min"]), float(value["valid_max"])]
+
+    return valid_ranges
+
+
+def check_valid_ranges(
+    ds: xr.Dataset,
+    valid_ranges: dict,
+) -> tuple[xr.Dataset, pd.DataFrame]:
+    """
+    Change values outside of the valid ranges to nan.
+    The float variables in both ds and valid_ranges are stacked into a
+    single 2D array, and all range checks are done in one pass.
+    Variables not in ds, or that are not float, are skipped
+
+    Parameters
+    ----------
+    ds : xarray Dataset
+        Glider timeseries dataset
+    valid_ranges : dict
+        Dictionary of {variable name: [valid_min, valid_max]},
+        eg valid_ranges_default or the output of get_valid_ranges
+
+    Returns
+    -------
+    tuple
+        The Dataset with out of range values changed to nan, and a data frame
+        with the valid range and number of values changed to nan (num_rejected)
+        for each checked variable
+    """
+    vars_checked = []
+    for var in valid_ranges.keys():
+        if var not in list(ds.keys()):
+            _log.debug("%s not present in ds - skipping valid range check", var)
+        elif not np.issubdtype(ds[var].dtype, np.floating):
+            _log.debug("%s is not a float - skipping valid range check", var)
+        else:
+            vars_checked.append(var)
+
+    report = pd.DataFrame(
+        {
+            "variable": vars_checked,
+            "valid_min": [valid_ranges[var][0] for var in vars_checked],
+            "valid_max": [valid_ranges[var][1] for var in vars_checked],
+        },
+    )
+    if len(vars_checked) == 0:
+        report["num_rejected"] = np.array([], dtype=int)
+        return ds, report
+
+    # Evaluate all range checks at once
+    values = np.stack([ds[var].values for var in vars_checked]).astype(float)
+    valid_min = report["valid_min"].values[:, np.newaxis]
+    valid_max = report["valid_max"].values[:, np.newaxis]
+    bad = (values < valid_min) | (values > valid_max)
+    values[bad] = np.nan
+    report["num_rejected"] = np.count_nonzero(bad, axis=1)
+
+    # Only replace the data of the variables with out of range values
+    ds = ds.copy(deep=False)
+    for i, var in enumerate(vars_checked):
+        if report["num_rejected"].iloc[i] > 0:
+            ds[var] = ds[var].copy(data=values[i].astype(ds[var].dtype))
+
+    return ds, report
+
+
+def _bogus_times_mask(
     ds: xr.Dataset,
     min_dt: str = "1970-01-01",
     max_drop: bool = False,
-) -> xr.Dataset:
+) -> np.ndarray:
     """
-    Drop bogus times.
-    This function is separate to allow users to drop only bogus times.
+    Get the boolean mask of the ds rows that do not have bogus times.
+    The number of rows dropped by each rule is logged, in order,
+    as if the rules were applied one after another.
     See the function 'drop_bogus' for a description of arguments
     """
-
-    # For out of range or nan time/lat/lon, drop rows
-    num_orig = len(ds.time)
-    num_orig_nan = np.count_nonzero(np.isnan(ds.time.values))
-    ds = ds.where(ds.time >= np.datetime64(min_dt), drop=True)
-    if (num_orig - len(ds.time)) > 0:
+    time = ds.time.values
+    num_orig_nan = np.count_nonzero(np.isnat(time))
+    keep = time >= np.datetime64(min_dt)
+    if np.count_nonzero(~keep) > 0:
         _log.info(
             "Dropped %s times that were either nan (n=%s) or before '%s'",
-            num_orig - len(ds.time),
+            np.count_nonzero(~keep),
             num_orig_nan,
             min_dt,
         )
 
     if max_drop:
-        num_orig = len(ds.time)
         max_dt = np.datetime64(datetime_now_utc("%Y-%m-%dT%H:%M:%S"))
-        ds = ds.where(ds.time <= np.datetime64(max_dt), drop=True)
-        if (num_orig - len(ds.time)) > 0:
+        max_good = time <= max_dt
+        num_dropped = np.count_nonzero(keep & ~max_good)
+        keep &= max_good
+        if num_dropped > 0:
             _log.warning(
                 "Dropped %s times that were after the current UTC time %s",
-                num_orig - len(ds.time),
+                num_dropped,
                 max_dt,
             )
 
-    return ds
+    return keep
+
+
+def _isel_keep(ds: xr.Dataset, keep: np.ndarray) -> xr.Dataset:
+    """
+    Select the ds rows where keep is True, with a single isel.
+    Unlike ds.where(..., drop=True), integer variables are not cast to float.
+    If all rows are kept, a shallow copy of ds is returned
+    """
+    if keep.all():
+        return ds.copy(deep=False)
+    return ds.isel(time=keep)
+
+
+def drop_bogus_times(
+    ds: xr.Dataset,
+    min_dt: str = "1970-01-01",
+    max_drop: bool = False,
+) -> xr.Dataset:
+    """
+    Drop bogus times.
+    This function is separate to allow users to drop only bogus times.
+    See the function 'drop_bogus' for a description of arguments
+    """
+
+    # For out of range or nan time, drop rows
+    keep = _bogus_times_mask(ds, min_dt, max_drop=max_drop)
+
+    return _isel_keep(ds, keep)
 
 
 def drop_bogus(
     ds: xr.Dataset,
     min_dt: str = "1970-01-01",
     max_drop: bool = False,
+    valid_ranges: dict | None = None,
 ) -> xr.Dataset:
     """
     Remove and/or drop bogus times and values.
     Rows with bogus time or lat/lons are dropped.
     For other bogus values, out of range values are changed to np.nan
 
+    All of the row rules are combined into a single mask,
+    so that the rows are dropped with one pass through ds
+
     ds: `xarray.Dataset`
         processed glider data
     min_dt: str; default="1970-01-01"
         String representing the minimum datetime to keep.
         Passed to np.datetime64 to be used to filter.
         For instance, '2017-01-01', or '2020-03-06 12:00:00'.
+    max_drop: bool; default=False
+        If True, also drop times after the current UTC time
+    valid_ranges: dict | None; default=None
+        Dictionary of {variable name: [valid_min, valid_max]}.
+        Values outside of these ranges are changed to nan.
+        If None, valid_ranges_default is used
 
     Returns
     -------
@@ -357,69 +1296,33 @@ def drop_bogus(
         Dataset with bogus rows rows dropped, and bogus values changed to nan
     """
 
-    # if not (ds_type in ['sci', 'eng']):
-    #     raise ValueError('ds_type must be either sci or eng')
-
-    # # For out of range or nan time/lat/lon, drop rows
-    # num_orig = len(ds.time)
-    # ds = ds.where(ds.time >= np.datetime64(min_dt), drop=True)
-    # if (num_orig - len(ds.time)) > 0:
-    #     _log.info(
-    #         f"Dropped {num_orig - len(ds.time)} times "
-    #         + f"that were either nan or before {min_dt}",
-    #     )
-
-    # Drop bogus times, as specified
-    ds = drop_bogus_times(ds, min_dt, max_drop=max_drop)
-
-    # Drop bogus lat/lons
-    num_orig = len(ds.time)
-    ll_good = (
-        (ds.longitude >= -180)
-        & (ds.longitude <= 180)
-        & (ds.latitude >= -90)
-        & (ds.latitude <= 90)
-    )
-    ds = ds.where(ll_good, drop=True)
-    if (num_orig - len(ds.time)) > 0:
-        _log.info(
-            "Dropped %s nan or out of range lat/lons",
-            num_orig - len(ds.time),
-        )
+    # Mask of bogus times, as specified
+    keep = _bogus_times_mask(ds, min_dt, max_drop=max_drop)
 
-    # For science variables, change out of range values to nan
-    drop_values = {
-        "conductivity": [0, 60],
-        "temperature": [-5, 100],
-        "pressure": [-2, 1500],
-        "chlorophyll": [0, 30],
-        "cdom": [0, 30],
-        "backscatter_700": [0, 5],
-        "oxygen_concentration": [-100, 500],
-        "salinity": [0, 50],
-        "potential_density": [900, 1050],
-        "density": [1000, 1050],
-        "potential_temperature": [-5, 100],
-    }
+    # Add bogus lat/lons to the mask
+    lon = ds.longitude.values
+    lat = ds.latitude.values
+    ll_good = (lon >= -180) & (lon <= 180) & (lat >= -90) & (lat <= 90)
+    num_dropped = np.count_nonzero(keep & ~ll_good)
+    keep &= ll_good
+    if num_dropped > 0:
+        _log.info("Dropped %s nan or out of range lat/lons", num_dropped)
 
-    for var, value in drop_values.items():
-        if var not in list(ds.keys()):
-            _log.debug(
-                "%s not present in ds - skipping drop_values check",
-                num_orig - len(ds.time),
-            )
-            continue
-        num_orig = len(ds[var])
-        good = (ds[var] >= value[0]) & (ds[var] <= value[1])
-        ds[var] = ds[var].where(good, drop=False)
-        if num_orig - len(ds[var]) > 0:
-            _log.info(
-                "Changed %s %s values outside range [%s, %s] to nan",
-                num_orig - len(ds[var]),
-                var,
-                value[0],
-                value[1],
-            )
+    # Drop all bogus rows at once
+    ds = _isel_keep(ds, keep)
+
+    # For science variables, change out of range values to nan
+    if valid_ranges is None:
+        valid_ranges = valid_ranges_default
+    ds, report = check_valid_ranges(ds, valid_ranges)
+    for row in report[report["num_rejected"] > 0].itertuples():
+        _log.info(
+            "Changed %s %s values outside range [%s, %s] to nan",
+            row.num_rejected,
+            row.variable,
+            row.valid_min,
+            row.valid_max,
+        )
 
     return ds
 
@@ -603,15 +1506,88 @@ def rmtree(dir, ignore_errors=False):
 def remove_file(file_path):
     """
     Light wrappoer to check if a file exists at file_path,
-    and to remove it if so
+    and to remove it if so. Directories, e.g. Zarr stores, are removed
+    with their contents
     """
-    if os.path.exists(file_path):
+    if os.path.isdir(file_path):
+        _log.info(f"Removing directory: {file_path}")
+        shutil.rmtree(file_path)
+    elif os.path.exists(file_path):
         _log.info(f"Removing file: {file_path}")
         os.remove(file_path)
     else:
         _log.debug(f"No file to remove at: {file_path}")
 
 
+def file_hash(file_path, chunk_size=2**20) -> str:
+    """
+    Return the sha256 hexdigest of the contents of the file at file_path.
+    The file is read in chunks of chunk_size bytes
+    """
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+"""
+Name of the global attribute in which the fingerprint of the inputs of a
+product (e.g., the raw timeseries) is stored. See stage_fingerprint
+"""
+fingerprint_attr = "esdglider_inputs_hash"
+
+
+def binary_manifest(indir: str, search: str) -> list:
+    """
+    Return a manifest of the binary files in indir matching search,
+    as a sorted list of [file name, size, mtime] for each file.
+    Used to determine if the binary files have changed
+    """
+    manifest = []
+    for fn in sorted(glob.glob(os.path.join(indir, search))):
+        st = os.stat(fn)
+        manifest.append([os.path.basename(fn), st.st_size, st.st_mtime_ns])
+    return manifest
+
+
+def stage_fingerprint(inputs: dict) -> str:
+    """
+    Return the fingerprint of the inputs of a processing stage,
+    i.e. the sha256 hexdigest of the JSON representation of inputs.
+    inputs can contain e.g. file manifests, file hashes, package versions,
+    and the fingerprints of upstream products
+    """
+    inputs_json = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(inputs_json.encode()).hexdigest()
+
+
+def read_fingerprint(file_path) -> str | None:
+    """
+    Read the inputs fingerprint attribute of the netCDF file
+    (or Zarr store) at file_path.
+    Returns None if the file or the attribute does not exist
+    """
+    if is_zarr(file_path):
+        if not os.path.isdir(file_path):
+            return None
+        import zarr
+
+        return zarr.open_group(str(file_path), mode="r").attrs.get(fingerprint_attr)
+    if not os.path.isfile(file_path):
+        return None
+    with netCDF4.Dataset(file_path) as nc:
+        return getattr(nc, fingerprint_attr, None)
+
+
+def write_fingerprint(file_path, fingerprint: str):
+    """
+    Write the inputs fingerprint attribute to the existing netCDF file
+    (or Zarr store) at file_path, e.g. for products written by pyglider
+    """
+    update_attrs_esd(file_path, {fingerprint_attr: fingerprint})
+
+
 def find_extensions(dir_path):  # ,  excluded = ['', '.txt', '.lnk']):
     """
     Get all the file extensions in the given directory
@@ -667,86 +1643,50 @@ direction_phase_mapping = {1: "descent", -1: "ascent"}
 
 
 # Define helper functions for calc_profile_summary
-def _profile_agg(group, tas_depth=5):
+def _segment_first_last(x, starts, ends):
     """
-    Custom aggregation function for profile_summary.
-    See 'calc_profile_summary' docs for more details
-
-    Parameters
-    ----------
-    'group' is the current pandas series group from calc_profile_summary
-    'tas_depth' is the maximum depth that is considered the surface
-        for 'time at surface' calculations.
+    Get the first and last non-nan values of x within each segment.
+    Segments are defined by the start and (exclusive) end indices of
+    contiguous runs in x. Returns nan for segments with no non-nan values
     """
+    n = x.shape[0]
+    pos = np.arange(n)
+    notnan = ~np.isnan(x)
+    first = np.minimum.reduceat(np.where(notnan, pos, n), starts)
+    last = np.maximum.reduceat(np.where(notnan, pos, -1), starts)
+    x_ext = np.append(x, np.nan)
+    x_first = x_ext[np.where(first < ends, first, n)]
+    x_last = x_ext[np.where(last >= starts, last, n)]
 
-    # Profile direction is 0 if between profiles
-    if all(group["profile_index"] % 1 == 0.5):
-        profile_direction = 0
-    else:
-        profile_direction = group["profile_direction"].mode().iloc[0]
-
-    # Get start and end depths - drop in case any depths are nan
-    depth_nona = group["depth"].dropna().values
-    if depth_nona.shape[0] == 0:
-        start_depth = np.nan
-        end_depth = np.nan
-        min_depth = np.nan
-        max_depth = np.nan
-        depth_range = np.nan
-    else:
-        start_depth = depth_nona[0]
-        end_depth = depth_nona[-1]
-        min_depth = depth_nona.min()
-        max_depth = depth_nona.max()
-        depth_range = abs(max_depth - min_depth)
-
-    # Get min and max lat/lons
-    lat_nona = group["latitude"].dropna().values
-    if lat_nona.shape[0] == 0:
-        min_lat = np.nan
-        max_lat = np.nan
-    else:
-        min_lat = lat_nona.min()
-        max_lat = lat_nona.max()
-
-    lon_nona = group["longitude"].dropna().values
-    if lon_nona.shape[0] == 0:
-        min_lon = np.nan
-        max_lon = np.nan
-    else:
-        min_lon = lon_nona.min()
-        max_lon = lon_nona.max()
-
-    # Time at surface
-    surface_pts = group["time"][group["depth"] <= tas_depth]
-    if surface_pts.shape[0] == 0:
-        tas = 0
-    else:
-        tas = int((surface_pts.max() - surface_pts.min()).total_seconds())
+    return x_first, x_last
 
-    # Profile phase and duration calculations can be vectorized,
-    # and thus they are calculates after the aggregation
-    # in calc_profile_summary
 
-    return pd.Series(
-        {
-            "profile_direction": profile_direction,
-            "start_time": group["time"].min(),
-            "end_time": group["time"].max(),
-            "start_depth": start_depth,
-            "end_depth": end_depth,
-            "min_depth": min_depth,
-            "max_depth": max_depth,
-            "depth_range": depth_range,
-            "min_lon": min_lon,
-            "max_lon": max_lon,
-            "min_lat": min_lat,
-            "max_lat": max_lat,
-            "distance_traveled": np.ptp(group["distance_over_ground"]),
-            "num_points": group.shape[0],
-            "time_at_surface_s": tas,
-        },
+def _segment_mode(x, seg_id, nseg):
+    """
+    Get the mode of the non-nan values of x within each segment.
+    Ties go to the smallest value, as with pandas.Series.mode().
+    Returns nan for segments with no non-nan values
+    """
+    notnan = ~np.isnan(x)
+    x, seg_id = x[notnan], seg_id[notnan]
+    mode = np.full(nseg, np.nan)
+    if x.shape[0] == 0:
+        return mode
+
+    # Count each unique (segment, value) pair, and then for each segment
+    # keep the pair with the highest count and then the smallest value
+    order = np.lexsort((x, seg_id))
+    x, seg_id = x[order], seg_id[order]
+    run_start = np.flatnonzero(
+        np.r_[True, (seg_id[1:] != seg_id[:-1]) | (x[1:] != x[:-1])],
     )
+    counts = np.diff(np.r_[run_start, x.shape[0]])
+    run_x, run_seg = x[run_start], seg_id[run_start]
+    best = np.lexsort((run_x, -counts, run_seg))
+    is_first = np.r_[True, run_seg[best][1:] != run_seg[best][:-1]]
+    mode[run_seg[best][is_first]] = run_x[best][is_first]
+
+    return mode
 
 
 def calc_profile_phase(profile_index, profile_direction, min_depth):
@@ -786,10 +1726,17 @@ def calc_profile_phase(profile_index, profile_direction, min_depth):
 #     return prof_description
 
 
-def calc_profile_summary(ds: xr.Dataset, depth_var: str) -> pd.DataFrame:
+def calc_profile_summary(
+    ds: xr.Dataset,
+    depth_var: str,
+    tas_depth: float = 5,
+) -> pd.DataFrame:
     """
     For each profile, ie after grouping by profile_index,
     calculate summary information.
+    Records are sorted by profile_index, and then each summary is
+    calculated with array reductions over the profile segments.
+    Records with a nan profile_index are ignored.
 
     Parameters
     ----------
@@ -797,6 +1744,9 @@ def calc_profile_summary(ds: xr.Dataset, depth_var: str) -> pd.DataFrame:
         Dataset with glider timeseries data. Can be raw, eng, or sci
     depth_var: str
         Variable names of depth in ds
+    tas_depth : float
+        The maximum depth that is considered the surface
+        for 'time at surface' calculations. Default is 5
 
     Returns
     -------
@@ -813,30 +1763,87 @@ def calc_profile_summary(ds: xr.Dataset, depth_var: str) -> pd.DataFrame:
             - distance_traveled: the distance traveled during that profile (max-min)
             - num_points: the number of records during that profile
             - time_at_surface_s: the time at the surface, in integer seconds.
-                The amount of time during the profile the glider was at a depth <5m.
+                The amount of time during the profile the glider was at
+                a depth <=tas_depth.
                 In seconds, not timedelta, for more intuitive writing to CSV files
             - profile_duration_s: the difference between the time max/min.
                 In seconds, not timedelta, for more intuitive writing to CSV files
     """
-    # Minimum columns needed by aggregation function
     _log.info("Calculating profile summary using var %s", depth_var)
-    ds = ds.rename({depth_var: "depth"})
-    grouped_columns = [
-        "time",
-        "depth",
-        "profile_index",
-        "distance_over_ground",
-        "profile_direction",
-        "latitude",
-        "longitude",
-    ]
 
-    # Group by profile_index, and run profile aggregation function
-    df = (
-        ds.to_pandas()
-        .reset_index()
-        .groupby(["profile_index"], as_index=False)[grouped_columns]
-        .apply(_profile_agg)
+    # Sort records by profile_index, keeping the time order within each
+    # profile, and drop records without a profile_index
+    profile_index = ds["profile_index"].values
+    rows = np.flatnonzero(~np.isnan(profile_index))
+    rows = rows[np.argsort(profile_index[rows], kind="stable")]
+    pidx = profile_index[rows]
+    num_rows = rows.shape[0]
+
+    # Segment boundaries, ie the start and end index of each profile
+    if num_rows == 0:
+        starts = np.array([], dtype=int)
+    else:
+        starts = np.flatnonzero(np.r_[True, pidx[1:] != pidx[:-1]])
+    ends = np.r_[starts[1:], num_rows]
+    seg_id = np.repeat(np.arange(starts.shape[0]), np.diff(np.r_[starts, num_rows]))
+
+    def _values(var):
+        return ds[var].values[rows]
+
+    def _reduce(ufunc, x):
+        if starts.shape[0] == 0:
+            return np.array([], dtype=x.dtype)
+        return ufunc.reduceat(x, starts)
+
+    time = _values("time")
+    depth = _values(depth_var)
+    lat = _values("latitude")
+    lon = _values("longitude")
+    dist = _values("distance_over_ground")
+
+    # Profile direction is 0 if between profiles
+    profile_index = pidx[starts]
+    profile_direction = np.where(
+        profile_index % 1 == 0.5,
+        0,
+        _segment_mode(_values("profile_direction"), seg_id, starts.shape[0]),
+    )
+
+    # Depth summaries, ignoring nan values
+    start_depth, end_depth = _segment_first_last(depth, starts, ends)
+    min_depth = _reduce(np.fmin, depth)
+    max_depth = _reduce(np.fmax, depth)
+
+    # Time at surface
+    nat = np.array("NaT", dtype=time.dtype)
+    surface_time = np.where(depth <= tas_depth, time, nat)
+    tas = _reduce(np.fmax, surface_time) - _reduce(np.fmin, surface_time)
+    tas = np.where(np.isnat(tas), np.timedelta64(0, "s"), tas)
+    tas = (tas // np.timedelta64(1, "s")).astype(int)
+
+    # Profile phase and duration calculations are calculated
+    # after the summary data frame is created
+    df = pd.DataFrame(
+        {
+            "profile_index": profile_index,
+            "profile_direction": profile_direction,
+            "start_time": _reduce(np.fmin, time),
+            "end_time": _reduce(np.fmax, time),
+            "start_depth": start_depth,
+            "end_depth": end_depth,
+            "min_depth": min_depth,
+            "max_depth": max_depth,
+            "depth_range": np.abs(max_depth - min_depth),
+            "min_lon": _reduce(np.fmin, lon),
+            "max_lon": _reduce(np.fmax, lon),
+            "min_lat": _reduce(np.fmin, lat),
+            "max_lat": _reduce(np.fmax, lat),
+            "distance_traveled": (
+                _reduce(np.maximum, dist) - _reduce(np.minimum, dist)
+            ),
+            "num_points": np.diff(np.r_[starts, num_rows]).astype(int),
+            "time_at_surface_s": tas,
+        },
     )
 
     # Calculate additional variables, and return
@@ -0,0 +1,84 @@
+"""
+Tests of esdglider.glider._interp_by_support, the grouped interpolation of
+the raw timeseries, against interpolating each variable on its own
+"""
+
+import numpy as np
+import pytest
+import xarray as xr
+from pyglider import utils as pgutils
+
+from esdglider import glider
+
+
+def synthetic_raw(seed: int, n: int = 5000):
+    """
+    Synthetic raw timeseries of about 2 s samples, with engineering and
+    science variables from two sensors each (so that variables share their
+    non-nan support), random nans, zeros, and gaps longer than maxgap.
+    Returns the dataset, and the list of science variables
+    """
+    rng = np.random.default_rng(seed)
+    t = np.cumsum(rng.uniform(0.5, 3.5, n))
+    t[n // 2 :] += 400
+    is_sci = rng.random(n) < 0.6
+    is_ctd = is_sci & (rng.random(n) < 0.8)
+    is_opt = is_sci & ~is_ctd
+    is_ctd[1000:1300] = False
+    is_opt[3000:3200] = False
+
+    data = {}
+    for name, mask in [
+        ("latitude", ~is_sci),
+        ("longitude", ~is_sci),
+        ("heading", ~is_sci & (rng.random(n) < 0.5)),
+        ("conductivity", is_ctd),
+        ("temperature", is_ctd),
+        ("pressure", is_ctd),
+        ("chlorophyll", is_opt),
+        ("cdom", is_opt),
+    ]:
+        v = rng.normal(10, 3, n)
+        v[rng.random(n) < 0.05] = 0
+        v[~mask] = np.nan
+        data[name] = ("time", v)
+
+    time = np.datetime64("2025-01-01T00:00:00", "ns") + (t * 1e9).astype(
+        "timedelta64[ns]",
+    )
+    vars_sci = ["conductivity", "temperature", "pressure", "chlorophyll", "cdom"]
+    return xr.Dataset(data, coords={"time": time}), vars_sci
+
+
+def interp_reference(ds: xr.Dataset, vars_interp: list, vars_gaps: list, maxgap):
+    """
+    Per-variable interpolation, as in timeseries_raw_to_sci before
+    variables were grouped by their non-nan support
+    """
+    t = ds.time.values.astype(np.int64) / 1e9
+    vals_interp = {}
+    for i in vars_interp:
+        notnan = ~np.isnan(ds[i].values)
+        _t = t[notnan]
+        vals = np.interp(t, _t, ds[i].values[notnan], left=np.nan, right=np.nan)
+        if i in vars_gaps:
+            vals[pgutils.find_gaps(_t, t, maxgap)] = np.nan
+            vals[vals == 0] = np.nan
+        vals_interp[i] = vals
+    return vals_interp
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("maxgap", [10, 60, 300])
+def test_interp_by_support_matches_reference(seed, maxgap):
+    ds, vars_sci = synthetic_raw(seed)
+    vars_interp = list(ds.data_vars)
+    vals = glider._interp_by_support(ds, vars_interp, vars_sci, maxgap)
+    vals_ref = interp_reference(ds, vars_interp, vars_sci, maxgap)
+
+    assert vals.keys() == vals_ref.keys()
+    for i in vars_interp:
+        np.testing.assert_array_equal(vals[i], vals_ref[i])
+    # Sanity check that the gaps and zero screen were applied
+    assert np.isnan(vals["chlorophyll"][3000:3200]).any()
+    assert (vals["heading"] == 0).any()
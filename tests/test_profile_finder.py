@@ -0,0 +1,27 @@
+"""
+Tests for esdglider.utils.ProfileFinder, the chunk-by-chunk version of
+esdglider.utils.findProfiles
+"""
+
+import numpy as np
+import pytest
+from test_profiles import synthetic_dives
+
+from esdglider import utils
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("chunksize", [1000, 7919])
+def test_profile_finder_matches_find_profiles(seed, chunksize):
+    stamp, depth = synthetic_dives(seed)
+    pidx, pdir, _ = utils.findProfiles(stamp, depth)
+
+    pf = utils.ProfileFinder()
+    out = [
+        pf.update(stamp[i : i + chunksize], depth[i : i + chunksize])
+        for i in range(0, depth.size, chunksize)
+    ]
+    out.append(pf.provisional())
+
+    np.testing.assert_array_equal(np.concatenate([i[0] for i in out]), pidx)
+    np.testing.assert_array_equal(np.concatenate([i[1] for i in out]), pdir)
@@ -0,0 +1,234 @@
+"""
+Regression tests for esdglider.utils.findProfiles, against the
+pre-vectorization implementation (the per-point direction loop),
+and tests of the functions that update profiles as data points are added
+"""
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from esdglider import utils
+
+
+def find_profiles_reference(stamp: np.ndarray, depth: np.ndarray, **kwargs):
+    """
+    findProfiles as it was before the profile direction fill was vectorized.
+    Kept verbatim (less logging) as the reference implementation
+    """
+    depth, stamp = depth.flatten(), stamp.flatten()
+    if np.issubdtype(stamp.dtype, np.datetime64):
+        stamp = (stamp - stamp[0]).astype("timedelta64[s]").astype(float)
+
+    optionsList = {
+        "length": 10,
+        "period": 0,
+        "inversion": 3,
+        "interrupt": 180,
+        "stall": 3,
+        "shake": 20,
+    }
+    kwargs = {key: value for key, value in kwargs.items() if key in optionsList.keys()}
+    optionsList.update(kwargs)
+
+    validIndex = np.argwhere(
+        np.logical_not(np.isnan(depth)) & np.logical_not(np.isnan(stamp)),
+    ).flatten()
+    validIndex = validIndex.astype(int)
+
+    sdy = np.sign(np.diff(depth[validIndex], n=1, axis=0))
+    depthPeak = np.ones(np.size(validIndex), dtype=bool)
+    depthPeak[1 : len(depthPeak) - 1,] = np.diff(sdy, n=1, axis=0) != 0
+    depthPeakIndex = validIndex[depthPeak]
+    sgmtFrst = stamp[depthPeakIndex[0 : len(depthPeakIndex) - 1,]]
+    sgmtLast = stamp[depthPeakIndex[1:,]]
+    sgmtStrt = depth[depthPeakIndex[0 : len(depthPeakIndex) - 1,]]
+    sgmtFnsh = depth[depthPeakIndex[1:,]]
+    sgmtSinc = sgmtLast - sgmtFrst
+    sgmtVinc = sgmtFnsh - sgmtStrt
+    sgmtVdir = np.sign(sgmtVinc)
+
+    castSgmtValid = np.logical_not(
+        np.logical_or(
+            np.abs(sgmtVinc) <= optionsList["stall"],
+            sgmtSinc <= optionsList["shake"],
+        ),
+    )
+    castSgmtIndex = np.argwhere(castSgmtValid).flatten()
+    castSgmtLapse = (
+        sgmtFrst[castSgmtIndex[1:]]
+        - sgmtLast[castSgmtIndex[0 : len(castSgmtIndex) - 1]]
+    )
+    castSgmtSpace = -np.abs(
+        sgmtVdir[castSgmtIndex[0 : len(castSgmtIndex) - 1]]
+        * (
+            sgmtStrt[castSgmtIndex[1:]]
+            - sgmtFnsh[castSgmtIndex[0 : len(castSgmtIndex) - 1]]
+        ),
+    )
+    castSgmtDirch = np.diff(sgmtVdir[castSgmtIndex], n=1, axis=0)
+    castSgmtBound = np.logical_not(
+        (castSgmtDirch[:,] == 0)
+        & (castSgmtLapse[:,] <= optionsList["interrupt"])
+        & (castSgmtSpace <= optionsList["inversion"]),
+    )
+    castSgmtHeadValid = np.ones(np.size(castSgmtIndex), dtype=bool)
+    castSgmtTailValid = np.ones(np.size(castSgmtIndex), dtype=bool)
+    castSgmtHeadValid[1:,] = castSgmtBound
+    castSgmtTailValid[0 : len(castSgmtTailValid) - 1,] = castSgmtBound
+
+    castHeadIndex = depthPeakIndex[castSgmtIndex[castSgmtHeadValid]]
+    castTailIndex = depthPeakIndex[castSgmtIndex[castSgmtTailValid] + 1]
+    castLength = np.abs(depth[castTailIndex] - depth[castHeadIndex])
+    castPeriod = stamp[castTailIndex] - stamp[castHeadIndex]
+    castValid = np.logical_not(
+        np.logical_or(
+            castLength <= optionsList["length"],
+            castPeriod <= optionsList["period"],
+        ),
+    )
+    castHead = np.zeros(np.size(depth))
+    castTail = np.zeros(np.size(depth))
+    castHead[castHeadIndex[castValid] + 1] = 0.5
+    castTail[castTailIndex[castValid]] = 0.5
+
+    profileIndex = 0.5 + np.cumsum(castHead + castTail)
+    profileDirection = np.empty((len(depth)))
+    profileDirection[:] = np.nan
+
+    for i in range(len(validIndex) - 1):
+        iStart = validIndex[i]
+        iEnd = validIndex[i + 1]
+        profileDirection[iStart:iEnd] = sdy[i]
+
+    return profileIndex, profileDirection, optionsList
+
+
+def synthetic_dives(seed: int, ndives: int = 40):
+    """
+    Synthetic glider deployment of about 4 s samples: dives to random depths,
+    including shallow yos (shallower than the default profile length),
+    short stalls at the surface and bottom, depth noise,
+    surface gaps longer than the interrupt threshold,
+    and random NaN depths (both single values and runs).
+    Returns datetime64 stamp and depth arrays
+    """
+    rng = np.random.default_rng(seed)
+    dt = 4.0
+    depths = []
+    stamps = []
+    t = 0.0
+    for _ in range(ndives):
+        max_depth = rng.choice([rng.uniform(2, 9), rng.uniform(30, 1000)])
+        rate = rng.uniform(0.1, 0.25) * dt
+        down = np.arange(0, max_depth, rate)
+        stall = np.full(rng.integers(0, 15), max_depth)
+        up = np.arange(max_depth, 0, -rate)
+        surface = np.zeros(rng.integers(0, 20))
+        dive = np.concatenate([down, stall, up, surface])
+        dive = dive + rng.normal(0, 0.05, dive.size)
+        depths.append(dive)
+        stamps.append(t + dt * np.arange(dive.size))
+        t = stamps[-1][-1] + dt
+        # Occasional communication gaps between dives
+        if rng.random() < 0.2:
+            t += rng.uniform(200, 3600)
+
+    depth = np.concatenate(depths)
+    stamp = np.concatenate(stamps)
+
+    nan_points = rng.random(depth.size) < 0.05
+    for start in rng.integers(0, depth.size, 20):
+        nan_points[start : start + rng.integers(1, 200)] = True
+    depth[nan_points] = np.nan
+
+    stamp = np.datetime64("2025-01-01T00:00:00", "ns") + (stamp * 1e9).astype(
+        "timedelta64[ns]",
+    )
+    return stamp, depth
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize(
+    "kwargs",
+    [{}, {"length": 5, "stall": 1, "shake": 5}, {"interrupt": 600, "inversion": 10}],
+)
+def test_find_profiles_matches_reference(seed, kwargs):
+    stamp, depth = synthetic_dives(seed)
+    pidx, pdir, options = utils.findProfiles(stamp, depth, **kwargs)
+    pidx_ref, pdir_ref, options_ref = find_profiles_reference(stamp, depth, **kwargs)
+
+    assert options == options_ref
+    np.testing.assert_array_equal(pidx, pidx_ref)
+    np.testing.assert_array_equal(pdir, pdir_ref)
+    # Sanity check that the synthetic data has profiles in both directions
+    assert len(np.unique(pidx[pidx % 1 == 0])) > 10
+    assert {-1.0, 1.0} <= set(np.unique(pdir[~np.isnan(pdir)]))
+
+
+@pytest.mark.parametrize(
+    "depth",
+    [
+        np.array([]),
+        np.array([5.0]),
+        np.array([np.nan, np.nan, np.nan]),
+        np.array([np.nan, 1.0, np.nan, 2.0, np.nan]),
+    ],
+)
+def test_find_profiles_short_inputs(depth):
+    stamp = np.arange(depth.size, dtype=float) * 4
+    pidx, pdir, _ = utils.findProfiles(stamp, depth)
+    pidx_ref, pdir_ref, _ = find_profiles_reference(stamp, depth)
+
+    np.testing.assert_array_equal(pidx, pidx_ref)
+    np.testing.assert_array_equal(pdir, pdir_ref)
+
+
+def synthetic_yos(seed: int, nyos: int = 120):
+    """
+    Synthetic 20 m yos, sampled about every second with fractional-second
+    times. Each cast lasts about the default shake duration (20 s),
+    so whether a cast is valid depends on how its elapsed times
+    are truncated to whole seconds. Returns datetime64 stamp and depth arrays
+    """
+    rng = np.random.default_rng(seed)
+    casts = []
+    depth = 0.0
+    for i in range(nyos):
+        target = 20.0 if i % 2 == 0 else 0.0
+        casts.append(np.linspace(depth, target, rng.integers(21, 24))[:-1])
+        depth = target
+    depth = np.concatenate(casts)
+    stamp = np.arange(depth.size) + rng.uniform(0, 1, depth.size)
+
+    stamp = np.datetime64("2025-01-01T00:00:00", "ns") + (stamp * 1e9).astype(
+        "timedelta64[ns]",
+    )
+    return stamp, depth
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("frac", [0.2, 0.5, 0.8])
+def test_update_fill_profiles_matches_get_fill_profiles(seed, frac):
+    stamp, depth = synthetic_yos(seed)
+    ds = xr.Dataset({"depth": ("time", depth)}, coords={"time": stamp})
+    full = utils.get_fill_profiles(ds.copy(), "time", "depth")
+
+    # Previous data points, and a window that starts before their seam,
+    # as for appending to a raw timeseries
+    n_prev = int(frac * stamp.size)
+    prev = utils.get_fill_profiles(ds.isel(time=slice(0, n_prev)), "time", "depth")
+    start = utils._profile_seam(prev["profile_index"].values) - 50
+    assert start > 0
+    win = utils.update_fill_profiles(
+        ds.isel(time=slice(start, None)),
+        "time",
+        "depth",
+        prev["profile_index"].isel(time=slice(start, None)),
+        prev["profile_direction"].isel(time=slice(start, None)),
+        t0=stamp[0],
+    )
+
+    for var in ["profile_index", "profile_direction"]:
+        np.testing.assert_array_equal(win[var].values, full[var].values[start:])
+        assert win[var].attrs == full[var].attrs
@@ -0,0 +1,159 @@
+"""
+Tests of esdglider.glider.timeseries_raw_to_sci processed in time windows,
+against processing the full raw timeseries in memory
+"""
+
+import numpy as np
+import pytest
+import xarray as xr
+import yaml
+
+from esdglider import glider
+
+deployment_name = "test-20240501"
+
+
+def synthetic_raw_file(path: str, seed: int = 0, n: int = 12000):
+    """
+    Write a synthetic raw timeseries, of about 7 hours of 1-3 s samples
+    of 100 m yos, to path. Engineering and science samples alternate.
+    Latitude and longitude are nan at the start and end of the deployment,
+    and around each hour (i.e., across the edges of 1 hour windows).
+    The science sensors are off for a period longer than maxgap
+    """
+    rng = np.random.default_rng(seed)
+    time = np.datetime64("2024-05-01T00:00:00", "ns") + np.cumsum(
+        rng.integers(1, 4, n),
+    ).astype("timedelta64[s]")
+    tt = (time - time[0]) / np.timedelta64(1, "s")
+    depth = 100 - 100 * np.cos(2 * np.pi * tt / 3000) + rng.normal(0, 0.1, n)
+
+    is_sci = rng.random(n) < 0.6
+
+    def _sci(v):
+        return np.where(is_sci, v, np.nan)
+
+    def _eng(v):
+        return np.where(is_sci, np.nan, v)
+
+    lat = _eng(32 + tt / 1e6)
+    lon = _eng(-117 + tt / 2e6)
+    hours = np.searchsorted(time, time[0] + np.arange(1, 7) * np.timedelta64(1, "h"))
+    for i in hours:
+        lat[i - 200 : i + 200] = np.nan
+        lon[i - 200 : i + 200] = np.nan
+    for i in [slice(0, 300), slice(-300, None)]:
+        lat[i] = np.nan
+        lon[i] = np.nan
+
+    sci = {
+        "conductivity": _sci(4 + depth / 1000),
+        "temperature": _sci(15 - depth / 20),
+        "pressure": _sci(depth * 1.01),
+        "chlorophyll": _sci(rng.random(n)),
+    }
+    for v in sci.values():
+        v[6000:6300] = np.nan
+
+    ds = xr.Dataset(
+        {
+            "latitude": ("time", lat, {"units": "degrees_north"}),
+            "longitude": ("time", lon, {"units": "degrees_east"}),
+            "depth_measured": ("time", _eng(depth)),
+            "depth_ctd": ("time", _sci(depth)),
+            "profile_index": ("time", np.zeros(n)),
+            "profile_direction": ("time", np.zeros(n)),
+            "conductivity": ("time", sci["conductivity"], {"units": "S m-1"}),
+            "temperature": ("time", sci["temperature"], {"units": "Celsius"}),
+            "pressure": ("time", sci["pressure"], {"units": "dbar"}),
+            "chlorophyll": ("time", sci["chlorophyll"]),
+            "heading": ("time", _eng(rng.random(n))),
+        },
+        coords={"time": time},
+        attrs={
+            "deployment_name": deployment_name,
+            "deployment_min_dt": "2024-05-01",
+            "glider_name": "test",
+            "glider_serial": "1",
+            "comment": " ",
+        },
+    )
+    ds.to_netcdf(
+        path,
+        encoding={
+            "time": {
+                "units": "seconds since 1970-01-01T00:00:00Z",
+                "dtype": "float64",
+            },
+        },
+    )
+
+
+def synthetic_deployment_yaml(path: str):
+    """
+    Write a minimal deployment yaml for synthetic_raw_file to path
+    """
+    netcdf_variables = {
+        "time": {"source": "sci_m_present_time"},
+        "latitude": {"source": "m_lat"},
+        "longitude": {"source": "m_lon"},
+        "heading": {"source": "m_heading"},
+        "conductivity": {"source": "sci_water_cond"},
+        "temperature": {"source": "sci_water_temp"},
+        "pressure": {"source": "sci_water_pressure"},
+        "chlorophyll": {
+            "source": "sci_flbbcd_chlor_units",
+            "valid_min": 0,
+            "valid_max": 0.9,
+        },
+    }
+    with open(path, "w") as f:
+        yaml.safe_dump({"netcdf_variables": netcdf_variables, "metadata": {}}, f)
+
+
+@pytest.mark.parametrize("window", ["20min", "1h", "2h"])
+def test_windowed_matches_in_memory(tmp_path, window):
+    raw_path = str(tmp_path / "raw.nc")
+    deploymentyaml = str(tmp_path / "deployment.yml")
+    synthetic_raw_file(raw_path)
+    synthetic_deployment_yaml(deploymentyaml)
+    pp = {
+        "metadata_dict": {"deployment_name": deployment_name},
+        "device_dict": {},
+        "file_info": None,
+        "mode": "delayed",
+        "maxgap": 60,
+        "deploymentyaml": deploymentyaml,
+    }
+
+    glider.timeseries_raw_to_sci(
+        raw_path,
+        str(tmp_path / "full"),
+        deploymentyaml,
+        maxgap=60,
+        pp=pp,
+    )
+    full = xr.load_dataset(tmp_path / "full" / f"{deployment_name}.nc")
+    with glider.timeseries_raw_to_sci(
+        raw_path,
+        str(tmp_path / "windowed"),
+        deploymentyaml,
+        maxgap=60,
+        pp=pp,
+        window=window,
+    ) as ds:
+        windowed = ds.load()
+
+    assert list(windowed.variables) == list(full.variables)
+    for i in full.variables:
+        np.testing.assert_array_equal(windowed[i].values, full[i].values)
+        assert windowed[i].attrs == full[i].attrs
+    # The attributes set when the file is written will differ
+    attrs_written = ["date_created", "date_issued", "history"]
+    assert {k: v for k, v in windowed.attrs.items() if k not in attrs_written} == {
+        k: v for k, v in full.attrs.items() if k not in attrs_written
+    }
+    # Sanity check that the rows with nan latitudes were dropped,
+    # and distance over ground was calculated across the window edges
+    assert full.time.shape[0] == 11400
+    assert np.all(np.diff(full.distance_over_ground.values) >= 0)